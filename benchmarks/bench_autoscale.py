@@ -0,0 +1,41 @@
+"""
+Benchmark the MultiSlicer pool on bursts of work separated by idle time: the workers started for a burst and left after the idle time.
+Run with: PYTHONPATH=src python benchmarks/bench_autoscale.py
+"""
+import time
+
+from common import timer, print_table
+from crumb.node import Node
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+N_TASKS = 20000
+N_BURSTS = 3
+IDLE_TIMEOUT = 0.5
+
+
+def main():
+    """Run the benchmark"""
+    Settings.USE_MULTISLICER = True
+    Settings.MULTISLICER_MIN_THREADS = 1
+    Settings.MULTISLICER_IDLE_TIMEOUT = IDLE_TIMEOUT
+    crumb = CrumbRepository().get_crumb('bench_source')
+    task_seq = [{'node': Node(crumb), 'deps': []} for _ in range(N_TASKS)]
+    delete_slicer()
+    slicer = get_slicer()
+    rows = []
+    for burst in range(N_BURSTS):
+        results: dict = {}
+        with timer(results, 'run'):
+            assert len(slicer.add_work(task_seq)) == N_TASKS
+        after_burst = slicer.stats['workers']
+        time.sleep(4 * IDLE_TIMEOUT)
+        rows.append([burst, results['run'], after_burst, slicer.stats['workers']])
+    delete_slicer()
+    print_table(f'{N_BURSTS} bursts of {N_TASKS} no-op tasks (MultiSlicer, up to {slicer.max_processes} workers)',
+                ['burst', 'seconds', 'workers after burst', 'workers after idle'], rows)
+
+
+if __name__ == '__main__':
+    main()
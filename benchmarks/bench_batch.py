@@ -0,0 +1,61 @@
+"""
+Benchmark building slices with the links added against the order of the nodes (consumers first), one edit at a time
+and in a batch. Without a batch each link moves the nodes already linked, in a batch the order is computed once.
+Run with: PYTHONPATH=src python benchmarks/bench_batch.py
+"""
+from common import timer, print_table
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+
+SIZES = [1000, 10000, 50000]
+# above this, building one edit at a time takes minutes
+MAX_NODES_ONE_AT_A_TIME = 10000
+
+
+def build(slice: Slice, n_nodes: int) -> Slice:
+    """Add a chain of nodes where each node takes the output of the next one"""
+    crumb_repository = CrumbRepository()
+    slice.add_bakery_item('source', crumb_repository.get_crumb('bench_source'))
+    slice.add_bakery_item('add1', crumb_repository.get_crumb('bench_add1'))
+    slice.add_output('out', int)
+    nodes = [slice.add_node('add1') for _ in range(n_nodes - 1)]
+    nodes.append(slice.add_node('source'))
+    for node_a, node_b in zip(nodes[1:], nodes[:-1]):
+        slice.add_link(node_a, None, node_b, 'value')
+    slice.add_output_mapping('out', nodes[0], None)
+    return slice
+
+
+def build_edits(n_nodes: int) -> list:
+    """Edits for apply_edits() equivalent to build()"""
+    edits = [('add_bakery_item', {'name': 'source', 'bakery_item': CrumbRepository().get_crumb('bench_source')}),
+             ('add_bakery_item', {'name': 'add1', 'bakery_item': CrumbRepository().get_crumb('bench_add1')}),
+             ('add_output', {'name': 'out', 'type': int})]
+    first = len(edits)
+    edits += [('add_node', {'bi_name': 'add1'}) for _ in range(n_nodes - 1)] + [('add_node', {'bi_name': 'source'})]
+    edits += [('add_link', {'node_a': i + 1, 'node_a_output': None, 'node_b': i, 'node_b_input': 'value'}) for i in range(first, first + n_nodes - 1)]
+    edits.append(('add_output_mapping', {'name': 'out', 'node_name': first, 'node_output': None}))
+    return edits
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for n_nodes in SIZES:
+        results: dict = {'one at a time': '-'}
+        if n_nodes <= MAX_NODES_ONE_AT_A_TIME:
+            with timer(results, 'one at a time'):
+                build(Slice('bench'), n_nodes)
+        with timer(results, 'batch'):
+            slice = Slice('bench')
+            with slice.batch():
+                build(slice, n_nodes)
+        edits = build_edits(n_nodes)
+        with timer(results, 'apply_edits'):
+            Slice('bench').apply_edits(edits)
+        rows.append([n_nodes, results['one at a time'], results['batch'], results['apply_edits']])
+    print_table('seconds to build a slice', ['nodes', 'one at a time', 'batch', 'apply_edits'], rows)
+
+
+if __name__ == '__main__':
+    main()
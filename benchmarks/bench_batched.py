@@ -0,0 +1,51 @@
+"""
+Benchmark a slice with a crumb having a fixed cost for each call run over many records: called for each record, or
+batched (@crumb(batched=True), called once for each micro-batch of Settings.SLICE_BATCH_SIZE records).
+Run with: PYTHONPATH=src python benchmarks/bench_batched.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+
+N_RECORDS = 2000
+
+
+def build(score: str) -> Slice:
+    """Return the slice: input -> add1 -> score -> glue"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('add1', crumb_repository.get_crumb('bench_add1'))
+    slice.add_bakery_item('score', crumb_repository.get_crumb(score))
+    slice.add_bakery_item('glue', crumb_repository.get_crumb('bench_glue'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node_add = slice.add_node('add1')
+    node_score = slice.add_node('score')
+    node_glue = slice.add_node('glue')
+    slice.add_input_mapping('in', node_add, 'value')
+    slice.add_link(node_add, None, node_score, 'value')
+    slice.add_link(node_score, None, node_glue, 'value')
+    slice.add_output_mapping('out', node_glue, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    inputs = [{'in': i} for i in range(N_RECORDS)]
+    expected = [{'out': 2 * (i + 1) + 1} for i in range(N_RECORDS)]
+    results: dict = {}
+    with timer(results, 'run'):
+        assert build('bench_score').run_many(inputs) == expected
+    rows.append(['per record', '-', results['run'], results['run'] / N_RECORDS * 1e6])
+    for batch_size in (16, 256):
+        Settings.SLICE_BATCH_SIZE = batch_size
+        with timer(results, 'run'):
+            assert build('bench_score_batched').run_many(inputs) == expected
+        rows.append(['batched', str(batch_size), results['run'], results['run'] / N_RECORDS * 1e6])
+    print_table(f'run_many over {N_RECORDS} records (single slicer)', ['crumb', 'batch size', 'seconds', 'us per record'], rows)
+
+
+if __name__ == '__main__':
+    main()
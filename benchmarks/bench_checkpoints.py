@@ -0,0 +1,61 @@
+"""
+Benchmark a long run failing at its last node, then run again: from the start, or resumed from the checkpoints of the nodes done.
+The chain fetches (waits 10 ms) N_NODES times, the cost of the checkpoints is measured on a chain of N_NODES glue crumbs.
+Run with: PYTHONPATH=src python benchmarks/bench_checkpoints.py
+"""
+import tempfile
+
+from common import timer, print_table, build_chain_slice
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+import bench_crumbs
+
+N_NODES = 100
+
+
+def build() -> Slice:
+    """Return the slice: value -> fetch -> ... -> fetch -> fail_once -> out"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('fetch', crumb_repository.get_crumb('bench_fetch'))
+    slice.add_bakery_item('fail_once', crumb_repository.get_crumb('bench_fail_once'))
+    slice.add_input('value', int)
+    slice.add_output('out', int)
+    previous = slice.add_node('fetch')
+    slice.add_input_mapping('value', previous, 'value')
+    for _ in range(N_NODES - 1):
+        current = slice.add_node('fetch')
+        slice.add_link(previous, None, current, 'value')
+        previous = current
+    node_fail = slice.add_node('fail_once')
+    slice.add_link(previous, None, node_fail, 'value')
+    slice.add_output_mapping('out', node_fail, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        Settings.CHECKPOINT_DIR = directory
+        for name, resume in (('none', None), ('checkpoints', 'bench')):
+            results: dict = {}
+            bench_crumbs.FAIL_ONCE['on'] = True
+            with timer(results, 'failed'):
+                try:
+                    build().run({'value': 1}, resume=resume)
+                except RuntimeError:
+                    pass
+            with timer(results, 'again'):
+                assert build().run({'value': 1}, resume=resume) == {'out': 1}
+            chain = build_chain_slice(N_NODES)
+            with timer(results, 'glue'):
+                assert chain.run({}, resume=resume and 'glue') == {'out': N_NODES}
+            rows.append([name, results['failed'], results['again'], results['glue']])
+        Settings.CHECKPOINT_DIR = None
+    print_table(f'seconds ({N_NODES} nodes)', ['checkpoints', 'failed run', 'run again', 'glue chain'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark requests served by a slice that builds a lookup table (not depending on the input) and uses it.
+Run with: PYTHONPATH=src python benchmarks/bench_constant.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+
+N_REQUESTS = 200
+
+
+def build() -> Slice:
+    """Return the slice: table -> lookup <- input"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('table', crumb_repository.get_crumb('bench_table'))
+    slice.add_bakery_item('lookup', crumb_repository.get_crumb('bench_lookup'))
+    slice.add_input('key', int)
+    slice.add_output('value', int)
+    node_table = slice.add_node('table')
+    node_lookup = slice.add_node('lookup')
+    slice.add_link(node_table, None, node_lookup, 'table')
+    slice.add_input_mapping('key', node_lookup, 'key')
+    slice.add_output_mapping('value', node_lookup, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    inputs = [{'key': i} for i in range(N_REQUESTS)]
+    for cache in (False, True):
+        Settings.PLANNER_CACHE_CONSTANT_NODES = cache
+        slice = build()
+        results: dict = {}
+        with timer(results, 'run'):
+            for i in inputs:
+                slice.run(i)
+        with timer(results, 'run_many'):
+            slice.run_many(inputs)
+        rows.append([str(cache), results['run'] / N_REQUESTS * 1e3, results['run_many'] / N_REQUESTS * 1e3])
+    print_table('milliseconds per request', ['cache constants', 'run', 'run_many'], rows)
+
+
+if __name__ == '__main__':
+    main()
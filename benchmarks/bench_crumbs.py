@@ -0,0 +1,187 @@
+"""Crumbs used by the benchmarks"""
+import os
+import time
+
+from crumb import crumb, resource
+
+
+@crumb(output=int, name='bench_source')
+def source() -> int:
+    """Return 1"""
+    return 1
+
+
+@crumb(input={'value': int}, output=int, name='bench_add1')
+def add1(value: int) -> int:
+    """Return value + 1"""
+    return value + 1
+
+
+@crumb(output=dict, name='bench_table', pure=True)
+def table() -> dict:
+    """Return a lookup table, built on each call"""
+    return {i: i * i for i in range(200000)}
+
+
+@crumb(input={'table': dict, 'key': int}, output=int, name='bench_lookup')
+def lookup(table: dict, key: int) -> int:  # pylint: disable=redefined-outer-name
+    """Return table[key]"""
+    return table[key]
+
+
+@crumb(input={'size': int}, output=bytes, name='bench_blob')
+def blob(size: int) -> bytes:
+    """Return size bytes"""
+    return bytes(size)
+
+
+@crumb(input={'data': bytes}, output=bytes, name='bench_reverse')
+def reverse(data: bytes) -> bytes:
+    """Return data reversed"""
+    return data[::-1]
+
+
+@crumb(input={'data': bytes}, output=int, name='bench_checksum')
+def checksum(data: bytes) -> int:
+    """Return the sum of the first bytes of data"""
+    return sum(data[:1000])
+
+
+@crumb(input={'key': int}, output=int, name='bench_lookup_setup')
+def lookup_setup(key: int) -> int:
+    """Return table[key], building the table on each call"""
+    return {i: i * i for i in range(200000)}[key]
+
+
+@resource(name='bench_table_resource')
+def table_resource() -> dict:
+    """Return a lookup table, built once per worker"""
+    return {i: i * i for i in range(200000)}
+
+
+@crumb(input={'key': int}, output=int, name='bench_lookup_resource', resources=['bench_table_resource'])
+def lookup_resource(key: int, bench_table_resource: dict) -> int:  # pylint: disable=redefined-outer-name
+    """Return table[key]"""
+    return bench_table_resource[key]
+
+
+@crumb(input={'value': int}, output=int, name='bench_spin', target='process')
+def spin(value: int) -> int:
+    """Return value after a loop of pure python (CPU-heavy)"""
+    total = 0
+    for i in range(3000000):
+        total += i % 7
+    return value + total % 2
+
+
+@crumb(input={'value': int}, output=int, name='bench_glue')
+def glue(value: int) -> int:
+    """Return value + 1, without a target (inline in the HybridSlicer)"""
+    return value + 1
+
+
+@crumb(input={'value': int}, output=int, name='bench_score')
+def score(value: int) -> int:
+    """Return 2 * value, as a model with a fixed cost for each call (e.g. a request to a service)"""
+    time.sleep(0.001)
+    return 2 * value
+
+
+@crumb(input={'value': int}, output=int, name='bench_score_batched', batched=True)
+def score_batched(value: list) -> list:
+    """Return 2 * value for each record, with the fixed cost once for the batch"""
+    time.sleep(0.001)
+    return [2 * i for i in value]
+
+
+@crumb(input={'rows': list}, output=list, name='bench_rows_spin', rowwise=True)
+def rows_spin(rows: list) -> list:
+    """Return a feature for each row after a loop of pure python (CPU-heavy)"""
+    return [sum(j % 7 for j in range(i, i + 2000)) for i in rows]
+
+
+@crumb(input={'values': list}, output=int, name='bench_rows_total')
+def rows_total(values: list) -> int:
+    """Return the sum of the values (needs the whole data)"""
+    return sum(values)
+
+
+@crumb(input={'value': int}, output=int, name='bench_fetch', target='thread')
+def fetch(value: int) -> int:
+    """Return value after waiting, as a request to a service (I/O)"""
+    time.sleep(0.01)
+    return value
+
+
+@crumb(input={'n': int}, output=list, name='bench_lines')
+def lines(n: int) -> list:
+    """Return n lines of text, as a file read at once"""
+    return [f'{i},{i * 7 % 13},{"x" * 40}' for i in range(n)]
+
+
+@crumb(input={'n': int}, output=list, name='bench_lines_stream', streaming=True)
+def lines_stream(n: int):
+    """Yield n lines of text in chunks of 1000, as a file read in chunks"""
+    for start in range(0, n, 1000):
+        yield [f'{i},{i * 7 % 13},{"x" * 40}' for i in range(start, min(start + 1000, n))]
+
+
+@crumb(input={'lines': list}, output=list, name='bench_parse')
+def parse(lines: list) -> list:  # pylint: disable=redefined-outer-name
+    """Return the fields of each line"""
+    return [i.split(',') for i in lines]
+
+
+@crumb(input={'lines': list}, output=list, name='bench_parse_stream', streaming=True, stream_input=['lines'])
+def parse_stream(lines):  # pylint: disable=redefined-outer-name
+    """Yield the fields of each line of each chunk"""
+    for chunk in lines:
+        yield [i.split(',') for i in chunk]
+
+
+@crumb(input={'rows': list}, output=int, name='bench_count', stream_input=['rows'])
+def count(rows) -> int:
+    """Return the sum of the second field of the rows of all the chunks"""
+    return sum(int(row[1]) for chunk in rows for row in chunk)
+
+
+@crumb(input={'value': int}, output=bool, name='bench_is_even', cheap=True)
+def is_even(value: int) -> bool:
+    """Return whether value is even (a cheap check deciding the branch)"""
+    return value % 2 == 0
+
+
+@crumb(input={'value': int}, output=int, name='bench_heavy')
+def heavy(value: int) -> int:
+    """Return value after a loop of pure python (CPU-heavy branch)"""
+    return value + sum(range(1_000_000)) * 0
+
+
+@crumb(input={'even': bool, 'a': int, 'b': int}, output=int, name='bench_pick')
+def pick(even: bool, a: int, b: int) -> int:  # pylint: disable=invalid-name
+    """Return a if even, otherwise b (both computed)"""
+    return a if even else b
+
+
+# set to let bench_fail_once fail, it is cleared when it fails
+FAIL_ONCE = {'on': False}
+
+
+@crumb(input={'value': int}, output=int, name='bench_fail_once')
+def fail_once(value: int) -> int:
+    """Return value, raises RuntimeError once if FAIL_ONCE is set (a crash at the end of a long run)"""
+    if FAIL_ONCE['on']:
+        FAIL_ONCE['on'] = False
+        raise RuntimeError('bench_fail_once failed')
+    return value
+
+
+@crumb(input={'value': int, 'marks': str}, output=int, name='bench_straggler', pure=True)
+def straggler(value: int, marks: str) -> int:
+    """Return value after 0.02 seconds, the first run of a value ending in 9 takes 1 second (a node slowed by its machine)"""
+    mark = os.path.join(marks, str(value))
+    if value % 10 == 9 and not os.path.exists(mark):
+        open(mark, 'w', encoding='ascii').close()  # pylint: disable=consider-using-with
+        time.sleep(1)
+    time.sleep(0.02)
+    return value
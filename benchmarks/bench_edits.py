@@ -0,0 +1,43 @@
+"""
+Benchmark random edits (as done by the web editor) on slices of growing size, the time per edit should not grow with the slice.
+Run with: PYTHONPATH=src python benchmarks/bench_edits.py
+"""
+import random
+
+from common import SIZES, timer, build_chain_slice, print_table
+
+N_EDITS = 2000
+
+
+def main():
+    """Run the benchmark"""
+    rng = random.Random(0)
+    rows = []
+    for n_nodes in SIZES:
+        slice = build_chain_slice(n_nodes)
+        slice.add_output('extra', int)
+        names = list(slice.nodes)
+        # editors expose intermediate results, one output every 10 nodes
+        for i in range(0, n_nodes - 1, 10):
+            slice.add_output(f'out_{i}', int)
+            slice.add_output_mapping(f'out_{i}', names[i], None)
+        results: dict = {}
+        with timer(results, 'relink'):
+            for _ in range(N_EDITS):
+                i = rng.randrange(1, n_nodes)
+                slice.remove_link(names[i - 1], None, names[i], 'value')
+                slice.add_link(names[i - 1], None, names[i], 'value')
+        with timer(results, 'add/remove node'):
+            for _ in range(N_EDITS):
+                slice.remove_node(slice.add_node('source'))
+        with timer(results, 'map/unmap'):
+            for _ in range(N_EDITS):
+                node_name = names[rng.randrange(n_nodes)]
+                slice.add_output_mapping('extra', node_name, None)
+                slice.remove_output_mapping('extra', node_name, None)
+        rows.append([n_nodes] + [results[i] / N_EDITS * 1e6 for i in ('relink', 'add/remove node', 'map/unmap')])
+    print_table('microseconds per edit', ['nodes', 'relink', 'add/rm node', 'map/unmap'], rows)
+
+
+if __name__ == '__main__':
+    main()
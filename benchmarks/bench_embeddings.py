@@ -0,0 +1,13 @@
+"""Crumb module with big read-only data, used by bench_preload"""
+import os
+
+from crumb import crumb
+
+# as if loaded from a file
+EMBEDDINGS = os.urandom(64 << 20)
+
+
+@crumb(input={'key': int}, output=int, name='bench_embedding')
+def embedding(key: int) -> int:
+    """Return the byte at key"""
+    return EMBEDDINGS[key]
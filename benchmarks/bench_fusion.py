@@ -0,0 +1,30 @@
+"""
+Benchmark a chain of small crumbs on the MultiSlicer, each node as a task and the chain fused into tasks.
+Run with: PYTHONPATH=src python benchmarks/bench_fusion.py
+"""
+from common import timer, build_chain_slice, print_table
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+SIZES = [10, 100, 1000]
+
+
+def main():
+    """Run the benchmark"""
+    Settings.USE_MULTISLICER = True
+    get_slicer()  # start the processes before timing
+    rows = []
+    for n_nodes in SIZES:
+        slice = build_chain_slice(n_nodes)
+        results: dict = {}
+        for fuse in (False, True):
+            Settings.PLANNER_FUSE_CHAINS = fuse
+            with timer(results, fuse):
+                assert slice.run()['out'] == n_nodes
+        rows.append([n_nodes, results[False], results[True]])
+    delete_slicer()
+    print_table('seconds per run (MultiSlicer)', ['nodes', 'node tasks', 'fused'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark a slice mixing glue crumbs and CPU-heavy crumbs on each slicer: branches of a heavy node (target 'process')
+followed by a chain of glue nodes (inline in the HybridSlicer).
+Run with: PYTHONPATH=src python benchmarks/bench_hybrid.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.slicers import delete_slicer
+
+N_BRANCHES = 4
+N_GLUE = 200
+N_RUNS = 3
+
+
+def build() -> Slice:
+    """Return the slice: source -> (spin -> glue -> ... -> glue) for each branch"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('source', crumb_repository.get_crumb('bench_source'))
+    slice.add_bakery_item('spin', crumb_repository.get_crumb('bench_spin'))
+    slice.add_bakery_item('glue', crumb_repository.get_crumb('bench_glue'))
+    source = slice.add_node('source')
+    for branch in range(N_BRANCHES):
+        previous = slice.add_node('spin')
+        slice.add_link(source, None, previous, 'value')
+        for _ in range(N_GLUE):
+            current = slice.add_node('glue')
+            slice.add_link(previous, None, current, 'value')
+            previous = current
+        slice.add_output(f'out{branch}', int)
+        slice.add_output_mapping(f'out{branch}', previous, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for slicer in ('single', 'multi', 'hybrid'):
+        Settings.USE_MULTISLICER = slicer == 'multi'
+        Settings.USE_HYBRIDSLICER = slicer == 'hybrid'
+        delete_slicer()
+        for fuse in (False, True):
+            Settings.PLANNER_FUSE_CHAINS = fuse
+            slice = build()
+            slice.run()  # the workers start
+            results: dict = {}
+            with timer(results, 'run'):
+                for _ in range(N_RUNS):
+                    slice.run()
+            rows.append([slicer, str(fuse), results['run'] / N_RUNS])
+    delete_slicer()
+    print_table(f'seconds per run ({N_BRANCHES} heavy nodes, {N_BRANCHES * N_GLUE} glue nodes)', ['slicer', 'fuse chains', 'run'], rows)
+
+
+if __name__ == '__main__':
+    main()
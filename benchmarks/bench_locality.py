@@ -0,0 +1,60 @@
+"""
+Benchmark the bytes moved between the MultiSlicer processes for a Slice passing big outputs:
+blob -> BRANCHES x (reverse -> checksum), only the checksums are returned.
+Run with: PYTHONPATH=src python benchmarks/bench_locality.py
+"""
+import sys
+
+from common import timer, print_table
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+SIZES = [1 << 20, 8 << 20, 32 << 20]
+BRANCHES = 4
+RUNS = 3
+
+
+def build_slice() -> Slice:
+    """Return the slice, the big outputs staying in the workers are not saved in the nodes"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench_locality')
+    for name in ('blob', 'reverse', 'checksum'):
+        slice.add_bakery_item(name, crumb_repository.get_crumb(f'bench_{name}'))
+    slice.add_input('size', int)
+    node_blob = slice.add_node('blob')
+    slice.add_input_mapping('size', node_blob, 'size')
+    for i in range(BRANCHES):
+        node_reverse = slice.add_node('reverse')
+        node_checksum = slice.add_node('checksum')
+        slice.add_link(node_blob, None, node_reverse, 'data')
+        slice.add_link(node_reverse, None, node_checksum, 'data')
+        slice.add_output(f'out{i}', int)
+        slice.add_output_mapping(f'out{i}', node_checksum, None)
+    return slice
+
+
+def main():
+    """Run the benchmark, without locality the outputs are still measured (the threshold is never reached)"""
+    Settings.USE_MULTISLICER = True
+    slice = build_slice()
+    rows = []
+    for size in SIZES:
+        row = [size]
+        for threshold in (sys.maxsize, 1 << 16):
+            Settings.MULTISLICER_LOCALITY_BYTES = threshold
+            delete_slicer()
+            get_slicer()  # start the processes before timing
+            results: dict = {}
+            with timer(results, 'run'):
+                for _ in range(RUNS):
+                    slice.run({'size': size})
+            row += [get_slicer().stats['bytes_moved'] // RUNS, results['run'] / RUNS]
+        rows.append(row)
+    delete_slicer()
+    print_table('bytes moved and seconds per run (MultiSlicer)', ['blob bytes', 'moved', 'seconds', 'moved locality', 'seconds locality'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark a Map running a small Slice (a request to a service, then glue) for each element of a collection:
+one element after the other (Map.run), or with the elements sent to the HybridSlicer for each window.
+Run with: PYTHONPATH=src python benchmarks/bench_map.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.map import Map
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.slicers import delete_slicer
+
+N_ELEMENTS = 64
+WINDOWS = [1, 4, 16, 64]
+
+
+def build(window: int) -> Slice:
+    """Return the slice: values -> Map(fetch -> glue) -> out"""
+    crumb_repository = CrumbRepository()
+    inner = Slice('element')
+    inner.add_bakery_item('fetch', crumb_repository.get_crumb('bench_fetch'))
+    inner.add_bakery_item('glue', crumb_repository.get_crumb('bench_glue'))
+    inner.add_input('value', int)
+    inner.add_output('out', int)
+    node_fetch = inner.add_node('fetch')
+    node_glue = inner.add_node('glue')
+    inner.add_input_mapping('value', node_fetch, 'value')
+    inner.add_link(node_fetch, None, node_glue, 'value')
+    inner.add_output_mapping('out', node_glue, None)
+    slice = Slice('bench')
+    slice.add_bakery_item('map', Map('map', inner, 'value', window))
+    slice.add_input('values', list)
+    slice.add_output('out', list)
+    node_map = slice.add_node('map')
+    slice.add_input_mapping('values', node_map, 'value')
+    slice.add_output_mapping('out', node_map, 'out')
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    data = {'values': list(range(N_ELEMENTS))}
+    expected = {'out': [i + 1 for i in range(N_ELEMENTS)]}
+    Settings.USE_HYBRIDSLICER = True
+    Settings.HYBRIDSLICER_THREADS = max(WINDOWS)
+    for window in WINDOWS:
+        delete_slicer()
+        slice = build(window)
+        results: dict = {}
+        with timer(results, 'serial'):
+            assert slice.bakery_items['map']['bakery_item'].run({'value': data['values']}) == expected
+        with timer(results, 'map'):
+            assert slice.run(data) == expected
+        rows.append([window, results['serial'], results['map']])
+    delete_slicer()
+    print_table(f'seconds per run ({N_ELEMENTS} elements)', ['window', 'serial', 'map'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Benchmark the memory used per node and the time to compute the execution sequence.
+Run with: PYTHONPATH=src python benchmarks/bench_memory.py
+"""
+import gc
+import tracemalloc
+
+from common import SIZES, timer, build_chain_slice, print_table
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for n_nodes in SIZES:
+        gc.collect()
+        tracemalloc.start()
+        slice = build_chain_slice(n_nodes)
+        gc.collect()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results: dict = {}
+        with timer(results, 'plan'):
+            slice._compute_execution_seq()  # pylint: disable=protected-access
+        rows.append([n_nodes, memory / n_nodes, results['plan']])
+        del slice
+    print_table('memory per node (bytes) and execution sequence (seconds)', ['nodes', 'bytes/node', 'plan'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark a slice with a CPU-heavy row-wise crumb over many rows: run whole, or with the rows in partitions
+(Slice.run_partitioned) on the SingleSlicer and on the MultiSlicer workers.
+Run with: PYTHONPATH=src python benchmarks/bench_partitioned.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.multislicer_functions import get_cpu_count
+from crumb.slicers.slicers import delete_slicer
+
+N_ROWS = 4000
+
+
+def build() -> Slice:
+    """Return the slice: rows -> spin -> total"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('spin', crumb_repository.get_crumb('bench_rows_spin'))
+    slice.add_bakery_item('total', crumb_repository.get_crumb('bench_rows_total'))
+    slice.add_input('rows', list)
+    slice.add_output('out', int)
+    node_spin = slice.add_node('spin')
+    node_total = slice.add_node('total')
+    slice.add_input_mapping('rows', node_spin, 'rows')
+    slice.add_link(node_spin, None, node_total, 'values')
+    slice.add_output_mapping('out', node_total, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    data = {'rows': list(range(N_ROWS))}
+    n_partitions = max(4, get_cpu_count())
+    for slicer in ('single', 'multi'):
+        Settings.USE_MULTISLICER = slicer == 'multi'
+        Settings.MULTISLICER_THREADS = n_partitions
+        delete_slicer()
+        slice = build()
+        expected = slice.run(data)  # the workers start
+        results: dict = {}
+        with timer(results, 'whole'):
+            assert slice.run(data) == expected
+        with timer(results, 'partitioned'):
+            assert slice.run_partitioned(data, ['rows'], n_partitions) == expected
+        rows.append([slicer, results['whole'], results['partitioned']])
+    delete_slicer()
+    print_table(f'seconds per run ({N_ROWS} rows, {n_partitions} partitions, {get_cpu_count()} CPUs)', ['slicer', 'whole', 'partitioned'], rows)
+
+
+if __name__ == '__main__':
+    main()
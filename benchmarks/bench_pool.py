@@ -0,0 +1,36 @@
+"""
+Benchmark the throughput of the MultiSlicer pool on independent no-op tasks, for a number of workers.
+Run with: PYTHONPATH=src python benchmarks/bench_pool.py
+"""
+from common import timer, print_table
+from crumb.node import Node
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+N_TASKS = 100000
+WORKERS = [1, 2, 4, 8]
+
+
+def main():
+    """Run the benchmark"""
+    Settings.USE_MULTISLICER = True
+    crumb = CrumbRepository().get_crumb('bench_source')
+    nodes = [Node(crumb) for _ in range(N_TASKS)]
+    task_seq = [{'node': i, 'deps': []} for i in nodes]
+    rows = []
+    for n_workers in WORKERS:
+        delete_slicer()
+        # all the workers from the start, capped by the CPUs
+        Settings.MULTISLICER_MIN_THREADS = n_workers
+        get_slicer().reset(n_workers)
+        results: dict = {}
+        with timer(results, 'run'):
+            assert len(get_slicer().add_work(task_seq)) == N_TASKS
+        rows.append([n_workers, get_slicer().stats['workers'], results['run'], int(N_TASKS / results['run'])])
+    delete_slicer()
+    print_table(f'{N_TASKS} no-op tasks (MultiSlicer)', ['workers', 'started', 'seconds', 'tasks/s'], rows)
+
+
+if __name__ == '__main__':
+    main()
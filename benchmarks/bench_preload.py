@@ -0,0 +1,63 @@
+"""
+Benchmark the memory of the MultiSlicer workers using a crumb module with 64 MiB of data, executed by each worker
+or preloaded before the workers start (Settings.MULTISLICER_PRELOAD).
+Run with: PYTHONPATH=src python benchmarks/bench_preload.py
+"""
+import os
+import time
+
+from common import print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+N_WORKERS = 4
+START_METHODS = ['forkserver', 'fork']
+
+
+def build() -> Slice:
+    """Return the slice: input -> embedding"""
+    slice = Slice('bench')
+    slice.add_bakery_item('embedding', CrumbRepository().get_crumb('bench_embedding'))
+    slice.add_input('key', int)
+    slice.add_output('value', int)
+    node = slice.add_node('embedding')
+    slice.add_input_mapping('key', node, 'key')
+    slice.add_output_mapping('value', node, None)
+    return slice
+
+
+def get_memory() -> list:
+    """Return the mean rss and private memory of the workers in MiB"""
+    while get_slicer().stats['workers'] < get_slicer().min_processes:
+        time.sleep(0.1)  # the scheduler is starting them
+    memory = get_slicer().worker_memory().values()
+    return [sum(i.get(j, 0) for i in memory) / len(memory) / (1 << 20) for j in ('rss', 'private')]
+
+
+def main():
+    """Run the benchmark"""
+    # not at the top, the processes started with forkserver import this file again
+    import bench_embeddings  # pylint: disable=import-outside-toplevel
+    Settings.USE_MULTISLICER = True
+    Settings.MULTISLICER_THREADS = N_WORKERS
+    Settings.MULTISLICER_MIN_THREADS = N_WORKERS
+    slice = build()
+    rows = []
+    for start_method in START_METHODS:
+        for preload in ([os.path.abspath(bench_embeddings.__file__)], []):
+            Settings.MULTISLICER_START_METHOD = start_method
+            Settings.MULTISLICER_PRELOAD = preload
+            delete_slicer()
+            before = get_memory()
+            for i in range(100):
+                slice.run({'key': i})
+            rows.append([start_method, str(bool(preload)), get_slicer().stats['workers'], *before, *get_memory()])
+    delete_slicer()
+    header = ['start', 'preload', 'workers', 'rss before', 'private before', 'rss after', 'private after']
+    print_table('memory per worker (MiB), before and after running the crumb', header, rows)
+
+
+if __name__ == '__main__':
+    main()
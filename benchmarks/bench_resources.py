@@ -0,0 +1,44 @@
+"""
+Benchmark requests served by a crumb using a lookup table, built on each call or kept as a resource of the worker.
+Run with: PYTHONPATH=src python benchmarks/bench_resources.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.slicers import delete_slicer
+
+N_REQUESTS = 100
+
+
+def build(crumb_name: str) -> Slice:
+    """Return the slice: input -> lookup"""
+    slice = Slice('bench')
+    slice.add_bakery_item('lookup', CrumbRepository().get_crumb(crumb_name))
+    slice.add_input('key', int)
+    slice.add_output('value', int)
+    node_lookup = slice.add_node('lookup')
+    slice.add_input_mapping('key', node_lookup, 'key')
+    slice.add_output_mapping('value', node_lookup, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for use_multislicer in (False, True):
+        Settings.USE_MULTISLICER = use_multislicer
+        for crumb_name in ('bench_lookup_setup', 'bench_lookup_resource'):
+            delete_slicer()
+            slice = build(crumb_name)
+            results: dict = {}
+            with timer(results, 'run'):
+                for i in range(N_REQUESTS):
+                    assert slice.run({'key': i}) == {'value': i * i}
+            rows.append(['multi' if use_multislicer else 'single', crumb_name, results['run'] / N_REQUESTS * 1e3])
+    delete_slicer()
+    print_table('milliseconds per request', ['slicer', 'crumb', 'run'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark the time to the first output of a slice with a cheap output and a costly one (a chain of requests to a service):
+with Slice.run (all the outputs at once) and Slice.run_iter (each output when its node finished), on each slicer.
+Run with: PYTHONPATH=src python benchmarks/bench_run_iter.py
+"""
+import time
+
+from common import print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.slicers import delete_slicer
+
+N_COSTLY = 50
+
+
+def build() -> Slice:
+    """Return the slice: source -> glue (cheap output), source -> fetch -> ... -> fetch (costly output)"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('source', crumb_repository.get_crumb('bench_source'))
+    slice.add_bakery_item('glue', crumb_repository.get_crumb('bench_glue'))
+    slice.add_bakery_item('fetch', crumb_repository.get_crumb('bench_fetch'))
+    slice.add_output('cheap', int)
+    slice.add_output('costly', int)
+    source = slice.add_node('source')
+    glue = slice.add_node('glue')
+    slice.add_link(source, None, glue, 'value')
+    slice.add_output_mapping('cheap', glue, None)
+    previous = source
+    for _ in range(N_COSTLY):
+        current = slice.add_node('fetch')
+        slice.add_link(previous, None, current, 'value')
+        previous = current
+    slice.add_output_mapping('costly', previous, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for slicer in ('single', 'hybrid', 'multi'):
+        Settings.USE_HYBRIDSLICER = slicer == 'hybrid'
+        Settings.USE_MULTISLICER = slicer == 'multi'
+        delete_slicer()
+        slice = build()
+        slice.run()  # the workers start
+        start = time.perf_counter()
+        slice.run()
+        run = time.perf_counter() - start
+        start = time.perf_counter()
+        outputs = slice.run_iter()
+        name, _ = next(outputs)
+        first = time.perf_counter() - start
+        list(outputs)
+        rows.append([slicer, run, f'{first:.4f} ({name})', time.perf_counter() - start])
+    delete_slicer()
+    print_table(f'seconds ({N_COSTLY} requests for the costly output)', ['slicer', 'run', 'run_iter first', 'run_iter all'], rows)
+
+
+if __name__ == '__main__':
+    main()
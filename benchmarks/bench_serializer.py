@@ -0,0 +1,62 @@
+"""
+Benchmark saving and loading slice files (version 3 json/msgpack against version 2 nested json).
+Run with: PYTHONPATH=src python benchmarks/bench_serializer.py
+"""
+import os
+import json
+import tempfile
+
+from common import SIZES, timer, build_chain_slice, print_table
+from crumb.bakery_items.slice import Slice, msgpack
+
+
+def _as_v2_file(slice: Slice) -> str:
+    """Write the slice in the version 2 format: nested json strings and nodes referenced by name"""
+    def _slice_v2(this_slice: Slice) -> dict:
+        return {
+            'slice_name': this_slice.name,
+            'input': {'objects': {i: j.__name__ for i, j in this_slice.input.items()},
+                      'mapping': this_slice._input_mapping},  # pylint: disable=protected-access
+            'output': {'objects': {i: j.__name__ for i, j in this_slice.output.items()},
+                       'mapping': this_slice._output_mapping},  # pylint: disable=protected-access
+            'bakery_items': {i: {'bakery_item': json.dumps(j['bakery_item'].to_dict()), 'type': j['type']} for i, j in this_slice.bakery_items.items()},
+            'nodes': {i: {'instance_of': j.instance_of, 'link_str': j.links_to_json(), 'save_exec': True, 'last_exec': {}}
+                      for i, j in this_slice.nodes.items()}
+        }
+    return json.dumps({'version': 2, 'type': 'slice', 'slice': json.dumps(_slice_v2(slice))})
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for n_nodes in SIZES:
+        slice = build_chain_slice(n_nodes)
+        results: dict = {}
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+        temp_file.close()
+        path = temp_file.name
+        with open(path, mode='w', encoding='utf-8') as open_file:
+            open_file.write(_as_v2_file(slice))
+        with timer(results, 'v2 load'):
+            Slice('v2').load_from_file(path)
+        with timer(results, 'v3 save'):
+            slice.save_to_file(path, overwrite=True)
+        size_json = os.path.getsize(path)
+        with timer(results, 'v3 load'):
+            Slice('v3').load_from_file(path)
+        size_bin = None
+        if msgpack is not None:
+            with timer(results, 'bin save'):
+                slice.save_to_file(path, overwrite=True, binary=True)
+            size_bin = os.path.getsize(path)
+            with timer(results, 'bin load'):
+                Slice('bin').load_from_file(path)
+        os.unlink(path)
+        rows.append([n_nodes, results['v2 load'], results['v3 save'], results['v3 load'], size_json,
+                     results.get('bin save', '-'), results.get('bin load', '-'), size_bin or '-'])
+    print_table('slice files (seconds, bytes)',
+                ['nodes', 'v2 load', 'v3 save', 'v3 load', 'v3 bytes', 'bin save', 'bin load', 'bin bytes'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark runs in the MultiSlicer where one node in ten is a straggler (its first run takes 1 second instead of 20 ms):
+waiting for it, or starting a copy on another worker once it is slower than MULTISLICER_SPECULATIVE times its median.
+The copy needs a second worker: MULTISLICER_MIN_THREADS workers are started, up to the CPUs available.
+Run with: PYTHONPATH=src python benchmarks/bench_stragglers.py
+"""
+import tempfile
+
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.slicers.multislicer import MultiSlicer
+from crumb.slicers.slicers import delete_slicer
+import bench_crumbs  # noqa: F401  # pylint: disable=unused-import
+
+N_RUNS = 40
+
+
+def build() -> Slice:
+    """Return the slice: value, marks -> straggler -> out"""
+    slice = Slice('bench')
+    slice.add_bakery_item('straggler', CrumbRepository().get_crumb('bench_straggler'))
+    slice.add_input('value', int)
+    slice.add_input('marks', str)
+    slice.add_output('out', int)
+    node = slice.add_node('straggler')
+    slice.add_input_mapping('value', node, 'value')
+    slice.add_input_mapping('marks', node, 'marks')
+    slice.add_output_mapping('out', node, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    Settings.USE_MULTISLICER = True
+    Settings.MULTISLICER_MIN_THREADS = 2
+    for speculative in (0., 3.):
+        Settings.MULTISLICER_SPECULATIVE = speculative
+        delete_slicer()
+        slice = build()
+        results: dict = {}
+        with tempfile.TemporaryDirectory() as marks:
+            with timer(results, 'total'):
+                for value in range(N_RUNS):
+                    assert slice.run({'value': value, 'marks': marks}) == {'out': value}
+        rows.append([speculative or 'off', MultiSlicer().max_processes, results['total'], results['total'] / N_RUNS])
+    delete_slicer()
+    Settings.USE_MULTISLICER = False
+    print_table(f'seconds for {N_RUNS} runs, {N_RUNS // 10} stragglers', ['speculative', 'workers', 'total', 'per run'], rows)
+
+
+if __name__ == '__main__':
+    main()
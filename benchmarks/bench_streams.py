@@ -0,0 +1,58 @@
+"""
+Benchmark a slice reading lines, parsing them and aggregating them: with the whole data given from crumb to crumb, or with
+streaming crumbs giving chunks (the three crumbs running at the same time), on the SingleSlicer.
+Run with: PYTHONPATH=src python benchmarks/bench_streams.py
+"""
+import gc
+import tracemalloc
+
+from common import timer, print_table
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+
+SIZES = [10000, 100000, 300000]
+
+
+def build(streaming: bool) -> Slice:
+    """Return the slice: n -> lines -> parse -> count"""
+    crumb_repository = CrumbRepository()
+    suffix = '_stream' if streaming else ''
+    slice = Slice('bench')
+    slice.add_bakery_item('lines', crumb_repository.get_crumb(f'bench_lines{suffix}'))
+    slice.add_bakery_item('parse', crumb_repository.get_crumb(f'bench_parse{suffix}'))
+    slice.add_bakery_item('count', crumb_repository.get_crumb('bench_count'))
+    slice.add_input('n', int)
+    slice.add_output('out', int)
+    node_lines = slice.add_node('lines')
+    node_parse = slice.add_node('parse')
+    node_count = slice.add_node('count')
+    for node in (node_lines, node_parse):
+        slice.nodes[node].save_exec = False
+    slice.add_input_mapping('n', node_lines, 'n')
+    slice.add_link(node_lines, None, node_parse, 'lines')
+    slice.add_link(node_parse, None, node_count, 'rows')
+    slice.add_output_mapping('out', node_count, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for n_lines in SIZES:
+        row = [n_lines]
+        for streaming in (False, True):
+            slice = build(streaming)
+            results: dict = {}
+            gc.collect()
+            tracemalloc.start()
+            with timer(results, 'run'):
+                slice.run({'n': n_lines})
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            row += [results['run'], peak / 2 ** 20]
+        rows.append(row)
+    print_table('seconds and peak memory (MiB) per run', ['lines', 'whole', 'whole MiB', 'streamed', 'streamed MiB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark a cheap check deciding between two branches (a CPU-heavy one and a request to a service):
+both branches computed and one output picked, or a Switch running only the branch selected.
+Run with: PYTHONPATH=src python benchmarks/bench_switch.py
+"""
+from common import timer, print_table
+from crumb.settings import Settings
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+from crumb.bakery_items.switch import Switch
+from crumb.slicers.slicers import delete_slicer
+
+N_RUNS = 20
+
+
+def branch(crumb_name: str) -> Slice:
+    """Return the slice: value -> crumb -> out"""
+    slice = Slice(crumb_name)
+    slice.add_bakery_item(crumb_name, CrumbRepository().get_crumb(crumb_name))
+    slice.add_input('value', int)
+    slice.add_output('out', int)
+    node = slice.add_node(crumb_name)
+    slice.add_input_mapping('value', node, 'value')
+    slice.add_output_mapping('out', node, None)
+    return slice
+
+
+def build(switch: bool) -> Slice:
+    """Return the slice: value -> is_even -> (heavy if even, otherwise fetch) -> out"""
+    crumb_repository = CrumbRepository()
+    slice = Slice('bench')
+    slice.add_bakery_item('is_even', crumb_repository.get_crumb('bench_is_even'))
+    slice.add_input('value', int)
+    slice.add_output('out', int)
+    node_check = slice.add_node('is_even')
+    slice.add_input_mapping('value', node_check, 'value')
+    if switch:
+        slice.add_bakery_item('switch', Switch('switch', {True: branch('bench_heavy'), False: branch('bench_fetch')}, 'even'))
+        node_switch = slice.add_node('switch')
+        slice.add_link(node_check, None, node_switch, 'even')
+        slice.add_input_mapping('value', node_switch, 'value')
+        slice.add_output_mapping('out', node_switch, 'out')
+        return slice
+    for name in ('bench_heavy', 'bench_fetch', 'bench_pick'):
+        slice.add_bakery_item(name, crumb_repository.get_crumb(name))
+    node_heavy = slice.add_node('bench_heavy')
+    node_fetch = slice.add_node('bench_fetch')
+    node_pick = slice.add_node('bench_pick')
+    slice.add_input_mapping('value', node_heavy, 'value')
+    slice.add_input_mapping('value', node_fetch, 'value')
+    slice.add_link(node_check, None, node_pick, 'even')
+    slice.add_link(node_heavy, None, node_pick, 'a')
+    slice.add_link(node_fetch, None, node_pick, 'b')
+    slice.add_output_mapping('out', node_pick, None)
+    return slice
+
+
+def main():
+    """Run the benchmark"""
+    rows = []
+    for slicer in ('single', 'hybrid'):
+        Settings.USE_HYBRIDSLICER = slicer == 'hybrid'
+        delete_slicer()
+        results: dict = {}
+        for name, switch in (('both', False), ('switch', True)):
+            slice = build(switch)
+            with timer(results, name):
+                for value in range(N_RUNS):
+                    assert slice.run({'value': value}) == {'out': value}
+            results[name] /= N_RUNS
+        rows.append([slicer, results['both'], results['switch']])
+    Settings.USE_HYBRIDSLICER = False
+    delete_slicer()
+    print_table(f'seconds per run (half heavy, half fetch, {N_RUNS} runs)', ['slicer', 'both', 'switch'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Helpers shared by the benchmarks"""
+import time
+from contextlib import contextmanager
+
+import bench_crumbs  # noqa: F401  # pylint: disable=unused-import
+from crumb.repository import CrumbRepository
+from crumb.bakery_items.slice import Slice
+
+SIZES = [1000, 10000, 100000]
+
+
+@contextmanager
+def timer(results: dict, key: str):
+    """Store the time spent inside the context in results[key]"""
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def build_chain_slice(n_nodes: int, name: str = 'bench') -> Slice:
+    """Return a slice with a source node followed by a chain of n_nodes - 1 nodes adding 1"""
+    crumb_repository = CrumbRepository()
+    slice = Slice(name)
+    slice.add_bakery_item('source', crumb_repository.get_crumb('bench_source'))
+    slice.add_bakery_item('add1', crumb_repository.get_crumb('bench_add1'))
+    slice.add_output('out', int)
+    previous = slice.add_node('source')
+    for _ in range(n_nodes - 1):
+        current = slice.add_node('add1')
+        slice.add_link(previous, None, current, 'value')
+        previous = current
+    slice.add_output_mapping('out', previous, None)
+    return slice
+
+
+def print_table(title: str, header: list, rows: list) -> None:
+    """Print results as a table"""
+    print(title)
+    print(' | '.join(f'{i:>14}' for i in header))
+    for row in rows:
+        print(' | '.join(f'{i:>14.4f}' if isinstance(i, float) else f'{i:>14}' for i in row))
+    print()
@@ -0,0 +1,48 @@
+"""
+Soak test: load, run and discard a slice in a loop while reporting the resident memory, which should stay flat.
+Run with: PYTHONPATH=src python benchmarks/soak_registry.py
+"""
+import os
+import gc
+import sys
+import resource
+import tempfile
+
+from common import build_chain_slice
+from crumb.bakery_items.slice import Slice
+
+N_NODES = 1000
+ITERATIONS = 200
+REPORT_EVERY = 20
+
+
+def get_rss_mb() -> float:
+    """Return the current resident memory in MB (peak memory if /proc is not available)"""
+    try:
+        with open('/proc/self/statm', mode='r', encoding='utf-8') as open_file:
+            return int(open_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def main():
+    """Run the soak test"""
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+    temp_file.close()
+    path = temp_file.name
+    build_chain_slice(N_NODES).save_to_file(path, overwrite=True)
+    print(f'{"iteration":>10} | {"rss (MB)":>10}')
+    for iteration in range(1, ITERATIONS + 1):
+        slice = Slice('soak')
+        slice.load_from_file(path)
+        slice.run()
+        del slice
+        if iteration % REPORT_EVERY == 0:
+            gc.collect()
+            print(f'{iteration:>10} | {get_rss_mb():>10.1f}')
+    os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
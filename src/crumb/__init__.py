@@ -1,7 +1,8 @@
 """Breadr is a pipeline helper"""
 __version__ = "0.1"
-__all__ = ['crumb', 'CrumbRepository']
-__slice_serializer_version__ = 2
+__all__ = ['crumb', 'resource', 'CrumbRepository']
+__slice_serializer_version__ = 3
 
 from crumb.decorator import crumb
 from crumb.repository import CrumbRepository
+from crumb.resources import resource
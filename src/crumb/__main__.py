@@ -2,11 +2,10 @@
 
 import sys
 import argparse
-import json
 import pprint
 
 from .settings import Settings
-from .bakery_items.slice import Slice
+from .bakery_items.slice import Slice, read_slice_file
 from .web.app import web_app
 
 
@@ -33,8 +32,7 @@ def main():
             Settings.set_setting(setting, value)
     # load the file and show some info
     if arguments.show:
-        with open(arguments.file, mode='r', encoding='utf-8') as open_file:
-            pprint.pprint(json.loads(open_file.read()))
+        pprint.pprint(read_slice_file(arguments.file))
     # compile input bits, split , then split =
     input = {}
     if arguments.input:
@@ -1,13 +1,13 @@
 """Definition for module Crumb"""
 from __future__ import annotations
-from typing import Optional, Dict, Callable, Any
+from typing import Optional, Dict, Callable, Any, Sequence, Union
 import inspect
 import json
-from importlib.util import spec_from_file_location, module_from_spec
-import os
 
 from crumb.bakery_items.generic import BakeryItem
+from crumb.bakery_items.load_cache import LoadCache, load_crumbs_from_file
 from crumb.logger import LoggerQueue, log, logging
+from crumb.resources import ResourcePool
 
 
 class Crumb(BakeryItem):
@@ -18,13 +18,64 @@ class Crumb(BakeryItem):
     @param func: the underlying function
     @param input: the input of the function: {'param1': int, 'param2': class, ...}
     @param output: the output of the function, int, float, class, ..., obtained from type()
+    @param pure: the output depends only on the input, so nodes with the same input can share one execution
+    @param cheap: the function is fast, it can be run with the node giving its input rather than scheduled on its own
+    @param resources: the resources (crumb.resources) given to the function as the parameters with the same name
+    @param target: where the HybridSlicer runs it: 'inline' (in the thread running the Slice), 'thread' (a thread pool, e.g. I/O),
+                   'process' (a MultiSlicer worker, e.g. CPU-heavy python) or None for Settings.HYBRIDSLICER_DEFAULT_TARGET
+    @param requires: amounts of named resources used while it runs, format is {'name': amount}, e.g. {'cpu': 4, 'memory': 2e9, 'license': 1},
+                     the slicers run at once the tasks fitting in Settings.SLICER_BUDGETS
+    @param batched: the function takes a list (or array) of values for each input and returns a sequence with an output for each,
+                    Slice.run_many calls it once for many records
+    @param rowwise: the output for some rows of the input is the output for these rows (e.g. a transform of each row of a DataFrame),
+                    Slice.run_partitioned runs it on each partition of the rows
+    @param merge: how the output of the partitions (or the chunks of a streaming crumb) is recombined: 'concat', 'sum' or a function
+                  taking the list of outputs (defined at the top level of a module for the MultiSlicer)
+    @param streaming: the function is a generator yielding its output in chunks, in a Slice the crumbs taking them as a stream
+                      run at the same time, the others get the chunks recombined with merge
+    @param stream_input: the inputs given as an iterator over the chunks of a streaming crumb, a whole value is given as a single chunk
+    @param timeout: seconds a run can take in the MultiSlicer, the worker running it longer is replaced (None for no limit)
+    @param retries: times the MultiSlicer runs it again after it raised, timed out or its worker stopped, then the error is raised
     """
-    def __init__(self, name: str, file: str, func: Callable, input: Optional[Dict[str, type]] = None, output: Optional[type] = None):
+    __slots__ = ('file', 'func', 'pure', 'cheap', 'resources', 'target', 'requires', 'batched', 'rowwise', 'merge', 'streaming', 'stream_input',
+                 'timeout', 'retries')
+    MERGES = ('concat', 'sum')
+    TARGETS = ('inline', 'thread', 'process')
+
+    def __init__(self, name: str, file: str, func: Callable, input: Optional[Dict[str, type]] = None, output: Optional[type] = None,
+                 pure: bool = False, cheap: bool = False, resources: Sequence[str] = (), target: Optional[str] = None,
+                 requires: Optional[Dict[str, float]] = None, batched: bool = False, rowwise: bool = False,
+                 merge: Union[str, Callable] = 'concat', streaming: bool = False, stream_input: Sequence[str] = (), timeout: Optional[float] = None,
+                 retries: int = 0):
         log(LoggerQueue.get_logger(), f'Starting crumb {name} from {file}', logging.DEBUG)
-        self._crumb_check_input(func, input)
+        self._crumb_check_input(func, input, resources)
+        if target is not None and target not in self.TARGETS:
+            raise ValueError(f'target must be one of {self.TARGETS} or None, not "{target}"')
+        if requires is not None and not all(isinstance(i, str) and isinstance(j, (int, float)) and j >= 0 for i, j in requires.items()):
+            raise ValueError(f'requires must be a dict of names to amounts (>= 0), not "{requires}"')
+        if not callable(merge) and merge not in self.MERGES:
+            raise ValueError(f'merge must be one of {self.MERGES} or a function, not "{merge}"')
+        if any(i not in self._get_args(func) for i in stream_input):
+            raise ValueError(f'stream_input must be parameters of the function, not "{stream_input}"')
+        if timeout is not None and not timeout > 0:
+            raise ValueError(f'timeout must be above 0 seconds or None, not "{timeout}"')
+        if not isinstance(retries, int) or retries < 0:
+            raise ValueError(f'retries must be an int >= 0, not "{retries}"')
         super().__init__(name, input, output)
         self.file = file.replace('\\', '/')
         self.func = func
+        self.pure = pure
+        self.cheap = cheap
+        self.resources = tuple(resources)
+        self.target = target
+        self.requires = dict(requires) if requires is not None else {}
+        self.batched = batched
+        self.rowwise = rowwise
+        self.merge = merge
+        self.streaming = streaming
+        self.stream_input = tuple(stream_input)
+        self.timeout = timeout
+        self.retries = retries
 
     def __repr__(self):
         return f'{self.__class__.__name__} at {hex(id(self))} with ({self.input})=>({str(self.output)})'
@@ -44,35 +95,51 @@ class Crumb(BakeryItem):
         crumb.from_json(json_str)
         return crumb
 
+    @classmethod
+    def create_from_dict(cls, json_obj: dict) -> Crumb:
+        """
+        Starts a Crumb based on an already decoded json structure
+        @param json_obj
+        """
+        def dummy_function():
+            return None
+        crumb = Crumb('dummy_function', '.', dummy_function, input=None, output=None)
+        crumb.from_dict(json_obj)
+        return crumb
+
     def load_from_file(self, filepath: str, this_name: str) -> None:
-        from crumb.repository import CrumbRepository  # in here to avoid recursive imports
-        crumb_repository = CrumbRepository()
-        # redirect crumbs creation to ensure we have the right function
-        crumbs_repo: dict = {}
-        redirect_status = crumb_repository.get_redirected()
-        crumb_repository.redirect({'target': crumbs_repo})
-        # load file to recover crumbs
-        _, pkg = os.path.split(filepath)
-        spec = spec_from_file_location(os.path.splitext(pkg)[0], filepath)
-        if spec is None:
-            raise RuntimeError('Cannot load file "{filepath}" with function.')
-        mod = module_from_spec(spec)
-        _ = spec.loader.exec_module(mod)  # type: ignore  # already handled above
+        if LoadCache.CURRENT is not None:
+            crumbs_repo = LoadCache.CURRENT.get_crumbs(filepath)
+        else:
+            crumbs_repo = load_crumbs_from_file(filepath)
         # get crumb
-        restored_crumb = crumb_repository.get_crumb(this_name)
+        restored_crumb = crumbs_repo[this_name]
         self.name = this_name
         self.input = restored_crumb.input
         self.output = restored_crumb.output
         self.file = filepath
         self.func = restored_crumb.func
-        # restore redirection
-        crumb_repository.redirect({'target': redirect_status})
+        self.pure = restored_crumb.pure
+        self.cheap = restored_crumb.cheap
+        self.resources = restored_crumb.resources
+        self.target = restored_crumb.target
+        self.requires = restored_crumb.requires
+        self.batched = restored_crumb.batched
+        self.rowwise = restored_crumb.rowwise
+        self.merge = restored_crumb.merge
+        self.streaming = restored_crumb.streaming
+        self.stream_input = restored_crumb.stream_input
+        self.timeout = restored_crumb.timeout
+        self.retries = restored_crumb.retries
 
     def from_json(self, json_str: str) -> None:
-        json_obj = json.loads(json_str)
+        self.from_dict(json.loads(json_str))
+
+    def from_dict(self, json_obj: dict) -> None:
         filepath = json_obj['executable_file']
         crumb_name = json_obj['name']
-        self.load_from_file(filepath, crumb_name)
+        with LoadCache.session():
+            self.load_from_file(filepath, crumb_name)
 
     def to_json(self) -> str:
         return json.dumps(self.to_dict())
@@ -87,19 +154,37 @@ class Crumb(BakeryItem):
     def reload(self) -> None:
         self.load_from_file(self.file, self.name)
 
-    def run(self, input) -> Any:
+    def run_stream(self, input: Dict[str, Any]) -> Any:
+        """
+        Call the function as it is: the inputs in stream_input are iterators over chunks, the output of a streaming crumb is its generator
+        @param input: {'input name': value}
+        """
         if self.func is None:
             self.reload()
+        if self.resources:
+            return self.func(**input, **{i: ResourcePool.get(i) for i in self.resources})
         return self.func(**input)
 
+    def run(self, input) -> Any:
+        if not self.streaming and not self.stream_input:
+            return self.run_stream(input)
+        from crumb.planner import merge_parts  # in here to avoid recursive imports
+        output = self.run_stream({i: iter([j]) if i in self.stream_input else j for i, j in input.items()})
+        if not self.streaming:
+            return output
+        chunks = list(output)
+        return merge_parts(self.merge, chunks) if chunks else []
+
     def _get_args(self, func: Callable) -> Dict[str, type]:
         sign = inspect.signature(func)
         return {k: v.default for k, v in sign.parameters.items()}
 
-    def _crumb_check_input(self, func: Callable, input: Optional[Dict[str, type]]) -> None:
+    def _crumb_check_input(self, func: Callable, input: Optional[Dict[str, type]], resources: Sequence[str] = ()) -> None:
         # check if input parameter is a dictionary
         if input is not None and not isinstance(input, dict):
             raise ValueError('input parameter must be dict, obtained' + str(type(input)))
+        if input is not None and any(i in input for i in resources):
+            raise ValueError('a resource cannot be an input: "' + '", "'.join(i for i in resources if i in input) + '"')
         # if there are inputs to be evaluated
         func_args = self._get_args(func)
         # check if all elements defined in input are in the function call:
@@ -112,10 +197,12 @@ class Crumb(BakeryItem):
             for i in input.keys():
                 if i not in func_args:
                     _not_valid.append(i)
+        if 'kwargs' not in func_args.keys():
+            _not_valid += [i for i in resources if i not in func_args]
         # then check for the ones that do not have a default parameter, and they must be in there
         _not_valid_missing = []
         for i, in_type in func_args.items():
-            if in_type is inspect.Parameter.empty:
+            if in_type is inspect.Parameter.empty and i not in resources:
                 if input is None or i not in input:
                     _not_valid_missing.append(i)
         # compile the relation of errors
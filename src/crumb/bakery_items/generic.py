@@ -3,6 +3,7 @@ Module generic
 Definition of generic class BakeryItem
 """
 from typing import Optional, Dict, Union, Any, List
+import weakref
 from crumb.node import Node
 
 
@@ -10,11 +11,28 @@ class BakeryItem:
     """
     Generic definition of BakeryItem.
     """
+    __slots__ = ('name', 'input', 'output', 'is_used_by')
+
     def __init__(self, name: str, input: Optional[Dict[str, type]], output: Union[type, Dict[str, type], None]):
         self.name = name
         self.input = input  # format is {'name': <type>}
         self.output = output  # this will look different depending on the class
-        self.is_used_by: List[Node] = []  # list of nodes
+        # nodes using this BakeryItem, they are owned by their Slice so only weak references are kept here
+        self.is_used_by: weakref.WeakSet = weakref.WeakSet()
+
+    def __getstate__(self):
+        # weak references cannot be pickled (e.g. sent to MultiSlicer), the copy starts without nodes using it
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for i in getattr(cls, '__slots__', ()):
+                if i != 'is_used_by' and hasattr(self, i):
+                    state[i] = getattr(self, i)
+        return state
+
+    def __setstate__(self, state):
+        for i, j in state.items():
+            setattr(self, i, j)
+        self.is_used_by = weakref.WeakSet()
 
     def run(self, input: Dict[str, Any]) -> Any:
         """
@@ -42,6 +60,13 @@ class BakeryItem:
         """
         raise NotImplementedError()
 
+    def from_dict(self, json_obj: dict) -> None:
+        """
+        Load this BakeryItem with definitions from an already decoded json structure
+        @param json_obj
+        """
+        raise NotImplementedError()
+
     def load_from_file(self, filepath: str, this_name: str) -> None:
         """
         Load this BakeryItem with definitions from a python source file
@@ -61,7 +86,7 @@ class BakeryItem:
         Identify that this BakeryItem is being used in a node
         @param node: obj
         """
-        self.is_used_by.append(node)
+        self.is_used_by.add(node)
 
     def remove_node_using(self, node) -> None:
         """
@@ -70,11 +95,11 @@ class BakeryItem:
         """
         self.is_used_by.remove(node)
 
-    def get_nodes_using(self) -> list:
+    def get_nodes_using(self) -> List[Node]:
         """
         Return list of nodes using this BakeryItem
         """
-        return self.is_used_by
+        return list(self.is_used_by)
 
     def is_being_used(self) -> bool:
         """
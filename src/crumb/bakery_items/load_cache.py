@@ -0,0 +1,147 @@
+"""
+Module load_cache
+Cache for the files read while loading slices.
+
+A Slice referencing other slices by filepath (and the crumbs inside them) would parse the files and execute
+the crumb modules once per reference. The LoadCache keeps what was already loaded, keyed by path and modification
+time, so each distinct file is read once. Sub-slices obtained from the cache are shared by every reference and
+are frozen: each usage has its own Node, the definition inside is the same object.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from importlib.util import spec_from_file_location, module_from_spec
+from typing import Dict, Tuple, Optional, Iterator, Any, List
+import os
+import threading
+
+from crumb.settings import Settings
+
+# the crumbs created while executing a file are redirected in the (single) repository, one file at a time
+# (the HybridSlicer threads reload the crumbs they run)
+_LOAD_LOCK = threading.RLock()
+
+
+def load_crumbs_from_file(filepath: str) -> Dict[str, Any]:
+    """
+    Execute a python source file and return the crumbs defined in it
+    @param filepath: the file
+    """
+    from crumb.repository import CrumbRepository  # in here to avoid recursive imports
+    crumb_repository = CrumbRepository()
+    # redirect crumbs creation to ensure we have the right function
+    crumbs_repo: dict = {}
+    with _LOAD_LOCK:
+        redirect_status = crumb_repository.get_redirected()
+        crumb_repository.redirect({'target': crumbs_repo})
+        try:
+            # load file to recover crumbs
+            _, pkg = os.path.split(filepath)
+            spec = spec_from_file_location(os.path.splitext(pkg)[0], filepath)
+            if spec is None:
+                raise RuntimeError(f'Cannot load file "{filepath}" with function.')
+            mod = module_from_spec(spec)
+            _ = spec.loader.exec_module(mod)  # type: ignore  # already handled above
+        finally:
+            # restore redirection
+            crumb_repository.redirect({'target': redirect_status})
+    return crumbs_repo
+
+
+class LoadCache:
+    """
+    Stores the crumb modules and the slices loaded from files, a file saved again replaces what was stored for it
+    """
+    # the cache used by the load happening now
+    CURRENT: Optional[LoadCache] = None
+    # the cache kept between loads if Settings.SLICE_CACHE_PER_PROCESS
+    PROCESS_INSTANCE: Optional[LoadCache] = None
+    # the crumb modules loaded before starting the MultiSlicer workers, shared with them by fork
+    PRELOADED: Optional[LoadCache] = None
+    # the crumb files preloaded by a forkserver (crumb.slicers.preload), separated by os.pathsep
+    PRELOAD_VARIABLE = 'CRUMB_PRELOAD'
+
+    def __init__(self):
+        # {(path, mtime): {'crumb name': Crumb}}
+        self.crumbs: Dict[Tuple[str, float], Dict[str, Any]] = {}
+        # {(path, mtime): Slice}
+        self.slices: Dict[Tuple[str, float], Any] = {}
+
+    @classmethod
+    @contextmanager
+    def session(cls) -> Iterator[LoadCache]:
+        """
+        Context for a load: the outermost call starts the cache, the nested ones (sub-slices) use it
+        """
+        if cls.CURRENT is not None:
+            yield cls.CURRENT
+            return
+        if Settings.SLICE_CACHE_PER_PROCESS:
+            if cls.PROCESS_INSTANCE is None:
+                cls.PROCESS_INSTANCE = LoadCache()
+            cls.CURRENT = cls.PROCESS_INSTANCE
+        else:
+            cls.CURRENT = LoadCache()
+        try:
+            yield cls.CURRENT
+        finally:
+            cls.CURRENT = None
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop the cache kept between loads"""
+        cls.PROCESS_INSTANCE = None
+
+    @classmethod
+    def preload(cls, filepaths: List[str]) -> LoadCache:
+        """
+        Load the crumbs of files (and the data of their modules) before starting processes, return the cache for them
+        @param filepaths: the python files
+        """
+        if cls.PRELOADED is None:
+            cls.PRELOADED = LoadCache()
+        for filepath in filepaths:
+            cls.PRELOADED.get_crumbs(filepath)
+        return cls.PRELOADED
+
+    def copy(self) -> LoadCache:
+        """Return a new cache with what is stored in this one"""
+        new_cache = LoadCache()
+        new_cache.crumbs.update(self.crumbs)
+        new_cache.slices.update(self.slices)
+        return new_cache
+
+    @staticmethod
+    def _key(filepath: str) -> Tuple[str, float]:
+        return os.path.abspath(filepath), os.path.getmtime(filepath)
+
+    @staticmethod
+    def _drop_older(store: Dict[Tuple[str, float], Any], key: Tuple[str, float]) -> None:
+        """Drop what is stored for the other versions of the file of key"""
+        for old_key in [i for i in store if i[0] == key[0]]:
+            del store[old_key]
+
+    def get_crumbs(self, filepath: str) -> Dict[str, Any]:
+        """
+        Return the crumbs defined in a file, the file is executed only the first time
+        @param filepath: the file
+        """
+        key = self._key(filepath)
+        if key not in self.crumbs:
+            self._drop_older(self.crumbs, key)
+            self.crumbs[key] = load_crumbs_from_file(filepath)
+        return self.crumbs[key]
+
+    def get_slice(self, filepath: str) -> Any:
+        """
+        Return the Slice stored in a file, the Slice is shared and cannot be edited
+        @param filepath: the file
+        """
+        from crumb.bakery_items.slice import Slice  # in here to avoid recursive imports
+        key = self._key(filepath)
+        if key not in self.slices:
+            slice = Slice(name=os.path.basename(filepath))
+            slice.load_from_file(filepath)
+            slice.frozen = True
+            self._drop_older(self.slices, key)
+            self.slices[key] = slice
+        return self.slices[key]
@@ -0,0 +1,91 @@
+"""Map
+This module implements the class Map, child of BakeryItem.
+
+A Map runs a Slice for each element of a collection, it is the parallel counterpart of using a Slice as a BakeryItem.
+In a Slice, the nodes of a Map are expanded once their input is known: the nodes of the inner Slice are sent to the slicer
+for each element, with at most `window` elements running at once, and the outputs are collected in lists in the order of the elements.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Optional
+import json
+
+from crumb.bakery_items.generic import BakeryItem
+from crumb.bakery_items.slice import Slice, _create_bi_from_instance
+from crumb.settings import Settings
+
+
+class Map(BakeryItem):
+    """
+    Runs a Slice for each element of a collection.
+    @param name: name given to the map
+    @param slice: the Slice run for each element
+    @param over: the input of the Slice given each element, the Map takes a list there, the other inputs are given to all the elements
+    @param window: the most elements running at once, Settings.MAP_WINDOW if None
+    The input and output are the ones of the Slice when the Map is created, each output is a list with the output of each element.
+    """
+    __slots__ = ('slice', 'over', 'window')
+
+    def __init__(self, name: str, slice: Slice, over: str, window: Optional[int] = None):
+        super().__init__(name, input=None, output=None)
+        self._set_slice(slice, over, window)
+
+    def _set_slice(self, slice: Slice, over: str, window: Optional[int]) -> None:
+        if over not in slice.input:
+            raise ValueError(f'Slice "{slice.name}" has no input "{over}"')
+        if window is not None and window < 1:
+            raise ValueError(f'window must be at least 1, not "{window}"')
+        self.input = {**slice.input, over: list}
+        self.output = {i: list for i in slice.output}
+        self.slice = slice
+        self.over = over
+        self.window = window
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} of {self.slice.name} over "{self.over}"'
+
+    def __str__(self):
+        return self.__repr__()
+
+    def get_window(self) -> int:
+        """Return the most elements running at once"""
+        return self.window if self.window is not None else Settings.MAP_WINDOW
+
+    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the Slice for each element, one after the other (in a Slice the elements are sent to the slicer)
+        @param input: {'input name': value}, a list for the input mapped over
+        """
+        outputs = self.slice.run_many([{**input, self.over: i} for i in input[self.over]])
+        return {i: [j[i] for j in outputs] for i in self.output}
+
+    @classmethod
+    def create_from_dict(cls, json_obj: dict) -> Map:
+        """
+        Starts a Map based on an already decoded json structure
+        @param json_obj
+        """
+        return cls(json_obj['name'], _create_bi_from_instance(json_obj['slice'], 'Slice'), json_obj['over'], json_obj['window'])  # type: ignore
+
+    def from_json(self, json_str: str) -> None:
+        self.from_dict(json.loads(json_str))
+
+    def from_dict(self, json_obj: dict) -> None:
+        self.name = json_obj['name']
+        self._set_slice(_create_bi_from_instance(json_obj['slice'], 'Slice'), json_obj['over'], json_obj['window'])  # type: ignore
+
+    def load_from_file(self, filepath: str, this_name: str) -> None:
+        raise RuntimeError(f'Map "{self.name}" is saved in the file of the Slice using it, load that Slice instead')
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'slice': self.slice.to_dict(),
+            'over': self.over,
+            'window': self.window
+        }
+
+    def reload(self) -> None:
+        self.slice.reload()
@@ -12,24 +12,44 @@ add and remove them based
 - input/output, their mappings, and link between Node:
 relate the different Node and the input/output of this Slice
 - serialiser and deserialiser to json, save and load
+- batch edits: many edits checked for circular links once, undone together if anything fails
+
+Files (version 3) hold a single structured document: nodes are referenced by their position in the
+"nodes" array and links are stored as arrays, files can also be written with msgpack if it is installed.
+Version 2 files (with the slice and bakery items as nested json strings) can still be loaded.
 """
+import asyncio
 import os
 import json
-from typing import Dict, List, Tuple, Optional, TypedDict, Any
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Set, Tuple, Optional, TypedDict, Any, Callable, Iterator, Iterable, Union, Container, AsyncIterator
 
 from crumb import __slice_serializer_version__
 
 from crumb.node import Node
+from crumb.checkpoints import CheckpointStore
+from crumb.planner import merge_common_nodes, find_constant_nodes, remove_known_nodes, get_source_stamp, fuse_chains
+from crumb.planner import find_mapped_nodes, MappedNode, partition_nodes, is_map, is_switch, group_streams, StreamNode
+from crumb.settings import Settings
+from crumb.graph import CompactGraph, TopologicalOrder
 from crumb.slicers.slicers import get_slicer
+from crumb.slicers.multislicer_functions import get_cpu_count
 from crumb.bakery_items.crumb import Crumb
 from crumb.bakery_items.generic import BakeryItem
+from crumb.bakery_items.load_cache import LoadCache
 from crumb.logger import LoggerQueue, log, logging
 
+try:
+    import msgpack
+except ImportError:  # binary slice files are optional
+    msgpack = None
 
-class NodeRepresentation(TypedDict):
-    """Representation of Nodes ins Slice.nodes"""
-    node: Node
-    instance_of: str
+
+class _IterationClosed(RuntimeError):
+    """The outputs of Slice.run_iter() are not read anymore, the execution stops"""
 
 
 class NodeDeps(TypedDict):
@@ -44,11 +64,68 @@ class BakeryItemStore(TypedDict):
     type: str
 
 
+def _type_eval(type_str: str) -> type:
+    """
+    eval is naturally unsafe. Checks were made to improve security
+    """
+    if not all(i.isalnum() or (i == '.') for i in type_str):
+        raise RuntimeError(f'Invalid type name "{type_str}"!')
+    type_evaluated = eval(type_str)
+    if type_evaluated.__class__.__name__ == 'type':
+        return type_evaluated
+    raise RuntimeError(f'Invalid type name "{type_str}"!')
+
+
+def _create_bi_from_instance(json_obj: Any, type: str) -> BakeryItem:
+    """
+    Start a BakeryItem from its structure
+    @param json_obj: dict (version 3) or json string (version 2 and below)
+    @param type: class name of the bakery item
+    """
+    if isinstance(json_obj, str):
+        json_obj = json.loads(json_obj)
+    if type == 'Crumb':
+        return Crumb.create_from_dict(json_obj)
+    if type == 'Slice':
+        if 'filepath' in json_obj:  # the same file is shared by all the references to it
+            return LoadCache.CURRENT.get_slice(json_obj['filepath'])  # type: ignore  # always called within a session
+        current_slice = Slice(name='_dummy')
+        current_slice.from_dict(json_obj)
+        return current_slice
+    if type == 'Map':
+        from crumb.bakery_items.map import Map  # pylint: disable=import-outside-toplevel  # the module of Map imports this one
+        return Map.create_from_dict(json_obj)
+    if type == 'Switch':
+        from crumb.bakery_items.switch import Switch  # pylint: disable=import-outside-toplevel  # the module of Switch imports this one
+        return Switch.create_from_dict(json_obj)
+    raise NotImplementedError('Can only handle Crumb, Slice, Map and Switch objects')
+
+
+def read_slice_file(filepath: str) -> dict:
+    """
+    Read the structure stored in a slice file, either json or msgpack
+    @param filepath: the file
+    """
+    with open(filepath, mode='rb') as open_file:
+        data = open_file.read()
+    if data.lstrip()[:1] == b'{':
+        return json.loads(data.decode('utf-8'))
+    if msgpack is None:
+        raise ImportError(f'"{filepath}" is not json, binary slice files require "msgpack" to be installed.')
+    return msgpack.unpackb(data, raw=False)
+
+
 class Slice(BakeryItem):
     """
     Slice module, an instance of BakeryItem
     This module can adds other BakeryItem's, define input/output and get the output of running the models.
     """
+    # the methods apply_edits() can call
+    EDITS = ('add_bakery_item', 'add_node', 'remove_node', 'add_input', 'remove_input', 'add_output', 'remove_output',
+             'add_input_mapping', 'remove_input_mapping', 'add_output_mapping', 'remove_output_mapping', 'add_link', 'remove_link')
+    # the arguments of EDITS that name a node
+    EDIT_NODE_ARGUMENTS = ('node_name', 'node_a', 'node_b')
+
     def __init__(self, name: str):
         # already defined here to maintain this definition throughout the code
         self.input: Dict[str, type] = {}
@@ -62,19 +139,42 @@ class Slice(BakeryItem):
         # an output can come from a single bakery_item
         # format: {'output_name': ('node name', 'Node output name'])}
         self._output_mapping: Dict[str, Optional[Tuple[str, str]]] = {}
+        # reverse of the mappings above, so edits to a node do not go through every mapping
+        # format: {'node name': {'input_name', ...}} and {'node name': {'output_name', ...}}
+        self._node_input_mapping: Dict[str, Set[str]] = {}
+        self._node_output_mapping: Dict[str, Set[str]] = {}
         # relation of all the bakeryitems added to this Slice
         # format: {'name given': {'bakery_item': bakery_item, 'type': class name of bakery item}}
         self.bakery_items: Dict[str, BakeryItemStore] = {}
-        # relation of nodes with instances of BakeryItems
-        # format: {'identifier': {'node': Node, 'instance_of': 'bakery item name'}}
-        self.nodes: Dict[str, NodeRepresentation] = {}
+        # relation of nodes with instances of BakeryItems (the bakery item name is in Node.instance_of)
+        # format: {'identifier': Node}
+        self.nodes: Dict[str, Node] = {}
         # whether the graph has been checked for execution before, and it is expect to run fine
         self._graph_checked: bool = False
         # these are the nodes that require input, if _graph_checked is True, they are in _input_mapping
         # format is {node: {'node var': 'node var type'}}
         self._required_input: Optional[Dict[Node, Dict[str, type]]] = None
+        # nodes sorted by dependencies, kept by add_node/remove_node/add_link (circular links are refused)
+        self._topological_order: TopologicalOrder = TopologicalOrder()
+        # adjacency in flat arrays (nodes in _topological_order), built when needed and dropped on changes to the graph
+        self._compact_graph: Optional[CompactGraph] = None
         self.last_execution_seq: Optional[List[NodeDeps]] = None
+        # what the planner did in the last run
+        # format: {'nodes': number of nodes, 'executed': nodes sent to the slicer, 'merged': nodes sharing the execution of another,
+        #          'cached': constant nodes with output from a previous run, 'fused': nodes run in the task of another node,
+        #          'partitioned': nodes run for each partition of the rows (in run_partitioned)}
+        self.last_execution_stats: Dict[str, int] = {}
+        # nodes of pure crumbs that do not depend on the input, None if not computed since the graph changed
+        self._constant_nodes: Optional[Set[str]] = None
+        # output of the constant nodes, kept between runs
+        # format: {'node name': (source stamp, {'output name': value})}
+        self._constant_results: Dict[str, Tuple[Any, Dict[Any, Any]]] = {}
         self.filepath: Optional[str] = None
+        # a frozen Slice is shared by other slices (see LoadCache) and cannot be edited
+        self.frozen: bool = False
+        # while in batch(): how to undo the edits done, None otherwise
+        # format: [(function, args)]
+        self._batch: Optional[List[Tuple[Callable, tuple]]] = None
 
     def __repr__(self):
         return f'{self.__class__.__name__} at {hex(id(self))} with {len(self.bakery_items)} crumbs and {len(self.nodes)} nodes'
@@ -82,146 +182,374 @@ class Slice(BakeryItem):
     def __str__(self):
         return self.__repr__()
 
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # the nodes are pickled with the names of the nodes they link to
+        for node in self.nodes.values():
+            node.relink(self.nodes)
+
     def from_json(self, json_str: str) -> None:
-        json_obj = json.loads(json_str)
+        self.from_dict(json.loads(json_str))
+
+    def from_dict(self, json_obj: dict) -> None:
+        self._check_not_frozen()
+        if self._batch is not None:
+            raise RuntimeError(f'Cannot load "{self.name}" during a batch of edits')
         self.version = __slice_serializer_version__
         self.name = json_obj['slice_name']
         # if it is a loaded/saved Slice lets reload from the original file
         if 'filepath' in json_obj:
             self.load_from_file(json_obj['filepath'], this_name=json_obj['slice_name'])
-        else:  # if it is not we'll need to load all the inside bits
-            # check types
-            def _type_eval(type_str):
-                """
-                eval is naturally unsafe. Checks were made to improve security
-                """
-                if not all(i.isalnum() or (i == '.') for i in type_str):
-                    raise RuntimeError(f'Invalid type name "{type_str}"!')
-                type_evaluated = eval(type_str)
-                if type_evaluated.__class__.__name__ == 'type':
-                    return type_evaluated
-                else:
-                    raise RuntimeError(f'Invalid type name "{type_str}"!')
-            # input/output
-            self.input = {i: _type_eval(j) for i, j in json_obj['input']['objects'].items()} if json_obj['input']['objects'] else {}
-            self.output = {i: _type_eval(j) for i, j in json_obj['output']['objects'].items()} if json_obj['output']['objects'] else {}
-            # start bakery items
-
-            def _create_bi_from_instance(json_str: str, type: type):
-                if type == 'Crumb':
-                    return Crumb.create_from_json(json_str)
-                if type == 'Slice':
-                    current_slice = Slice(name='_dummy')
-                    current_slice.from_json(json_str)
-                    return current_slice
-                raise NotImplementedError('Can only handle Crumb and Slice objects')
+            return
+        # if it is not we'll need to load all the inside bits
+        # input/output
+        self.input = {i: _type_eval(j) for i, j in json_obj['input']['objects'].items()} if json_obj['input']['objects'] else {}
+        self.output = {i: _type_eval(j) for i, j in json_obj['output']['objects'].items()} if json_obj['output']['objects'] else {}
+        # start bakery items, files referenced more than once are loaded once
+        with LoadCache.session():
             self.bakery_items = {i: {
                 'bakery_item': _create_bi_from_instance(j['bakery_item'], j['type']),
                 'type': j['type']
             } for i, j in json_obj['bakery_items'].items()} if json_obj['bakery_items'] else {}
-            self.nodes = {}
-            # first start the nodes
-            for node_name, node_data in json_obj['nodes'].items():
-                instance_of: str = node_data['instance_of']
-                save_exec, last_exec = node_data['save_exec'], node_data['last_exec']
-                new_node: Node = Node(bakery_item=self.bakery_items[instance_of]['bakery_item'], name=node_name)
-                new_node.last_exec = last_exec
-                new_node.save_exec = save_exec
-                self.nodes[new_node.name] = {'node': new_node, 'instance_of': instance_of}
-            # then start the links
-            for node_name, node_data in json_obj['nodes'].items():
-                link_str = node_data['link_str']
-                new_node = Node.get_node(Node.get_node_mapping(node_name))
-                new_node.links_from_json(link_str)
-            # translate the name of the nodes
-            self._input_mapping = {}
-            for input_name, data in json_obj['input']['mapping'].items():
-                self._input_mapping[input_name] = {}
-                for node_name, node_inputs in data.items():
-                    self._input_mapping[input_name][Node.get_node_mapping(node_name)] = node_inputs
-            self._output_mapping = {}
-            for output_name, (node_name, node_output_name) in json_obj['output']['mapping'].items():
-                self._output_mapping[output_name] = (Node.get_node_mapping(node_name), node_output_name)
+        self.nodes = {}
+        # version 2 nests named nodes in dicts, version 3 uses integer ids and arrays
+        if isinstance(json_obj['nodes'], dict):
+            self._nodes_from_dict_v2(json_obj)
+        else:
+            self._nodes_from_dict_v3(json_obj)
+        self._topological_order = TopologicalOrder.from_nodes(list(self.nodes.values()))
+        self._index_mappings()
+        self._graph_changed()
+
+    def _nodes_from_dict_v2(self, json_obj: dict) -> None:
+        """Start nodes, links and mappings from the version 2 structure (nodes are referenced by their old names)"""
+        # format: {'name in json_obj': Node}, only needed during this load
+        renamed: Dict[str, Node] = {}
+        # first start the nodes
+        for node_name, node_data in json_obj['nodes'].items():
+            instance_of: str = node_data['instance_of']
+            save_exec, last_exec = node_data['save_exec'], node_data['last_exec']
+            new_node: Node = Node(bakery_item=self.bakery_items[instance_of]['bakery_item'], instance_of=instance_of)
+            new_node.last_exec = last_exec
+            new_node.save_exec = save_exec
+            self.nodes[new_node.name] = new_node
+            renamed[node_name] = new_node
+        # then start the links
+        for node_name, node_data in json_obj['nodes'].items():
+            renamed[node_name].links_from_json(node_data['link_str'], renamed)
+        # translate the name of the nodes
+        self._input_mapping = {}
+        for input_name, data in json_obj['input']['mapping'].items():
+            self._input_mapping[input_name] = {}
+            for node_name, node_inputs in data.items():
+                self._input_mapping[input_name][renamed[node_name].name] = node_inputs
+        self._output_mapping = {i: None for i in self.output}
+        for output_name, mapping in json_obj['output']['mapping'].items():
+            if mapping is not None:
+                node_name, node_output_name = mapping
+                self._output_mapping[output_name] = (renamed[node_name].name, node_output_name)
+
+    def _nodes_from_dict_v3(self, json_obj: dict) -> None:
+        """Start nodes, links and mappings from the version 3 structure (nodes are referenced by their position)"""
+        nodes: List[Node] = []
+        for instance_of, save_exec, last_exec in json_obj['nodes']:
+            new_node = Node(bakery_item=self.bakery_items[instance_of]['bakery_item'], instance_of=instance_of)
+            new_node.last_exec = dict(last_exec) if last_exec else None
+            new_node.save_exec = save_exec
+            self.nodes[new_node.name] = new_node
+            nodes.append(new_node)
+        # links are [node a, node a output, node b, node b input]
+        for node_a, node_a_output, node_b, node_b_input in json_obj['links']:
+            nodes[node_a].add_output(this_output_name=node_a_output, other_node=nodes[node_b], other_node_variable=node_b_input)
+            nodes[node_b].add_input(this_variable=node_b_input, other_node=nodes[node_a], other_node_name=node_a_output)
+        # mappings are [slice input/output, node, node input/output]
+        self._input_mapping = {i: {} for i in self.input}
+        for input_name, node, node_input in json_obj['input']['mapping']:
+            self._input_mapping[input_name].setdefault(nodes[node].name, []).append(node_input)
+        self._output_mapping = {i: None for i in self.output}
+        for output_name, node, node_output in json_obj['output']['mapping']:
+            self._output_mapping[output_name] = (nodes[node].name, node_output)
+
+    def _index_mappings(self) -> None:
+        """Build the reverse of _input_mapping and _output_mapping"""
+        self._node_input_mapping = {}
+        for input_name, data in self._input_mapping.items():
+            for node_name in data:
+                self._node_input_mapping.setdefault(node_name, set()).add(input_name)
+        self._node_output_mapping = {}
+        for output_name, mapping in self._output_mapping.items():
+            if mapping is not None:
+                self._node_output_mapping.setdefault(mapping[0], set()).add(output_name)
 
     def to_json(self, tofile: bool = False) -> str:
         """Transform dictionary structure into json"""
         if tofile:
-            data_to_file = {
-                'version': __slice_serializer_version__,
-                'type': 'slice',
-                'slice': json.dumps(self.to_dict(tofile=tofile))
-            }
-            return json.dumps(data_to_file)
+            return json.dumps(self._to_file_dict())
         return json.dumps(self.to_dict(tofile=tofile))
 
+    def _to_file_dict(self) -> dict:
+        """Return the structure saved to files: a header with the slice as a single structured document"""
+        return {
+            'version': __slice_serializer_version__,
+            'type': 'slice',
+            'slice': self.to_dict(tofile=True)
+        }
+
     def to_dict(self, tofile: bool = False) -> dict:
         if self.filepath and not tofile:
-            this_structure = {
+            return {
                 'slice_name': self.name,
                 'filepath': self.filepath
             }
-        else:
-            this_structure = {
-                'slice_name': self.name,
-                'input': {
-                    'objects': {i: j.__name__ for i, j in self.input.items()} if self.input else {},
-                    'mapping': self._input_mapping
-                },
-                'output': {
-                    'objects': {i: j.__name__ for i, j in self.output.items()} if self.output else {},
-                    'mapping': self._output_mapping
-                },
-                'bakery_items': {i: {
-                    'bakery_item': j['bakery_item'].to_json(),
-                    'type': j['type']
-                } for i, j in self.bakery_items.items()} if self.bakery_items else {},
-                'nodes': {i: {
-                    'instance_of': j['instance_of'],
-                    'link_str': j['node'].links_to_json(),
-                    'save_exec': j['node'].save_exec,
-                    'last_exec': j['node'].last_exec
-                } for i, j in self.nodes.items()}
-            }
+        # nodes are referenced by their position in 'nodes'
+        node_ids = {node_name: i for i, node_name in enumerate(self.nodes)}
+        links = []
+        for node_name, node in self.nodes.items():
+            for node_input, other_node_data in node.input.items():
+                if other_node_data is not None:
+                    other_node, other_node_output = other_node_data
+                    links.append([node_ids[other_node.name], other_node_output, node_ids[node_name], node_input])
+        this_structure = {
+            'slice_name': self.name,
+            'input': {
+                'objects': {i: j.__name__ for i, j in self.input.items()} if self.input else {},
+                'mapping': [[input_name, node_ids[node_name], node_input]
+                            for input_name, data in self._input_mapping.items()
+                            for node_name, node_inputs in data.items()
+                            for node_input in node_inputs]
+            },
+            'output': {
+                'objects': {i: j.__name__ for i, j in self.output.items()} if self.output else {},
+                'mapping': [[output_name, node_ids[mapping[0]], mapping[1]]
+                            for output_name, mapping in self._output_mapping.items() if mapping is not None]
+            },
+            'bakery_items': {i: {
+                'bakery_item': j['bakery_item'].to_dict(),
+                'type': j['type']
+            } for i, j in self.bakery_items.items()} if self.bakery_items else {},
+            # format: [instance_of, save_exec, [[output name, value], ...]]
+            'nodes': [[j.instance_of, j.save_exec, list(j.last_exec.items()) if j.last_exec else []] for j in self.nodes.values()],
+            # format: [node a, node a output, node b, node b input]
+            'links': links
+        }
         return this_structure
 
     def load_from_file(self, filepath: str, this_name: str = None) -> None:
-        """Load the current object from a file using the from_json method"""
-        with open(filepath, mode='r', encoding="utf-8") as open_file:
-            json_obj = json.loads(open_file.read())
-            if json_obj['type'] != 'slice':
-                raise ImportError('Invalid type being loaded')
-            if json_obj['version'] > __slice_serializer_version__:
-                raise ImportError('Imported file has a higher version')
-            self.from_json(json_obj['slice'])
+        """Load the current object from a file using the from_dict method"""
+        json_obj = read_slice_file(filepath)
+        if json_obj['type'] != 'slice':
+            raise ImportError('Invalid type being loaded')
+        if json_obj['version'] > __slice_serializer_version__:
+            raise ImportError('Imported file has a higher version')
+        with LoadCache.session():
+            if isinstance(json_obj['slice'], str):  # version 2 and below store the slice as a json string
+                self.from_json(json_obj['slice'])
+            else:
+                self.from_dict(json_obj['slice'])
         self.filepath = filepath
 
-    def save_to_file(self, path: str, overwrite: bool = False) -> None:
-        """Save the current object to a file using the to_json method"""
+    def save_to_file(self, path: str, overwrite: bool = False, binary: bool = False) -> None:
+        """
+        Save the current object to a file
+        @param path: the file
+        @param overwrite: replace the file if it exists
+        @param binary: use msgpack instead of json (requires msgpack)
+        """
         if not overwrite:
             if os.path.exists(path):
                 raise FileExistsError(f'File {path} already exists. Use parameter "overwrite" to replace.')
-        with open(path, mode='w', encoding="utf-8") as open_file:
-            open_file.write(self.to_json(tofile=True))
+        if binary:
+            if msgpack is None:
+                raise ImportError('Binary slice files require "msgpack" to be installed.')
+            with open(path, mode='wb') as open_file:
+                open_file.write(msgpack.packb(self._to_file_dict(), use_bin_type=True))
+        else:
+            with open(path, mode='w', encoding="utf-8") as open_file:
+                open_file.write(self.to_json(tofile=True))
         self.filepath = path
 
     def reload(self):
         for i in self.bakery_items.values():
             i['bakery_item'].reload()
+        self._graph_changed()
 
-    def run(self, input: Dict[str, Any] = None) -> Dict[str, Any]:
+    def run(self, input: Dict[str, Any] = None, resume: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run this Slice
+        @param input: {'input name': value}
+        @param resume: a run id, the output of each node is kept on disk for it (see crumb.checkpoints) and the nodes with an output
+        kept by a previous run with this id (with the same input and crumb) are not run again
+        """
         if input is None:
             input = {}
+        return self.run_many([input], resume)[0]
+
+    def run_many(self, inputs: Iterable[Dict[str, Any]], resume: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Run this Slice for each input, the execution sequence is computed once and the constant nodes are run once
+        If there are batched crumbs the inputs are run in micro-batches (Settings.SLICE_BATCH_SIZE and SLICE_BATCH_LATENCY),
+        the batched crumbs are called once for each micro-batch
+        @param inputs: [{'input name': value}], or any iterable of them
+        @param resume: a run id to keep the outputs on disk and resume from them, as in run()
+        """
+        self.last_execution_seq = self._compute_execution_seq()
+        if not self._has_batched_crumbs():
+            return [self._run_seq(self.last_execution_seq, i, resume=resume) for i in inputs]
+        outputs: List[Dict[str, Any]] = []
+        for records in self._micro_batches(inputs):
+            columns = {i: [j[i] for j in records] for i in records[0] if all(i in j for j in records)}
+            outputs += self._run_seq(self.last_execution_seq, columns, n_records=len(records), resume=resume)
+        return outputs
+
+    def run_partitioned(self, input: Dict[str, Any], partitioned: Iterable[str], n_partitions: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run this Slice with some inputs split in partitions of rows (e.g. a DataFrame, a list or an array)
+        The nodes of row-wise crumbs (@crumb(rowwise=True)) using them run for each partition, and the slicer can run the partitions
+        at once (e.g. in the MultiSlicer workers), the output of the partitions is recombined with the merge of the crumb
+        (concat, sum or a function) for the nodes needing the whole data and for the output
+        @param input: {'input name': value}
+        @param partitioned: the names of the inputs split in partitions
+        @param n_partitions: number of partitions, Settings.SLICE_PARTITIONS if None (0 for the number of CPUs), at most the number of rows
+        """
+        partitioned = set(partitioned)
+        if not partitioned <= set(self.input):
+            raise ValueError(f'Slice {self} has no inputs "{partitioned - set(self.input)}"')
+        if n_partitions is None:
+            n_partitions = Settings.SLICE_PARTITIONS or get_cpu_count()
+        n_partitions = max(1, min([n_partitions, *(len(input[i]) for i in partitioned if i in input)]))
         self.last_execution_seq = self._compute_execution_seq()
+        return self._run_seq(self.last_execution_seq, input, partitioned=partitioned, n_partitions=n_partitions)
+
+    def run_iter(self, input: Dict[str, Any] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Run this Slice, yielding (output name, value) as soon as the node of each output finished, the other nodes keep running
+        Closing the iterator before the end stops the execution: the nodes not started do not run (in the MultiSlicer the tasks
+        given to the workers finish without their output)
+        @param input: {'input name': value}
+        """
+        outputs: queue.Queue = queue.Queue()
+        closed = self._start_iter(input if input is not None else {}, outputs.put)
+        try:
+            while True:
+                output_name, value = outputs.get()
+                if output_name is None:
+                    if value is not None:
+                        raise value
+                    return
+                yield output_name, value
+        finally:
+            closed.set()
+
+    async def run_iter_async(self, input: Dict[str, Any] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run this Slice, yielding (output name, value) as soon as the node of each output finished, as run_iter() in an event loop
+        The execution runs in a thread, the event loop is not blocked while waiting for the outputs
+        @param input: {'input name': value}
+        """
+        loop = asyncio.get_running_loop()
+        outputs: asyncio.Queue = asyncio.Queue()
+        closed = self._start_iter(input if input is not None else {}, lambda item: loop.call_soon_threadsafe(outputs.put_nowait, item))
+        try:
+            while True:
+                output_name, value = await outputs.get()
+                if output_name is None:
+                    if value is not None:
+                        raise value
+                    return
+                yield output_name, value
+        finally:
+            closed.set()
+
+    def _start_iter(self, input: Dict[str, Any], put: Callable[[Tuple[Optional[str], Any]], None]) -> threading.Event:
+        """
+        Start the execution in a thread, give (output name, value) to put for each output when known, then (None, None) at the end
+        or (None, error) if it failed, return the event to set to stop the execution
+        @param input: {'input name': value}
+        @param put: called from the thread with each item
+        """
+        closed = threading.Event()
+        # format: {'node name': [('output name', 'node output name'), ...]}
+        outputs: Dict[str, List[Tuple[str, Any]]] = {}
+        for output_name, (node_name, node_output_name) in self._output_mapping.items():
+            outputs.setdefault(node_name, []).append((output_name, node_output_name))
+        given: Set[str] = set()
+
+        def on_result(node_name: str, output: Dict[Any, Any]) -> None:
+            if closed.is_set():
+                raise _IterationClosed(f'the outputs of {self} are not read anymore')
+            for output_name, node_output_name in outputs.get(node_name, []):
+                if output_name not in given:
+                    given.add(output_name)
+                    put((output_name, output[node_output_name]))
+
+        def run() -> None:
+            try:
+                self.last_execution_seq = self._compute_execution_seq()
+                for output_name, value in self._run_seq(self.last_execution_seq, input, on_result=on_result).items():
+                    if output_name not in given:
+                        put((output_name, value))
+                put((None, None))
+            except _IterationClosed:
+                return
+            except Exception as error:  # pylint: disable=broad-except
+                put((None, error))
+        threading.Thread(target=run, name=f'Slice-{self.name}', daemon=True).start()
+        return closed
+
+    def _has_batched_crumbs(self) -> bool:
+        """Return whether a node of this Slice (or of a Slice inside it) is a batched crumb"""
+        for node in self.nodes.values():
+            if getattr(node.bakery_item, 'batched', False):
+                return True
+            if isinstance(node.bakery_item, Slice) and node.bakery_item._has_batched_crumbs():  # pylint: disable=protected-access
+                return True
+        return False
+
+    @staticmethod
+    def _micro_batches(inputs: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Return the inputs in lists of Settings.SLICE_BATCH_SIZE, a list is also returned when its first input waited
+        Settings.SLICE_BATCH_LATENCY seconds (checked when an input arrives)
+        @param inputs: iterable of {'input name': value}
+        """
+        records: List[Dict[str, Any]] = []
+        started = 0.
+        for record in inputs:
+            if not records:
+                started = time.monotonic()
+            records.append(record)
+            if len(records) >= Settings.SLICE_BATCH_SIZE or time.monotonic() - started >= Settings.SLICE_BATCH_LATENCY:
+                yield records
+                records = []
+        if records:
+            yield records
+
+    def _run_seq(self, task_seq: List[NodeDeps], input: Dict[str, Any], n_records: Optional[int] = None,
+                 partitioned: Container[str] = (), n_partitions: int = 1, on_result: Callable[[str, Dict[Any, Any]], None] = None,
+                 resume: Optional[str] = None) -> Any:
+        """
+        Run the execution sequence for an input, or for many records at once
+        @param task_seq: from _compute_execution_seq()
+        @param input: {'input name': value}, or {'input name': [value for each record]} if n_records is given
+        @param n_records: number of records in input, the output is then [{'output name': value} for each record]
+        @param partitioned: the inputs split in n_partitions partitions of rows for the row-wise crumbs
+        @param n_partitions: number of partitions
+        @param on_result: called with the name and the output of each node as soon as it is known (see Slicer.add_work)
+        @param resume: a run id, the outputs are kept on disk for it and the ones kept before are used (see crumb.checkpoints)
+        """
         # these will go to the slicer
         pre_computed_results = {}  # {(node_name, node_input): value}
+        input_sources = {}  # {(node_name, node_input): input name}
         _missing_input = []  # in case something is missing
         for name, data in self._input_mapping.items():
-            for node_name, node_input in data.items():
+            for node_name, node_inputs in data.items():
                 if name not in input:
                     _missing_input.append(name)
-                else:
-                    log(LoggerQueue.get_logger(), f'slicer will get ---> {(node_name, node_input[0])}', logging.DEBUG)
-                    pre_computed_results[(node_name, node_input[0])] = input[name]
+                    continue
+                for node_input in node_inputs:
+                    log(LoggerQueue.get_logger(), f'slicer will get ---> {(node_name, node_input)}', logging.DEBUG)
+                    pre_computed_results[(node_name, node_input)] = input[name]
+                    input_sources[(node_name, node_input)] = name
         if len(_missing_input) > 0:
             raise RuntimeError(f'Missing inputs to Slice {self}, add variables: "{_missing_input}"')
         _extra_input = []
@@ -235,15 +563,104 @@ class Slice(BakeryItem):
             log(LoggerQueue.get_logger(), f'{self} has no inputs: "{_extra_input}"', logging.WARNING)
         if len(_input_not_used) > 0:
             log(LoggerQueue.get_logger(), f'{self} is not using inputs: "{_input_not_used}"', logging.WARNING)
-        # print(self.last_execution_seq)
+        n_nodes = len(task_seq)
+        checkpoints: Optional[CheckpointStore] = None
+        # format: {'node name': 'fingerprint'}
+        fingerprints: Dict[str, str] = {}
+        if resume is not None:
+            checkpoints = CheckpointStore(resume)
+            fingerprints = checkpoints.fingerprint(task_seq, input, input_sources)
+        # format: {'node name': {'node input name with a value for each record', ...}}
+        mapped: Dict[str, Set[str]] = {}
+        if n_records is not None:
+            mapped = find_mapped_nodes(task_seq, input_sources)
+            task_seq = [{'node': MappedNode(i['node'], mapped[i['node'].name], n_records), 'deps': i['deps']}  # type: ignore
+                        if i['node'].name in mapped else i for i in task_seq]
+        constant_nodes: Set[str] = set()
+        known_results: Dict[str, Dict[Any, Any]] = {}
+        if Settings.PLANNER_CACHE_CONSTANT_NODES:
+            constant_nodes = self._get_constant_nodes()
+            known_results = self._get_constant_results(constant_nodes)
+            task_seq = remove_known_nodes(task_seq, known_results, pre_computed_results)
+        n_cached = len(known_results)
+        if checkpoints is not None:
+            # the outputs kept by the previous runs are used as the cached ones
+            resumed = {i: j for i, j in checkpoints.get(fingerprints).items() if i not in known_results}
+            task_seq = remove_known_nodes(task_seq, resumed, pre_computed_results)
+            known_results.update(resumed)
+        aliases: Dict[str, List[str]] = {}
+        if Settings.PLANNER_MERGE_PURE_NODES:
+            task_seq, aliases = merge_common_nodes(task_seq, input_sources)
+        n_executed = len(task_seq)
         task_executor = get_slicer()
-        results = task_executor.add_work(task_seq=self.last_execution_seq, inputs_required=pre_computed_results)
-        log(LoggerQueue.get_logger(), f'Results of slice execution are: {results}', logging.DEBUG)
+        # the nodes whose output is used here: mapped to the output, cached and merged (the nodes saving their output get it if it comes back)
+        used = {i[0] for i in self._output_mapping.values() if i is not None} | constant_nodes | set(aliases) | {j for i in aliases.values() for j in i}
+        keep = set(used)
+        if checkpoints is not None:
+            # each output is written when known, the MultiSlicer sends them back from the workers
+            keep |= set(fingerprints)
+            on_result = checkpoints.writer(fingerprints, known_results, on_result)
+        partitioned_nodes: Set[str] = set()
+        if partitioned:
+            task_seq, pre_computed_results, partitioned_nodes = partition_nodes(task_seq, pre_computed_results, input_sources, partitioned,
+                                                                                n_partitions, aliases, keep)
+        n_streamed = 0
+        if any(getattr(i['node'].bakery_item, 'streaming', False) for i in task_seq):
+            # the chunks of a streaming crumb are recombined only if its output is used (not to save it in the node)
+            task_seq, pre_computed_results = group_streams(task_seq, pre_computed_results, aliases, used)
+            n_streamed = sum(len(i['node'].nodes) for i in task_seq if isinstance(i['node'], StreamNode))
+        n_tasks = len(task_seq)
+        if Settings.PLANNER_FUSE_CHAINS and task_executor.FUSE_CHAINS:
+            ends: Set[str] = set()
+            if on_result is not None:
+                # the outputs given when known end the chains, and the nodes used by other branches (they would wait for the chain)
+                n_users: Dict[str, int] = {}
+                for dependency in (j for i in task_seq for j in set(i['deps'])):
+                    n_users[dependency] = n_users.get(dependency, 0) + 1
+                ends = {i[0] for i in self._output_mapping.values() if i is not None} | {i for i, j in n_users.items() if j > 1}
+            task_seq, pre_computed_results = fuse_chains(task_seq, pre_computed_results, keep, ends)
+        self.last_execution_stats = {'nodes': n_nodes, 'executed': n_executed, 'merged': sum(len(i) for i in aliases.values()),
+                                     'cached': n_cached, 'fused': n_tasks - len(task_seq)}
+        if checkpoints is not None:
+            self.last_execution_stats['resumed'] = len(known_results) - n_cached
+        if partitioned:
+            self.last_execution_stats['partitioned'] = len(partitioned_nodes)
+        if n_streamed:
+            self.last_execution_stats['streamed'] = n_streamed
+        if on_result is not None:
+            for node_name, output in known_results.items():
+                on_result(node_name, output)
+        results = task_executor.add_work(task_seq=task_seq, inputs_required=pre_computed_results, aliases=aliases, keep=keep,
+                                         on_result=on_result)
+        # the nodes of a Map or Switch were expanded by the slicer, the node collecting their output took their name
+        for node in (i['node'] for i in task_seq if is_map(i['node']) or is_switch(i['node'])):
+            if node.save_exec and node.name in results:
+                node.last_exec = results[node.name]
+        # the nodes merged or cached did not run
+        for node_name in [j for i in aliases.values() for j in i] + list(known_results):
+            if self.nodes[node_name].save_exec:
+                self.nodes[node_name].last_exec = results.get(node_name, known_results.get(node_name))
+        # the nodes run for each partition keep the output merged
+        for node_name in partitioned_nodes:
+            if self.nodes[node_name].save_exec and node_name in results:
+                self.nodes[node_name].last_exec = results[node_name]
+        # the nodes run for each record keep the output of the last record
+        for node_name in mapped:
+            if self.nodes[node_name].save_exec and node_name in results:
+                self.nodes[node_name].last_exec = {i: j[-1] for i, j in results[node_name].items()}
+        results.update(known_results)
+        for node_name in constant_nodes:
+            if node_name not in known_results and node_name in results:
+                self._constant_results[node_name] = (get_source_stamp(self.nodes[node_name].bakery_item), results[node_name])
+        log(LoggerQueue.get_logger(), 'Results of slice execution are:', logging.DEBUG, payload=results)
         # obtain output for this slice:
         results_to_return = {}
         for output_name, (node_name, node_output_name) in self._output_mapping.items():
             results_to_return[output_name] = results[node_name][node_output_name]
-        return results_to_return
+        if n_records is None:
+            return results_to_return
+        return [{i: j[k] if self._output_mapping[i][0] in mapped else j for i, j in results_to_return.items()}  # type: ignore
+                for k in range(n_records)]
 
     def add_bakery_item(self, name: str, bakery_item: BakeryItem) -> None:
         """
@@ -251,34 +668,52 @@ class Slice(BakeryItem):
         @param name: name to be used here
         @param bakery_item: bakery_item name
         """
+        self._check_not_frozen()
         if not isinstance(bakery_item, BakeryItem):
             raise ValueError(f'Object needs to be instance of class BakeryItem, it is "{bakery_item.__class__.__name__}"')
         if name in self.bakery_items:
             raise ValueError(f'A bakery item with name "{name}" is already in this Slice ({self.name})')
         self.bakery_items[name] = {'bakery_item': bakery_item,
                                    'type': bakery_item.__class__.__name__}
+        self._journal(self.bakery_items.pop, name)
 
     def add_node(self, bi_name: str) -> str:
         """Add node to graph and returns its name
         @param bi_name: the name of the BakeryItem of reference"""
-        new_node = Node(self.bakery_items[bi_name]['bakery_item'])
-        self.nodes[new_node.name] = {'node': new_node,
-                                     'instance_of': bi_name}
+        self._check_not_frozen()
+        new_node = Node(self.bakery_items[bi_name]['bakery_item'], instance_of=bi_name)
+        self.nodes[new_node.name] = new_node
+        self._topological_order.add(new_node)
+        self._journal(self.remove_node, new_node.name)
+        self._graph_changed()
         return new_node.name
 
     def remove_node(self, node_name: str) -> None:
         """Remove node from graph (only works if it is not linked)"""
-        for i in self._input_mapping.values():
-            if node_name in i:
-                raise RuntimeError(f'Cannot remove "{node_name}", it is linked to input!')
-        for j in self._output_mapping.values():
-            if j is not None:
-                if node_name in j:
-                    raise RuntimeError(f'Cannot remove "{node_name}", it is linked to output!')
-        if self.nodes[node_name]['node'].has_links():
+        self._check_not_frozen()
+        if self._node_input_mapping.get(node_name):
+            raise RuntimeError(f'Cannot remove "{node_name}", it is linked to input!')
+        if self._node_output_mapping.get(node_name):
+            raise RuntimeError(f'Cannot remove "{node_name}", it is linked to output!')
+        if self.nodes[node_name].has_links():
             raise RuntimeError(f'Cannot remove "{node_name}", it is connected to other nodes!')
-        self.nodes[node_name]['node'].bakery_item.remove_node_using(self.nodes[node_name]['node'])
-        self.nodes.pop(node_name)
+        node = self.nodes.pop(node_name)
+        node.bakery_item.remove_node_using(node)
+        self._topological_order.remove(node)
+        self._journal(self._restore_node, node)
+        self._graph_changed()
+
+    def _restore_node(self, node: Node) -> None:
+        """Add back a node removed from this slice (without links)"""
+        self.nodes[node.name] = node
+        node.bakery_item.add_node_using(node)
+        self._topological_order.add(node)
+        self._graph_changed()
+
+    def _check_not_frozen(self) -> None:
+        """Check if this Slice can be edited"""
+        if self.frozen:
+            raise RuntimeError(f'"{self.name}" is shared by other slices and cannot be edited, load it from its file to edit it')
 
     def _check_input_exists(self, name: str, check_mapping: bool = True) -> None:
         """
@@ -314,57 +749,70 @@ class Slice(BakeryItem):
         if node_name not in self.nodes:
             raise RuntimeError(f'"{node_name}" not in slice')
         if node_input is not None:
-            if node_input not in self.nodes[node_name]['node'].input.keys():
+            if node_input not in self.nodes[node_name].input.keys():
                 raise RuntimeError(f'"{node_input}" not in "{node_name}" input list')
         if node_output is not None:
-            if node_output not in self.nodes[node_name]['node'].output.keys():
+            if node_output not in self.nodes[node_name].output.keys():
                 raise RuntimeError(f'"{node_output}" not in "{node_name}" output list')
 
+    def _get_compact_graph(self) -> CompactGraph:
+        """Return the adjacency of the nodes in flat arrays"""
+        if self._compact_graph is None:
+            self._compact_graph = CompactGraph(list(self._topological_order))
+        return self._compact_graph
+
+    def _graph_changed(self) -> None:
+        """Invalidate what was computed about the graph"""
+        self._graph_checked = False
+        self._compact_graph = None
+        self._constant_nodes = None
+        self._constant_results = {}
+
+    def _get_constant_nodes(self) -> Set[str]:
+        """Return the nodes of pure crumbs that do not depend on the input of this Slice"""
+        if self._constant_nodes is None:
+            self._constant_nodes = find_constant_nodes(self._compute_execution_seq(), self._node_input_mapping)
+        return self._constant_nodes
+
+    def _get_constant_results(self, constant_nodes: Set[str]) -> Dict[str, Dict[Any, Any]]:
+        """
+        Return the output of the constant nodes kept from previous runs, if their crumb and the crumbs before them did not change
+        @param constant_nodes: from _get_constant_nodes()
+        """
+        stale = {i for i, (stamp, _) in self._constant_results.items()
+                 if i not in constant_nodes or stamp != get_source_stamp(self.nodes[i].bakery_item)}
+        if stale:
+            # the nodes after a crumb that changed were computed with its old output
+            for node in self._topological_order:
+                if any(i is not None and i[0].name in stale for i in node.input.values()):
+                    stale.add(node.name)
+        for node_name in stale:
+            self._constant_results.pop(node_name, None)
+        return {i: output for i, (_, output) in self._constant_results.items()}
+
     def _check_graph_circular(self) -> int:
         """Return number of components in graph while checking if it is circular"""
         if len(self.nodes) == 0:
             return 0
-        # format is: {name of node: component id}
-        visited: Dict[str, int] = {}
-        max_it = 0
-        for i, stack_start in enumerate(self.nodes.keys()):
-            if stack_start in visited:
-                continue
-            stack = [stack_start]
-            while len(stack) > 0:
-                current = stack.pop(0)
-                # for each {'output name': {node, ['input name', ...]}}
-                for element_with_output in self.nodes[current]['node'].output.values():
-                    # for each {node, [...]}
-                    for out_node, _ in element_with_output.items():
-                        if (out_node.name in visited) and (visited[out_node.name] == i):
-                            raise RuntimeError(f'"{out_node.name}" already explored, graph is circular')
-                        if out_node.name not in visited:
-                            stack.append(out_node.name)
-                            visited[out_node.name] = i
-            max_it = i
-        return max_it
+        compact_graph = self._get_compact_graph()
+        compact_graph.topological_order()  # raises if circular
+        return compact_graph.n_components()
 
     def _get_nodes_missing_input(self, only_in_output: bool = True) -> Dict[Node, Dict[str, type]]:
-        stack: List[Node] = []
+        compact_graph = self._get_compact_graph()
         if only_in_output:
-            stack = [self.nodes[node]['node'] for node, _ in self._output_mapping.values()]
+            nodes = compact_graph.ancestors(compact_graph.position[self.nodes[node].id] for node, _ in filter(None, self._output_mapping.values()))
         else:
-            stack = [i['node'] for i in self.nodes.values()]
+            nodes = range(len(compact_graph))
         # format is {node: {'node var': 'node var type'}}
         input_undefined: Dict[Node, Dict[str, type]] = {}
-        visited = set(stack)
-        while len(stack) > 0:
-            current = stack.pop(0)
+        for i in nodes:
+            current = compact_graph.nodes[i]
             for inp, data in current.input.items():
                 if data is None:
                     if current not in input_undefined:
                         input_undefined[current] = {}
                     input_undefined[current][inp] = current.bakery_item.input[inp]
-                else:
-                    other_node = data[0]
-                    visited.add(other_node)
-                    stack.append(other_node)
         # these are the inputs missing within the graph
         return input_undefined
 
@@ -374,7 +822,7 @@ class Slice(BakeryItem):
         # remove the ones that will be given on the run call
         for _, data in self._input_mapping.items():
             for node_name, vars in data.items():
-                node = self.nodes[node_name]['node']
+                node = self.nodes[node_name]
                 if node in input_undefined:
                     for i in vars:
                         input_undefined[node].pop(i)
@@ -386,7 +834,7 @@ class Slice(BakeryItem):
             raise RuntimeError(f'Input is undefined for at least one node:\n"{err}"')
 
     def _check_graph(self) -> None:
-        self._check_graph_circular()
+        # circular links are refused by add_link, only the input is left to check
         self._check_input_complete()
         self._graph_checked = True
 
@@ -395,10 +843,10 @@ class Slice(BakeryItem):
             self._check_graph()  # in case of error an exception will be raised
         # format is: [{'node': node_id, 'deps': [node_id_1, node_id_2, ...]}]
         nodes_seq: List[NodeDeps] = []
-        # start from slice input
-        for node in self.nodes.values():
-            this: NodeDeps = {'node': node['node'], 'deps': []}
-            for _, data in node['node'].input.items():
+        # nodes come after their dependencies
+        for node in self._topological_order:
+            this: NodeDeps = {'node': node, 'deps': []}
+            for _, data in node.input.items():
                 if data is not None:  # if none comes from slice!
                     this['deps'].append(data[0].name)
             nodes_seq.append(this)
@@ -412,20 +860,23 @@ class Slice(BakeryItem):
         @param name: name
         @param type: object type
         """
+        self._check_not_frozen()
         if name in self.input:
             raise RuntimeError(f'"{name}" already in input list')
         self.input[name] = type
         self._input_mapping[name] = {}
-        self._graph_checked = False
+        self._journal(self.remove_input, name)
+        self._graph_changed()
 
     def remove_input(self, name: str) -> None:
         """
         Remove Slice input
         @param name: name
         """
+        self._check_not_frozen()
         # if doesn't exist or in mapping not good to remove
         self._check_input_exists(name, check_mapping=True)
-        self.input.pop(name)
+        self._journal(self.add_input, name, self.input.pop(name))
         self._input_mapping.pop(name)
 
     def add_output(self, name: str, type: type) -> None:
@@ -434,19 +885,22 @@ class Slice(BakeryItem):
         @param name: name
         @param type: object type
         """
+        self._check_not_frozen()
         if name in self.output:
             raise RuntimeError(f'"{name}" already in output list')
         self.output[name] = type
         self._output_mapping[name] = None
-        self._graph_checked = False
+        self._journal(self.remove_output, name)
+        self._graph_changed()
 
     def remove_output(self, name: str) -> None:
         """
         Remove Slice output
         @param name: name
         """
+        self._check_not_frozen()
         self._check_output_exists(name, check_mapping=True)  # if doesn't exist or in mapping not good to remove
-        self.output.pop(name)
+        self._journal(self.add_output, name, self.output.pop(name))
         self._output_mapping.pop(name)
     #
 
@@ -458,11 +912,12 @@ class Slice(BakeryItem):
         @param node_name: name of the node
         @param node_input: name of the node input
         """
+        self._check_not_frozen()
         # check for existance
         self._check_input_exists(name, check_mapping=False)
         self._check_node_exists(node_name, node_input=node_input)
         # check for types
-        node = self.nodes[node_name]['node']
+        node = self.nodes[node_name]
         if self.input[name] != node.get_input_type(node_input):
             raise RuntimeError(f'"{name}" has got different type than input for node "{node_name}" (input: {node_input}).'
                                + f'types are: "{self.input[name]}" and "{node.input[node_input]}"')
@@ -471,6 +926,9 @@ class Slice(BakeryItem):
         if node_name not in self._input_mapping[name]:
             self._input_mapping[name][node_name] = []
         self._input_mapping[name][node_name].append(node_input)
+        self._node_input_mapping.setdefault(node_name, set()).add(name)
+        self._journal(self.remove_input_mapping, name, node_name, node_input)
+        self._graph_changed()
 
     def remove_input_mapping(self, name: str, node_name: str, node_input: str) -> None:
         """
@@ -479,13 +937,20 @@ class Slice(BakeryItem):
         @param node_name: name of the node
         @param node_input: name of the node input
         """
+        self._check_not_frozen()
         self._check_input_exists(name, check_mapping=False)
         if node_name not in self._input_mapping[name]:
             raise RuntimeError(f'"{node_name} not in input mapping')
+        if node_input not in self._input_mapping[name][node_name]:
+            raise RuntimeError(f'"{node_input}" of "{node_name}" not in input mapping')
         self._input_mapping[name][node_name].remove(node_input)
         if len(self._input_mapping[name][node_name]) == 0:
             self._input_mapping[name].pop(node_name)
-        self._graph_checked = False
+            self._node_input_mapping[node_name].discard(name)
+            if not self._node_input_mapping[node_name]:
+                self._node_input_mapping.pop(node_name)
+        self._journal(self.add_input_mapping, name, node_name, node_input)
+        self._graph_changed()
 
     def add_output_mapping(self, name: str, node_name: str, node_output: str) -> None:
         """
@@ -494,16 +959,20 @@ class Slice(BakeryItem):
         @param node_name: the name of the node
         @param node_output: the name of the node output
         """
+        self._check_not_frozen()
         # check for existance
         self._check_output_exists(name, check_mapping=True)
         self._check_node_exists(node_name, node_output=node_output)
         # check for types
-        node = self.nodes[node_name]['node']
+        node = self.nodes[node_name]
         if self.output[name] != node.get_output_type(node_output):
             raise RuntimeError(f'"{name}" has got different type than output for node "{node_name}" (output {node_output}).'
                                + f' types are: "{self.output[name]}" and "{node.output[node_output]}"')
         if self._output_mapping[name] is None:
             self._output_mapping[name] = (node_name, node_output)
+            self._node_output_mapping.setdefault(node_name, set()).add(name)
+            self._journal(self.remove_output_mapping, name, node_name, node_output)
+        self._graph_changed()
 
     def remove_output_mapping(self, name: str, node_name: str, node_output: str) -> None:
         """
@@ -512,13 +981,18 @@ class Slice(BakeryItem):
         @param node_name: name of the node
         @param node_output: name of the node output
         """
+        self._check_not_frozen()
         self._check_output_exists(name, check_mapping=False)
-        if node_name != self._output_mapping[name][0]:
+        if self._output_mapping[name] is None or node_name != self._output_mapping[name][0]:
             raise RuntimeError(f'"{node_name}" not in output mapping')
         if node_output != self._output_mapping[name][1]:
             raise RuntimeError(f'Cannot remove: another element was in the output, not "{node_output}"')
         self._output_mapping[name] = None
-        self._graph_checked = False
+        self._node_output_mapping[node_name].discard(name)
+        if not self._node_output_mapping[node_name]:
+            self._node_output_mapping.pop(node_name)
+        self._journal(self.add_output_mapping, name, node_name, node_output)
+        self._graph_changed()
     #
 
     # link
@@ -530,12 +1004,20 @@ class Slice(BakeryItem):
         @param nodeB: second node
         @param nodeB_output: second node output name
         """
+        self._check_not_frozen()
         self._check_node_exists(node_a, node_output=node_a_output)
         self._check_node_exists(node_b, node_input=node_b_input)
-        node_a_found = self.nodes[node_a]['node']
-        node_b_found = self.nodes[node_b]['node']
-        node_a_found.add_output(this_output_name=node_a_output, other_node=node_b_found, other_node_variable=node_b_input)
+        node_a_found = self.nodes[node_a]
+        node_b_found = self.nodes[node_b]
+        # raises if circular, the order is updated before the link is done (and is also valid without it)
+        # in a batch the order is computed once at the end
+        if self._batch is None:
+            self._topological_order.add_link(node_a_found, node_b_found)
+        # the input is checked (and set) first, adding to the output cannot fail after it
         node_b_found.add_input(this_variable=node_b_input, other_node=node_a_found, other_node_name=node_a_output)
+        node_a_found.add_output(this_output_name=node_a_output, other_node=node_b_found, other_node_variable=node_b_input)
+        self._journal(self.remove_link, node_a, node_a_output, node_b, node_b_input)
+        self._graph_changed()
 
     def remove_link(self, node_a: str, node_a_output: str, node_b: str, node_b_input: str) -> None:
         """
@@ -545,10 +1027,81 @@ class Slice(BakeryItem):
         @param nodeB: second node
         @param nodeB_output: second node output name
         """
+        self._check_not_frozen()
         self._check_node_exists(node_a, node_output=node_a_output)
         self._check_node_exists(node_b, node_input=node_b_input)
-        node_a_found = self.nodes[node_a]['node']
-        node_b_found = self.nodes[node_b]['node']
+        node_a_found = self.nodes[node_a]
+        node_b_found = self.nodes[node_b]
+        if node_b_found.input[node_b_input] != (node_a_found, node_a_output):
+            raise RuntimeError(f'"{node_b}" (input {node_b_input}) is not linked to "{node_a}" (output {node_a_output})')
         node_a_found.remove_output(this_output_name=node_a_output, other_node=node_b_found, other_node_variable=node_b_input)
         node_b_found.remove_input(this_variable=node_b_input)
-        self._graph_checked = False
+        self._journal(self.add_link, node_a, node_a_output, node_b, node_b_input)
+        self._graph_changed()
+    #
+
+    # batch
+    @contextmanager
+    def batch(self) -> Iterator['Slice']:
+        """
+        Context for many edits: circular links are checked once at the end, if that or any edit fails all the edits are undone
+        Nested calls are part of the outermost batch
+        """
+        self._check_not_frozen()
+        if self._batch is not None:
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+            self._topological_order = TopologicalOrder.from_nodes(list(self.nodes.values()))  # raises if circular
+        except BaseException:
+            self._rollback()
+            raise
+        finally:
+            self._batch = None
+
+    def _journal(self, undo: Callable, *args) -> None:
+        """
+        Keep how to undo an edit while in batch()
+        @param undo: function undoing the edit
+        @param args: arguments for undo
+        """
+        if self._batch is not None:
+            self._batch.append((undo, args))
+
+    def _rollback(self) -> None:
+        """Undo the edits of the current batch"""
+        journal, self._batch = self._batch, []  # undoing is also journaled, to a list that is dropped
+        for undo, args in reversed(journal):
+            undo(*args)
+        self._topological_order = TopologicalOrder.from_nodes(list(self.nodes.values()))
+
+    def apply_edits(self, edits: List[Tuple[str, Dict[str, Any]]]) -> list:
+        """
+        Apply edits in a batch and return what each returned, nothing is applied if one fails
+        Nodes added by the edits can be referenced by the position of their add_node edit (int) in the arguments that name a node
+        @param edits: [('method in EDITS', {'argument': value})],
+                      e.g. [('add_node', {'bi_name': 'a'}), ('add_output_mapping', {'name': 'out', 'node_name': 0, 'node_output': None})]
+        """
+        results: List[Any] = []
+        with self.batch():
+            for edit, arguments in edits:
+                if edit not in self.EDITS:
+                    raise ValueError(f'"{edit}" is not an edit, use one of: {", ".join(self.EDITS)}')
+                arguments = {i: self._edit_node_name(results, j) if i in self.EDIT_NODE_ARGUMENTS else j for i, j in arguments.items()}
+                results.append(getattr(self, edit)(**arguments))
+        return results
+
+    @staticmethod
+    def _edit_node_name(results: list, node: Union[str, int]) -> str:
+        """
+        Return the name of a node given by apply_edits
+        @param results: what the edits applied so far returned
+        @param node: node name or position of the add_node edit
+        """
+        if isinstance(node, int):
+            if not 0 <= node < len(results) or not isinstance(results[node], str):
+                raise ValueError(f'Edit {node} did not add a node')
+            return results[node]
+        return node
@@ -0,0 +1,116 @@
+"""Switch
+This module implements the class Switch, child of BakeryItem.
+
+A Switch runs one of its Slices (the cases) chosen by the value of an input, the other cases are not run.
+In a Slice, the node of a Switch is expanded once its input is known: only the nodes of the selected case are sent to the slicer,
+so a cheap check upstream decides which branch is computed. The nodes after the Switch wait only for that case.
+A Switch without a case for the value (and without a default) is a guard: its outputs are None and no node of the cases runs.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Hashable, Optional, Tuple
+import json
+
+from crumb.bakery_items.generic import BakeryItem
+from crumb.bakery_items.slice import Slice, _create_bi_from_instance
+
+
+class Switch(BakeryItem):
+    """
+    Runs the Slice of the case selected by an input.
+    @param name: name given to the switch
+    @param cases: the Slice run for each value of the input "on", format: {value: Slice}, the values are saved in json
+    @param on: the input selecting the case, it is not given to the Slices
+    @param default: the Slice run if no case has the value, if None the outputs are None
+    The input is "on" and the inputs of all the cases (each case gets the ones it has), the cases must have the same outputs.
+    """
+    __slots__ = ('cases', 'on', 'default')
+
+    def __init__(self, name: str, cases: Dict[Hashable, Slice], on: str, default: Optional[Slice] = None):
+        super().__init__(name, input=None, output=None)
+        self._set_cases(cases, on, default)
+
+    def _set_cases(self, cases: Dict[Hashable, Slice], on: str, default: Optional[Slice]) -> None:
+        slices = [*cases.values(), *([default] if default is not None else [])]
+        if not slices:
+            raise ValueError(f'Switch "{self.name}" needs at least a case')
+        for slice in slices:
+            if set(slice.output) != set(slices[0].output):
+                raise ValueError(f'Slice "{slice.name}" has outputs "{set(slice.output)}", the other cases "{set(slices[0].output)}"')
+            if on in slice.input:
+                raise ValueError(f'Slice "{slice.name}" has an input "{on}", it selects the case')
+        self.input: Dict[str, type] = {on: object}
+        for slice in slices:
+            self.input.update({i: j for i, j in slice.input.items() if i not in self.input})
+        self.output = dict(slices[0].output)
+        self.cases = cases
+        self.on = on
+        self.default = default
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} on "{self.on}" ({len(self.cases)} cases)'
+
+    def __str__(self):
+        return self.__repr__()
+
+    def get_case(self, value: Any) -> Optional[Slice]:
+        """
+        Return the Slice run for a value of the input "on", None if the outputs are None
+        @param value: the value
+        """
+        try:
+            return self.cases.get(value, self.default)
+        except TypeError:  # not hashable, no case can have it
+            return self.default
+
+    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the Slice of the case selected (in a Slice only the nodes of this case are sent to the slicer)
+        @param input: {'input name': value}
+        """
+        slice = self.get_case(input[self.on])
+        if slice is None:
+            return {i: None for i in self.output}
+        return slice.run({i: j for i, j in input.items() if i in slice.input})
+
+    @classmethod
+    def create_from_dict(cls, json_obj: dict) -> Switch:
+        """
+        Starts a Switch based on an already decoded json structure
+        @param json_obj
+        """
+        return cls(json_obj['name'], *cls._cases_from_dict(json_obj))
+
+    def from_json(self, json_str: str) -> None:
+        self.from_dict(json.loads(json_str))
+
+    def from_dict(self, json_obj: dict) -> None:
+        self.name = json_obj['name']
+        self._set_cases(*self._cases_from_dict(json_obj))
+
+    def load_from_file(self, filepath: str, this_name: str) -> None:
+        raise RuntimeError(f'Switch "{self.name}" is saved in the file of the Slice using it, load that Slice instead')
+
+    @staticmethod
+    def _cases_from_dict(json_obj: dict) -> Tuple[Dict[Hashable, Slice], str, Optional[Slice]]:
+        """Return the cases, the input selecting them and the default from the structure of to_dict()"""
+        # format: [[value, Slice], ...], the values are not all valid keys in json
+        cases = {value: _create_bi_from_instance(slice, 'Slice') for value, slice in json_obj['cases']}
+        default = _create_bi_from_instance(json_obj['default'], 'Slice') if json_obj['default'] is not None else None
+        return cases, json_obj['on'], default  # type: ignore
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'cases': [[value, slice.to_dict()] for value, slice in self.cases.items()],
+            'on': self.on,
+            'default': self.default.to_dict() if self.default is not None else None
+        }
+
+    def reload(self) -> None:
+        for slice in self.cases.values():
+            slice.reload()
+        if self.default is not None:
+            self.default.reload()
@@ -0,0 +1,154 @@
+"""
+Module checkpoints
+Outputs of the nodes of a Slice kept on disk while it runs, the same run given again (Slice.run(..., resume=run id)) skips the
+nodes already done, e.g. after a crumb failed hours into a run.
+
+The outputs of a run are in a folder named by its run id, a file for each node named by the fingerprint of the node: its crumb
+(name and modification time of its file) and its input, the output of the nodes before it by their fingerprint and the input of
+the Slice by a digest of its bytes. A node whose input or crumb changed gets another fingerprint, its old output is not used.
+The files are written with the module named by Settings.CHECKPOINT_FORMAT (dumps and loads, e.g. 'pickle' or 'cloudpickle'),
+the nodes with an input or output it cannot write are run again.
+When a run starts, the runs not used for Settings.CHECKPOINT_MAX_AGE seconds and the oldest ones past Settings.CHECKPOINT_MAX_RUNS
+are deleted.
+"""
+from typing import Dict, List, Any, Optional, Tuple, Callable
+import hashlib
+import importlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from crumb.logger import LoggerQueue, log, logging
+from crumb.planner import get_source_stamp
+from crumb.settings import Settings
+from crumb.slicers.generic import TaskDependencies
+
+
+class CheckpointStore:
+    """
+    The outputs kept for a run id
+    """
+    def __init__(self, run_id: str):
+        """
+        @param run_id: name of the run, letters, digits, '.', '_' and '-'
+        """
+        if not re.fullmatch(r'[\w.-]+', run_id) or run_id in ('.', '..'):
+            raise ValueError(f'Invalid run id "{run_id}", use letters, digits, ".", "_" and "-"')
+        self.root = self.get_root()
+        self.directory = os.path.join(self.root, run_id)
+        self.serializer = importlib.import_module(Settings.CHECKPOINT_FORMAT)
+        os.makedirs(self.directory, exist_ok=True)
+        os.utime(self.directory)  # used now, the retention goes by the last use
+        self.evict()
+
+    @staticmethod
+    def get_root() -> str:
+        """Return the folder with a folder for each run"""
+        return Settings.CHECKPOINT_DIR if Settings.CHECKPOINT_DIR is not None else os.path.join(tempfile.gettempdir(), 'crumb-checkpoints')
+
+    def evict(self) -> None:
+        """Delete the runs not used for Settings.CHECKPOINT_MAX_AGE seconds and the oldest runs past Settings.CHECKPOINT_MAX_RUNS"""
+        runs: List[Tuple[float, str]] = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.path != self.directory:
+                try:
+                    runs.append((entry.stat().st_mtime, entry.path))
+                except OSError:  # deleted meanwhile
+                    continue
+        runs.sort(reverse=True)
+        now = time.time()
+        # this run is kept, it counts as the most recent one
+        for i, (used, path) in enumerate(runs):
+            if i + 1 >= Settings.CHECKPOINT_MAX_RUNS or now - used > Settings.CHECKPOINT_MAX_AGE:
+                log(LoggerQueue.get_logger(), f'checkpoints> deleting run {path}', logging.INFO)
+                shutil.rmtree(path, ignore_errors=True)
+
+    def delete(self) -> None:
+        """Delete the outputs of this run"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _digest(self, value: Any) -> Optional[str]:
+        """Return the digest of the bytes of a value, None if the format cannot write it"""
+        try:
+            return hashlib.sha256(self.serializer.dumps(value)).hexdigest()
+        except Exception:  # pylint: disable=broad-except  # the nodes using it are not checkpointed
+            return None
+
+    def fingerprint(self, task_seq: List[TaskDependencies], input: Dict[str, Any], input_sources: Dict[Tuple[str, str], str]) -> Dict[str, str]:
+        """
+        Return the fingerprint of each node, the nodes with an input that cannot be written (or using such a node) have none
+        @param task_seq: execution sequence with nodes after their dependencies
+        @param input: the input of the Slice, format is {'input name': value}
+        @param input_sources: the Slice input given to the nodes, format is {(node_name, node_input): 'slice input name'}
+        """
+        digests = {i: self._digest(j) for i, j in input.items() if i in set(input_sources.values())}
+        # format: {'node name': 'fingerprint'}
+        fingerprints: Dict[str, str] = {}
+        # the same crumb with the same input in two nodes (e.g. not pure), format: {'fingerprint': times seen}
+        seen: Dict[str, int] = {}
+        for task in task_seq:
+            node = task['node']
+            parts = [node.bakery_item.__class__.__name__, node.bakery_item.name, get_source_stamp(node.bakery_item)]
+            for input_name, other_node_data in sorted(node.input.items(), key=lambda i: str(i[0])):
+                if other_node_data is not None:
+                    parts.append((input_name, fingerprints.get(other_node_data[0].name), other_node_data[1]))
+                elif (node.name, input_name) in input_sources:
+                    parts.append((input_name, digests[input_sources[(node.name, input_name)]]))
+                else:
+                    continue  # the function default is used
+                if parts[-1][1] is None:
+                    break
+            else:
+                fingerprint = hashlib.sha256(repr(parts).encode()).hexdigest()
+                seen[fingerprint] = seen.get(fingerprint, 0) + 1
+                fingerprints[node.name] = f'{fingerprint}-{seen[fingerprint]}'
+        return fingerprints
+
+    def get(self, fingerprints: Dict[str, str]) -> Dict[str, Dict[Any, Any]]:
+        """
+        Return the outputs kept for the nodes
+        @param fingerprints: from fingerprint()
+        """
+        outputs = {}
+        for node_name, fingerprint in fingerprints.items():
+            try:
+                with open(os.path.join(self.directory, fingerprint), 'rb') as file:
+                    outputs[node_name] = self.serializer.loads(file.read())
+            except FileNotFoundError:
+                continue
+            except Exception:  # pylint: disable=broad-except  # e.g. written with another format, the node runs again
+                log(LoggerQueue.get_logger(), f'checkpoints> cannot read the output of {node_name}', logging.WARNING)
+        return outputs
+
+    def put(self, fingerprint: str, output: Dict[Any, Any]) -> None:
+        """
+        Keep the output of a node, the file is replaced at once so a run stopped while writing does not leave it partly written
+        @param fingerprint: the fingerprint of the node
+        @param output: its output
+        """
+        try:
+            data = self.serializer.dumps(output)
+        except Exception:  # pylint: disable=broad-except  # the node runs again when resuming
+            log(LoggerQueue.get_logger(), f'checkpoints> cannot write the output {fingerprint}', logging.WARNING)
+            return
+        path = os.path.join(self.directory, fingerprint)
+        with open(f'{path}.tmp', 'wb') as file:
+            file.write(data)
+        os.replace(f'{path}.tmp', path)
+
+    def writer(self, fingerprints: Dict[str, str], skip: Dict[str, Any],
+               on_result: Optional[Callable[[str, Dict[Any, Any]], None]]) -> Callable[[str, Dict[Any, Any]], None]:
+        """
+        Return the function given to the slicer (see Slicer.add_work) keeping the output of each node when known
+        @param fingerprints: from fingerprint()
+        @param skip: the nodes not kept again (e.g. their output comes from this store)
+        @param on_result: called after keeping the output, or None
+        """
+        def write(node_name: str, output: Dict[Any, Any]) -> None:
+            if node_name in fingerprints and node_name not in skip:
+                self.put(fingerprints[node_name], output)
+            if on_result is not None:
+                on_result(node_name, output)
+        return write
@@ -5,22 +5,41 @@ import inspect
 from crumb import settings
 from crumb.logger import log, LoggerQueue, logging
 from crumb.repository import CrumbRepository
+from crumb.resources import ResourcePool
 
 
 # decorator to add breadr functionality to functions
-def crumb(_func=None, *, output, input=None, name=None):
+def crumb(_func=None, *, output, input=None, name=None, pure=False, cheap=False, resources=(), target=None, requires=None, batched=False,
+          rowwise=False, merge='concat', streaming=False, stream_input=(), timeout=None, retries=0):
     """
     Decorator that adds crumb reference to a function
     @param _func: the function under the decorator
     @param output: the output of the function, int, float, class, ..., obtained from type()
     @param input: the input of the function: {'param1': int, 'param2': class, ...}
     @param name: short name for this function
+    @param pure: the function output depends only on its input (no side effects), nodes with the same input can be run once
+    @param cheap: the function is fast, a slicer can run it right after the node giving its input instead of scheduling it
+    @param resources: names of resources (crumb.resources.resource) given to the function as the parameters with the same name
+    @param target: where the HybridSlicer runs it, 'inline', 'thread' or 'process' (None for Settings.HYBRIDSLICER_DEFAULT_TARGET)
+    @param requires: amounts of named resources used while it runs, e.g. {'cpu': 4, 'memory': 2e9, 'license': 1}, the slicers run at once
+                     the tasks fitting in Settings.SLICER_BUDGETS (a crumb limited to N at a time requires {'its name': 1} with a budget of N)
+    @param batched: the function takes a list (or array) for each input, with a value for each record, and returns a sequence with the
+                    output of each record, Slice.run_many calls it once for many records (Settings.SLICE_BATCH_SIZE)
+    @param rowwise: the output for some rows of the input is the output for these rows, Slice.run_partitioned runs it on each partition
+                    of the rows of the partitioned inputs (the crumbs that are not row-wise get the whole data)
+    @param merge: how the output of the partitions (or the chunks of a streaming crumb) is recombined where the whole output is needed:
+                  'concat', 'sum' or a function taking the list of outputs
+    @param streaming: the function is a generator yielding its output in chunks, in a Slice the crumbs taking them as a stream run
+                      at the same time, connected by bounded channels (Settings.STREAM_CHANNEL_SIZE chunks)
+    @param stream_input: the parameters given as an iterator over the chunks of a streaming crumb (a whole value is a single chunk)
+    @param timeout: seconds a run can take in the MultiSlicer, a worker running it longer is stopped and replaced (None for no limit)
+    @param retries: times the MultiSlicer runs it again after it raised, timed out or its worker stopped, before the error is raised
     """
     # check if the decorator is inside a function/class or on top level of file. this is needed to be able to reload
     context = inspect.getframeinfo(inspect.currentframe().f_back, context=1)
     context_filename = context.filename
     context_function = context.function
-    if settings.Settings.USE_MULTISLICER:
+    if settings.Settings.USE_MULTISLICER or target == 'process':
         if context_function != '<module>':
             raise RuntimeError(f'When using multislicer, @crumb decorator must be used in a file top level (not inside "{context_function}")')
         if context_filename == '<stdin>':
@@ -32,19 +51,30 @@ def crumb(_func=None, *, output, input=None, name=None):
         CrumbRepository().add_crumb(name=name,
                                     func=func,
                                     input=input,
-                                    output=output)
+                                    output=output,
+                                    pure=pure,
+                                    cheap=cheap,
+                                    resources=resources,
+                                    target=target,
+                                    requires=requires,
+                                    batched=batched,
+                                    rowwise=rowwise,
+                                    merge=merge,
+                                    streaming=streaming,
+                                    stream_input=stream_input,
+                                    timeout=timeout,
+                                    retries=retries)
 
         @functools.wraps(func)
         def wrapper_function(*args, **kwargs):
             # safeguard the function, more functionality can be added here later, e.g. error checking
+            for resource_name in resources:
+                if resource_name not in kwargs:
+                    kwargs[resource_name] = ResourcePool.get(resource_name)
             value = func(*args, **kwargs)
             return value
         return wrapper_function
     if _func is None:  # decorator called with arguments
         return decorator_add
     # decorator called without arguments
-    CrumbRepository().add_crumb(name=name,
-                                func=_func,
-                                input=input,
-                                output=output)
     return decorator_add(_func)
@@ -0,0 +1,227 @@
+"""
+Module graph
+Compact representation of the links between nodes used for traversals.
+
+Nodes keep their links in dicts (by port) to be edited, traversing those dicts for large graphs is slow and
+allocates a lot. CompactGraph numbers the nodes 0..n-1 and keeps the adjacency in flat arrays (CSR):
+the successors of the node at position i are out_targets[out_offsets[i]:out_offsets[i + 1]].
+
+TopologicalOrder keeps the nodes sorted by their dependencies while links are added (Pearce-Kelly),
+a link that would make the graph circular is found by looking only at the nodes between its two ends.
+"""
+from __future__ import annotations
+from array import array
+from collections import deque
+from typing import Dict, List, Iterable, Iterator, Optional
+
+from crumb.node import Node
+
+
+class CompactGraph:
+    """
+    Read-only adjacency of a list of nodes, build it again after editing the nodes
+    """
+    __slots__ = ('nodes', 'position', 'out_offsets', 'out_targets', 'in_offsets', 'in_targets')
+
+    def __init__(self, nodes: List[Node]):
+        """
+        @param nodes: the nodes, links to nodes that are not in this list are ignored
+        """
+        self.nodes = nodes
+        # format: {node id: position}
+        self.position: Dict[int, int] = {node.id: i for i, node in enumerate(nodes)}
+        # one edge per link, a node linked twice to another has two edges
+        edges_from = array('l')
+        edges_to = array('l')
+        for i, node in enumerate(nodes):
+            for other_node_data in node.input.values():
+                if other_node_data is not None and other_node_data[0].id in self.position:
+                    edges_from.append(self.position[other_node_data[0].id])
+                    edges_to.append(i)
+        self.out_offsets, self.out_targets = self._compress(len(nodes), edges_from, edges_to)
+        self.in_offsets, self.in_targets = self._compress(len(nodes), edges_to, edges_from)
+
+    @staticmethod
+    def _compress(n_nodes: int, sources: array, targets: array):
+        """Return offsets and targets (CSR) for the edges sources[i] -> targets[i]"""
+        offsets = array('l', [0]) * (n_nodes + 1)
+        for i in sources:
+            offsets[i + 1] += 1
+        for i in range(n_nodes):
+            offsets[i + 1] += offsets[i]
+        compressed = array('l', [0]) * len(sources)
+        fill = offsets[:-1]
+        for source, target in zip(sources, targets):
+            compressed[fill[source]] = target
+            fill[source] += 1
+        return offsets, compressed
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def successors(self, i: int) -> array:
+        """
+        Return the position of the nodes using the output of the node at position i
+        @param i: position
+        """
+        return self.out_targets[self.out_offsets[i]:self.out_offsets[i + 1]]
+
+    def predecessors(self, i: int) -> array:
+        """
+        Return the position of the nodes linked to the input of the node at position i
+        @param i: position
+        """
+        return self.in_targets[self.in_offsets[i]:self.in_offsets[i + 1]]
+
+    def topological_order(self) -> List[int]:
+        """
+        Return the positions of the nodes in an order where every node comes after the nodes it depends on
+        Raises RuntimeError if the graph is circular
+        """
+        in_degree = array('l', (self.in_offsets[i + 1] - self.in_offsets[i] for i in range(len(self.nodes))))
+        stack = [i for i, degree in enumerate(in_degree) if degree == 0]
+        order: List[int] = []
+        while stack:
+            current = stack.pop()
+            order.append(current)
+            for other in self.successors(current):
+                in_degree[other] -= 1
+                if in_degree[other] == 0:
+                    stack.append(other)
+        if len(order) != len(self.nodes):
+            circular = [self.nodes[i].name for i, degree in enumerate(in_degree) if degree > 0]
+            raise RuntimeError(f'Graph is circular, check: "{circular}"')
+        return order
+
+    def ancestors(self, starts: Iterable[int]) -> List[int]:
+        """
+        Return the positions of starts and every node they depend on
+        @param starts: positions
+        """
+        visited = set(starts)
+        stack = deque(visited)
+        while stack:
+            current = stack.popleft()
+            for other in self.predecessors(current):
+                if other not in visited:
+                    visited.add(other)
+                    stack.append(other)
+        return sorted(visited)
+
+    def n_components(self) -> int:
+        """Return the number of (weakly) connected components"""
+        visited = set()
+        n_components = 0
+        for start in range(len(self.nodes)):
+            if start in visited:
+                continue
+            n_components += 1
+            visited.add(start)
+            stack = [start]
+            while stack:
+                current = stack.pop()
+                for other in (*self.successors(current), *self.predecessors(current)):
+                    if other not in visited:
+                        visited.add(other)
+                        stack.append(other)
+        return n_components
+
+
+class TopologicalOrder:
+    """
+    Order of the nodes where every node comes after the nodes it depends on, updated on each edit
+    """
+    __slots__ = ('nodes', 'position', 'n_removed')
+
+    def __init__(self):
+        # removed nodes leave a None until the list is compacted
+        # format: [Node or None]
+        self.nodes: List[Optional[Node]] = []
+        # format: {Node: index in self.nodes}
+        self.position: Dict[Node, int] = {}
+        self.n_removed = 0
+
+    @classmethod
+    def from_nodes(cls, nodes: List[Node]) -> TopologicalOrder:
+        """
+        Return the order for linked nodes (loaded without add_link)
+        Raises RuntimeError if the graph is circular
+        @param nodes: the nodes
+        """
+        new_order = cls()
+        compact_graph = CompactGraph(nodes)
+        for i in compact_graph.topological_order():
+            new_order.add(nodes[i])
+        return new_order
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def __iter__(self) -> Iterator[Node]:
+        return (node for node in self.nodes if node is not None)
+
+    def add(self, node: Node) -> None:
+        """
+        Add a node without links at the end
+        @param node: the node
+        """
+        self.position[node] = len(self.nodes)
+        self.nodes.append(node)
+
+    def remove(self, node: Node) -> None:
+        """
+        Remove a node without links
+        @param node: the node
+        """
+        self.nodes[self.position.pop(node)] = None
+        self.n_removed += 1
+        if self.n_removed > len(self.position):
+            self.nodes = [i for i in self.nodes if i is not None]
+            self.position = {i: j for j, i in enumerate(self.nodes)}
+            self.n_removed = 0
+
+    def add_link(self, node_a: Node, node_b: Node) -> None:
+        """
+        Place node_a before node_b, only the nodes between them in the current order are visited
+        Raises RuntimeError (and keeps the order) if node_b already leads to node_a
+        The new order is also valid without the link, it can be called before the link is done
+        @param node_a: node with the output
+        @param node_b: node with the input
+        """
+        if node_a is node_b:
+            raise RuntimeError(f'Cannot link "{node_a.name}" to itself, graph would be circular')
+        lower, upper = self.position[node_b], self.position[node_a]
+        if upper < lower:
+            return
+        # nodes after node_b that must move with it
+        forward = [node_b]
+        visited = {node_b}
+        stack = [node_b]
+        while stack:
+            for users in stack.pop().output.values():
+                for other in users:
+                    if other is node_a:
+                        raise RuntimeError(f'Cannot link "{node_a.name}" to "{node_b.name}", graph would be circular')
+                    if other not in visited and self.position[other] < upper:
+                        visited.add(other)
+                        forward.append(other)
+                        stack.append(other)
+        # nodes before node_a that must move with it
+        backward = [node_a]
+        visited = {node_a}
+        stack = [node_a]
+        while stack:
+            for other_data in stack.pop().input.values():
+                if other_data is not None:
+                    other = other_data[0]
+                    if other not in visited and self.position[other] > lower:
+                        visited.add(other)
+                        backward.append(other)
+                        stack.append(other)
+        # both groups keep their own order, backward goes first, in the same indexes they used
+        forward.sort(key=self.position.__getitem__)
+        backward.sort(key=self.position.__getitem__)
+        indexes = sorted(self.position[i] for i in (*backward, *forward))
+        for index, node in zip(indexes, (*backward, *forward)):
+            self.nodes[index] = node
+            self.position[node] = index
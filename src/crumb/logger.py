@@ -11,6 +11,8 @@ from crumb.settings import Settings
 
 def log(logger_queue: Queue, message: str, log_level: int, payload: dict = None):
     """Adds a message to the logging queue"""
+    if log_level < Settings.LOGGING_LEVEL and not Settings.LOGGING_WARNING_TWICE:
+        return  # the logger task would ignore it, avoid formatting the payload
     logger_queue.put({'process': multiprocessing.current_process().name, 'message': message, 'logging_level': log_level, 'payload': str(payload)})
     if Settings.LOGGING_WARNING_TWICE:
         warnings.warn(message)
@@ -35,12 +37,15 @@ class LoggerQueue:
     """Stores the queue for the logger"""
     LOGGER_QUEUE: Optional[Queue] = None
     process: Optional[Process] = None
+    # the queue is given to processes started with the same method (Settings.MULTISLICER_START_METHOD)
+    START_METHOD: Optional[str] = None
 
     @classmethod
     def get_logger(cls) -> Queue:
         """Get the Queue"""
         if cls.LOGGER_QUEUE is None:
-            cls.LOGGER_QUEUE = Queue()
+            cls.START_METHOD = Settings.MULTISLICER_START_METHOD
+            cls.LOGGER_QUEUE = multiprocessing.get_context(cls.START_METHOD).Queue()
             if multiprocessing.current_process().name == 'MainProcess':
                 cls.start_task()
         return cls.LOGGER_QUEUE
@@ -56,8 +61,22 @@ class LoggerQueue:
                                                        'format': Settings.LOGGING_FORMAT,
                                                        'level': Settings.LOGGING_LEVEL}))
         cls.process.start()
+        atexit.unregister(cls.kill)  # once, the task might be restarted
         atexit.register(cls.kill)
 
+    @classmethod
+    def use_start_method(cls, start_method: Optional[str]) -> None:
+        """
+        Restart the logger task if its queue was created for processes started with another method
+        @param start_method: None for the platform default, 'fork', 'forkserver' or 'spawn'
+        """
+        if cls.LOGGER_QUEUE is None or cls.START_METHOD == start_method:
+            return
+        if cls.process is not None:
+            cls.kill()
+        cls.LOGGER_QUEUE = None
+        cls.get_logger()
+
     @classmethod
     def kill(cls) -> None:
         """Stops the logger class"""
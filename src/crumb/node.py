@@ -2,29 +2,55 @@
 Module Node to abstract the graph structure.
 """
 from __future__ import annotations
-from typing import Dict
-import time
+from typing import Dict, Optional
+import itertools
+import weakref
+
+
+class NodeReference:
+    """
+    A linked node as seen in a pickled Node, only the name is kept (see Node.relink)
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} ({self.name})'
+
+    def __eq__(self, other):
+        return isinstance(other, NodeReference) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
 
 
 class Node:
     """
     Node contains functionality to build the execution graph.
+    Nodes belong to the Slice that created them (Slice.nodes), the lookup by name across slices only holds weak references.
+    Nodes are identified by an integer id, their name is derived from it.
     """
-    __node_mapping_definition: Dict[str, str] = {}
-    __node__instances: Dict[str, Node] = {}
+    __slots__ = ('id', 'name', 'instance_of', 'bakery_item', 'save_exec', 'last_exec', 'input', 'output', '_n_links_in', '_n_links_out',
+                 '__weakref__')
+    __node__instances: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+    __node__ids = itertools.count()
 
-    def __init__(self, bakery_item, name=None):
+    def __init__(self, bakery_item, instance_of: Optional[str] = None):
         """
         Create a graph node.
         @param bakery_item: Slice or Crumb object
-        @param name: name of the node; if None is id(self)
+        @param instance_of: name of the bakery item in the Slice
         """
-        self.name = Node._get_unique_node_name(bakery_item.name, name)
+        self.id: int = next(Node.__node__ids)
+        self.name: str = f'{bakery_item.name}.{self.id}'
         Node._set_node(self.name, self)
+        self.instance_of = instance_of
         self.bakery_item = bakery_item
         self.bakery_item.add_node_using(self)
         self.save_exec = True
-        self.last_exec = {}
+        self.last_exec: Optional[dict] = None
         # input
         # format is {'input name': ('other Node', 'other node name')} # each input
         if self.bakery_item.input:
@@ -33,13 +59,15 @@ class Node:
             self.input = {}
         # output
         # format is {'output name': {'other Node': [other node name, ...]}} # multiple output
-        if self.bakery_item.output:
-            if self.bakery_item.__class__.__name__ == 'Slice':
-                self.output = {i: {} for i in self.bakery_item.output.keys()}
-            elif self.bakery_item.__class__.__name__ == 'Crumb':
-                self.output = {None: {}}
-            else:
-                raise NotImplementedError(f'"{self.bakery_item.__class__.__name__}" is not implemented for node')
+        if self.bakery_item.__class__.__name__ in ('Slice', 'Map', 'Switch'):
+            self.output = {i: {} for i in self.bakery_item.output.keys()}
+        elif self.bakery_item.__class__.__name__ == 'Crumb':
+            self.output = {None: {}} if self.bakery_item.output else {}
+        else:
+            raise NotImplementedError(f'"{self.bakery_item.__class__.__name__}" is not implemented for node')
+        # counters kept by add_/remove_input and add_/remove_output
+        self._n_links_in = 0
+        self._n_links_out = 0
 
     def __repr__(self):
         return f'{self.__class__.__name__} at {hex(id(self))} ({self.n_links()} links): ({str(self.bakery_item)})'
@@ -47,55 +75,47 @@ class Node:
     def __str__(self):
         return self.__repr__()
 
-    @classmethod
-    def _set_node(cls, node_name: str, instance) -> None:
-        cls.__node__instances[node_name] = instance
+    def __getstate__(self):
+        # the linked nodes go by name, otherwise pickling a node (e.g. sent to MultiSlicer) goes through the whole graph
+        state = {i: getattr(self, i) for i in self.__slots__[:-1]}  # all but __weakref__
+        if self._n_links_in:
+            state['input'] = {i: None if j is None else (NodeReference(j[0].name), j[1]) for i, j in self.input.items()}
+        if self._n_links_out:
+            state['output'] = {i: {NodeReference(k.name): list(v) for k, v in j.items()} for i, j in self.output.items()}
+        return state
 
-    @classmethod
-    def get_node(cls, node_name: str) -> Node:
-        return cls.__node__instances[node_name]
+    def __setstate__(self, state):
+        for i, j in state.items():
+            setattr(self, i, j)
 
-    @classmethod
-    def _get_new_node_name(cls, bakery_item_name) -> str:
+    def relink(self, nodes: Dict[str, Node]) -> None:
         """
-        Generate new name for a node
-        @param bakery_item_name: bakery item used
+        Replace the NodeReference in the links (after unpickling) by the nodes
+        @param nodes: {'node name': Node}
         """
-        while True:  # this should not need to loop
-            newname = f'{bakery_item_name}.{time.time_ns()}'
-            if newname not in cls.__node_mapping_definition:
-                break
-        cls.__node_mapping_definition[newname] = newname
-        return newname
+        for input_name, other_node_data in self.input.items():
+            if other_node_data is not None and isinstance(other_node_data[0], NodeReference):
+                self.input[input_name] = (nodes[other_node_data[0].name], other_node_data[1])
+        for output_name, other_node_data in self.output.items():
+            self.output[output_name] = {nodes[i.name] if isinstance(i, NodeReference) else i: j for i, j in other_node_data.items()}
 
     @classmethod
-    def get_node_mapping(cls, old_name: str) -> str:
-        """
-        Return the new name for an old node
-        @param old_name
-        """
-        return cls.__node_mapping_definition[old_name]
+    def _set_node(cls, node_name: str, instance) -> None:
+        cls.__node__instances[node_name] = instance
 
     @classmethod
-    def _get_unique_node_name(cls, bakery_item_name: str, proposed_name: str = None) -> str:
+    def get_node(cls, node_name: str) -> Node:
         """
-        Assist the creation of new node names for old ones
-        @param bakery_item_name: name for the bakery item attached
-        @param proposed_name: previous name
+        Return a node that is still in use by its name
+        @param node_name
         """
-        if proposed_name is None:
-            return cls._get_new_node_name(bakery_item_name)
-        else:
-            if proposed_name in cls.__node_mapping_definition:
-                return cls.__node_mapping_definition[proposed_name]
-            else:
-                newname = cls._get_new_node_name(bakery_item_name)
-                cls.__node_mapping_definition[proposed_name] = newname
-                return newname
+        return cls.__node__instances[node_name]
 
-    def links_from_json(self, json_str) -> None:
+    def links_from_json(self, json_str, nodes: Dict[str, Node]) -> None:
         """
         Create links from json representation
+        @param json_str: links as in links_to_json()
+        @param nodes: the nodes referenced in json_str by their name, {'name in json_str': Node}
         """
         for input_name, other_node_data in json_str['input'].items():
             if input_name not in self.input:
@@ -104,16 +124,18 @@ class Node:
                 self.input[input_name] = None
             else:
                 other_node_name, other_node_output_name = other_node_data
-                other_node = Node.get_node(Node.get_node_mapping(other_node_name))
-                self.input[input_name] = (other_node, other_node_output_name)
+                self.input[input_name] = (nodes[other_node_name], other_node_output_name)
+        self._n_links_in = sum(1 for i in self.input.values() if i is not None)
+        self._n_links_out = 0
         for output_name, other_node_data in json_str['output'].items():
             if output_name == 'null':
                 output_name = None
             for other_node_name, other_node_input_names in other_node_data.items():
                 if output_name not in self.output:
                     raise ValueError(f'Invalid output_name "{output_name}". It is not in this output!')
-                other_node = Node.get_node(Node.get_node_mapping(other_node_name))
-                self.output[output_name][other_node] = other_node_input_names
+                if other_node_input_names:
+                    self.output[output_name][nodes[other_node_name]] = list(other_node_input_names)
+                    self._n_links_out += len(other_node_input_names)
 
     def links_to_json(self) -> dict:
         """
@@ -137,21 +159,13 @@ class Node:
         """
         Return number of links to the input of this node
         """
-        number_of_links = 0
-        for i in self.input.values():
-            if i is not None:
-                number_of_links += 1
-        return number_of_links
+        return self._n_links_in
 
     def n_links_out(self) -> int:
         """
-        Return number of links from the output of this node
+        Return number of links from the output of this node (an output used by two inputs counts twice)
         """
-        number_of_links = 0
-        for i in self.output.values():
-            if i is not None and i:
-                number_of_links += 1
-        return number_of_links
+        return self._n_links_out
 
     def n_links(self) -> int:
         """
@@ -163,16 +177,14 @@ class Node:
         """
         Return boolean indicating if this node has links
         """
-        if self.n_links() > 0:
-            return True
-        return False
+        return self._n_links_in > 0 or self._n_links_out > 0
 
     def get_input_type(self, name: str) -> type:
         """
         Return the type of this node input
         @param name: input name
         """
-        if self.bakery_item.__class__.__name__ == 'Slice':
+        if self.bakery_item.__class__.__name__ in ('Slice', 'Map', 'Switch'):
             return self.bakery_item.input[name]
         if self.bakery_item.__class__.__name__ == 'Crumb':
             return self.bakery_item.input[name]
@@ -184,7 +196,7 @@ class Node:
         Return the type of this node output
         @param name: output name
         """
-        if self.bakery_item.__class__.__name__ == 'Slice':
+        if self.bakery_item.__class__.__name__ in ('Slice', 'Map', 'Switch'):
             return self.bakery_item.output[name]
         if self.bakery_item.__class__.__name__ == 'Crumb':
             return self.bakery_item.output
@@ -220,6 +232,7 @@ class Node:
         if other_node_name not in other_node.output:
             raise RuntimeError(f'output "{this_variable}" not in "{other_node}"')
         self.input[this_variable] = (other_node, other_node_name)
+        self._n_links_in += 1
 
     def remove_input(self, this_variable: str) -> None:
         """
@@ -230,6 +243,7 @@ class Node:
         if self.input[this_variable] is None:
             raise RuntimeError(f'variable {this_variable} is already undefined')
         self.input[this_variable] = None
+        self._n_links_in -= 1
 
     def add_output(self, this_output_name: str, other_node: Node, other_node_variable: str) -> None:
         """
@@ -244,6 +258,7 @@ class Node:
         if other_node not in self.output[this_output_name]:
             self.output[this_output_name][other_node] = list()
         self.output[this_output_name][other_node].append(other_node_variable)
+        self._n_links_out += 1
 
     def remove_output(self, this_output_name: str, other_node: Node, other_node_variable: str) -> None:
         """
@@ -252,9 +267,16 @@ class Node:
         @param other_node: the other node
         @param other_node_name: the name of the variable inputted by the other node
         """
-        if other_node not in self.output[this_output_name]:
+        if this_output_name not in self.output:
+            raise RuntimeError(f'output {this_output_name} wanted not in output')
+        other_node_variables = self.output[this_output_name].get(other_node)
+        if other_node_variables is None or other_node_variable not in other_node_variables:
             raise RuntimeError(f'"{other_node}" is not in our list of outputs')
-        self.output[this_output_name][other_node].remove(other_node_variable)
+        # a node uses an output in a handful of its inputs, entries without inputs are dropped
+        other_node_variables.remove(other_node_variable)
+        if not other_node_variables:
+            self.output[this_output_name].pop(other_node)
+        self._n_links_out -= 1
 
     def run(self, input: dict):
         """
@@ -262,7 +284,7 @@ class Node:
         @param input: dict() with elements as needed, empty dict if not required
         """
         _ret = self.bakery_item.run(input)
-        if self.bakery_item.__class__.__name__ == 'Slice':
+        if self.bakery_item.__class__.__name__ in ('Slice', 'Map', 'Switch'):
             ret = _ret
         elif self.bakery_item.__class__.__name__ == 'Crumb':
             ret = {None: _ret}
@@ -0,0 +1,858 @@
+"""
+Module planner
+Passes over the execution sequence of a Slice before it is sent to the slicer.
+
+The passes do not change the Slice: they return a new sequence of tasks and aliases, a node that is an alias
+of another one is not executed and gets the output of the other node.
+Nodes with known output (e.g. constant nodes computed in a previous run) are removed from the sequence and their
+output given as input to the nodes using them.
+Chains of nodes can be fused into a FusedNode, a single task for slicers where each task has a cost (e.g. MultiSlicer).
+Many records can be run at once (Slice.run_many with batched crumbs): the nodes depending on the input become MappedNode,
+their input and output are columns with a value for each record.
+Inputs can be split in partitions of rows (Slice.run_partitioned): the row-wise crumbs using them run as a PartitionNode for
+each partition, a MergeNode recombines the partitions where the whole output is needed.
+The nodes of a Map are expanded once their input is known (expand_map): an ElementNode for each node of the inner Slice and
+element of the collection, and a CollectNode with the outputs in lists.
+The nodes of a Switch are expanded the same way once the value selecting the case is known (expand_switch): only the nodes
+of that case are run, as ElementNode, and a SelectNode gives their outputs; the cases not selected are never sent to the slicer.
+The slicers expand them while the other nodes run (expand_node), as soon as their input is known.
+Streaming crumbs connected to crumbs taking their chunks as a stream are grouped in a StreamNode (group_streams), a single task
+running the crumbs at the same time with bounded channels between them.
+"""
+from typing import Dict, List, Tuple, Hashable, Set, Container, Any, Optional, Callable, Union
+import functools
+import operator
+import os
+import queue
+import sys
+import threading
+
+from crumb.node import Node, NodeReference
+from crumb.settings import Settings
+from crumb.slicers.generic import TaskDependencies, TaskToBeDone
+
+
+def merge_common_nodes(task_seq: List[TaskDependencies], input_sources: Dict[Tuple[str, str], str]) -> Tuple[List[TaskDependencies], Dict[str, List[str]]]:
+    """
+    Return the sequence without the nodes that repeat a pure Crumb on the same input, and the aliases for the removed nodes
+    @param task_seq: execution sequence with nodes after their dependencies, format is: [{'node': node, 'deps': [node_name, ...]}]
+    @param input_sources: the Slice input given to the nodes, format is {(node_name, node_input): 'slice input name'}
+    @return: (sequence, {'node name': ['names of nodes with the same output', ...]})
+    """
+    # format: {(bakery item, input sources): 'node name'}
+    executed: Dict[Hashable, str] = {}
+    # format: {'removed node name': 'node name executed'}
+    replaced: Dict[str, str] = {}
+    aliases: Dict[str, List[str]] = {}
+    new_seq: List[TaskDependencies] = []
+    for task in task_seq:
+        node = task['node']
+        if not getattr(node.bakery_item, 'pure', False):
+            new_seq.append(task)
+            continue
+        sources = []
+        for input_name, other_node_data in node.input.items():
+            if other_node_data is not None:
+                other_node, other_node_output = other_node_data
+                sources.append((input_name, 'node', replaced.get(other_node.name, other_node.name), other_node_output))
+            elif (node.name, input_name) in input_sources:
+                sources.append((input_name, 'input', input_sources[(node.name, input_name)]))
+            # otherwise the function default is used
+        key = (id(node.bakery_item), tuple(sources))
+        if key in executed:
+            replaced[node.name] = executed[key]
+            aliases.setdefault(executed[key], []).append(node.name)
+            continue
+        executed[key] = node.name
+        new_seq.append(task)
+    return new_seq, aliases
+
+
+def find_constant_nodes(task_seq: List[TaskDependencies], nodes_with_input: Container[str]) -> Set[str]:
+    """
+    Return the nodes of pure bakery items that do not depend (even through other nodes) on the Slice input
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param nodes_with_input: the names of the nodes mapped to the Slice input
+    """
+    constant: Set[str] = set()
+    for task in task_seq:
+        node = task['node']
+        if not getattr(node.bakery_item, 'pure', False) or node.name in nodes_with_input:
+            continue
+        if all(i in constant for i in task['deps']):
+            constant.add(node.name)
+    return constant
+
+
+def get_source_stamp(bakery_item) -> Any:
+    """
+    Return the version of a bakery item, outputs computed with another version are not reused: the modification time of the file
+    defining a Crumb (None if not found), the versions of the bakery items inside a Slice, Map or Switch
+    @param bakery_item: the bakery item
+    """
+    kind = bakery_item.__class__.__name__
+    if kind == 'Slice':
+        return tuple(get_source_stamp(bakery_item.bakery_items[i]['bakery_item']) for i in sorted(bakery_item.bakery_items))
+    if kind == 'Map':
+        return get_source_stamp(bakery_item.slice)
+    if kind == 'Switch':
+        default = get_source_stamp(bakery_item.default) if bakery_item.default is not None else None
+        return tuple(get_source_stamp(i) for i in bakery_item.cases.values()), default
+    try:
+        return os.path.getmtime(bakery_item.file)
+    except (AttributeError, OSError):
+        return None
+
+
+def remove_known_nodes(task_seq: List[TaskDependencies], known_results: Dict[str, Dict[Any, Any]],
+                       inputs_required: Dict[Tuple[str, str], Any]) -> List[TaskDependencies]:
+    """
+    Return the sequence without the nodes with known output, their output is added to inputs_required for the nodes using them
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param known_results: format is {node_name: {output_name: value}}
+    @param inputs_required: format is {(node_name, node_input): value}, changed in place
+    """
+    new_seq: List[TaskDependencies] = []
+    for task in task_seq:
+        node = task['node']
+        if node.name in known_results:
+            continue
+        if any(i in known_results for i in task['deps']):
+            for input_name, other_node_data in node.input.items():
+                if other_node_data is not None and other_node_data[0].name in known_results:
+                    inputs_required[(node.name, input_name)] = known_results[other_node_data[0].name][other_node_data[1]]
+            task = {'node': node, 'deps': [i for i in task['deps'] if i not in known_results]}
+        new_seq.append(task)
+    return new_seq
+
+
+def find_mapped_nodes(task_seq: List[TaskDependencies], input_sources: Dict[Tuple[str, str], str]) -> Dict[str, Set[str]]:
+    """
+    Return the nodes run for each record when running many records at once, and their inputs with a value for each record (columns)
+    A node is run for each record if it depends (even through other nodes) on the Slice input or if it is not pure
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param input_sources: the Slice input given to the nodes, format is {(node_name, node_input): 'slice input name'}
+    @return: {'node name': {'node input name', ...}}
+    """
+    mapped: Dict[str, Set[str]] = {}
+    for task in task_seq:
+        node = task['node']
+        columns = {i for i, j in node.input.items() if (j is None and (node.name, i) in input_sources) or (j is not None and j[0].name in mapped)}
+        if columns or not getattr(node.bakery_item, 'pure', False):
+            mapped[node.name] = columns
+    return mapped
+
+
+class MappedNode:
+    """
+    A node run for many records at once, the output is a column for each output: {'output name': [value for each record]}
+    The inputs in columns have a value for each record, the others are the same for all the records.
+    A batched crumb is called once with a list for each input, a Slice runs the records with run_many, the others run for each record.
+    """
+    def __init__(self, node: Node, columns: Set[str], n_records: int):
+        """
+        @param node: the node
+        @param columns: the inputs with a value for each record
+        @param n_records: number of records
+        """
+        self.node = node
+        self.name = node.name
+        self.input = node.input
+        self.bakery_item = node.bakery_item
+        self.columns = columns
+        self.n_records = n_records
+        self.save_exec = False  # the Slice keeps the output of the last record
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} ({self.n_records} records): ({self.name})'
+
+    def run(self, input: Dict[str, Any]) -> Dict[Any, Any]:
+        """
+        Return the output columns
+        @param input: format is {'input name': value, or [value for each record] for the columns}
+        """
+        if getattr(self.bakery_item, 'batched', False):
+            output = self.bakery_item.run({i: j if i in self.columns else [j] * self.n_records for i, j in input.items()})
+            if len(output) != self.n_records:
+                raise RuntimeError(f'batched crumb of node "{self.name}" returned {len(output)} values for {self.n_records} records')
+            return {None: output}
+        records = [{i: j[k] if i in self.columns else j for i, j in input.items()} for k in range(self.n_records)]
+        if self.bakery_item.__class__.__name__ == 'Crumb':
+            return {None: [self.bakery_item.run(i) for i in records]}
+        if self.bakery_item.__class__.__name__ == 'Slice':
+            outputs = self.bakery_item.run_many(records)
+        else:
+            outputs = [self.bakery_item.run(i) for i in records]
+        return {i: [j[i] for j in outputs] for i in outputs[0]}
+
+
+def split_rows(value: Any, n_partitions: int) -> List[Any]:
+    """
+    Return the value in partitions of consecutive rows, by position for a DataFrame (iloc) and by slicing otherwise (lists, arrays)
+    @param value: the value, with len()
+    @param n_partitions: number of partitions
+    """
+    rows = getattr(value, 'iloc', value)
+    bounds = [len(value) * i // n_partitions for i in range(n_partitions + 1)]
+    return [rows[bounds[i]:bounds[i + 1]] for i in range(n_partitions)]
+
+
+def merge_parts(merge: Union[str, Callable], parts: List[Any]) -> Any:
+    """
+    Return the output of the partitions recombined
+    @param merge: 'concat' (with the concat function of the module of the type, e.g. pandas or numpy, or + for lists),
+                  'sum' (with +) or a function taking the list of parts
+    @param parts: the output of each partition, in order
+    """
+    if callable(merge):
+        return merge(parts)
+    if merge == 'concat':
+        module = sys.modules.get(type(parts[0]).__module__.split('.')[0])
+        for name in ('concat', 'concatenate'):
+            if module is not None and module.__name__ != 'builtins' and hasattr(module, name):
+                return getattr(module, name)(parts)
+    return functools.reduce(operator.add, parts)
+
+
+class PartitionNode:
+    """
+    The node of a row-wise crumb run for one partition of the rows, named "node name#partition"
+    Its input from the nodes run for each partition comes from the same partition
+    """
+    def __init__(self, node: Node, partition: int, partitioned: Dict[str, str]):
+        """
+        @param node: the node
+        @param partition: the number of the partition
+        @param partitioned: the nodes run for each partition, format is {'node name': 'name of the node executed'} (see merge_common_nodes)
+        """
+        self.node = node
+        self.name = f'{node.name}#{partition}'
+        self.bakery_item = node.bakery_item
+        self.save_exec = False  # the Slice keeps the output merged
+        # format is {'node input': ('other Node' or reference to its partition, 'other node output name')}
+        self.input: Dict[str, Optional[Tuple[Any, Any]]] = {}
+        for input_name, other_node_data in node.input.items():
+            if other_node_data is not None and other_node_data[0].name in partitioned:
+                other_node_data = (NodeReference(f'{partitioned[other_node_data[0].name]}#{partition}'), other_node_data[1])
+            self.input[input_name] = other_node_data
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))}: ({self.name})'
+
+    def run(self, input: Dict[str, Any]) -> Dict[Any, Any]:
+        """
+        Return the output for the partition
+        @param input: format is {'input name': value}
+        """
+        return {None: self.bakery_item.run(input)}
+
+
+class MergeNode:
+    """
+    Recombines the output of a node run for each partition (PartitionNode) with the merge of its crumb, it takes the name of the node
+    """
+    def __init__(self, node: Node, n_partitions: int):
+        """
+        @param node: the node
+        @param n_partitions: number of partitions
+        """
+        self.node = node
+        self.name = node.name
+        self.bakery_item = node.bakery_item
+        self.save_exec = False  # the Slice keeps the output merged
+        # format is {partition: (reference to the partition, None)}
+        self.input: Dict[int, Tuple[NodeReference, Any]] = {i: (NodeReference(f'{node.name}#{i}'), None) for i in range(n_partitions)}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} ({len(self.input)} partitions): ({self.name})'
+
+    def run(self, input: Dict[int, Any]) -> Dict[Any, Any]:
+        """
+        Return the output merged
+        @param input: format is {partition: output}
+        """
+        return {None: merge_parts(self.bakery_item.merge, [input[i] for i in range(len(input))])}
+
+
+def partition_nodes(task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any], input_sources: Dict[Tuple[str, str], str],
+                    partitioned_inputs: Container[str], n_partitions: int, aliases: Dict[str, List[str]],
+                    keep: Container[str]) -> Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any], Set[str]]:
+    """
+    Return the sequence with the nodes of row-wise crumbs using partitioned data run for each partition, inputs_required for it,
+    and the names of the nodes partitioned
+    A node is partitioned if its crumb is row-wise and an input is a partitioned Slice input or comes from a partitioned node,
+    its other inputs are given whole to each partition. The output of a partitioned node is merged (MergeNode) for the nodes
+    that are not partitioned and if it is needed after the execution.
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param inputs_required: format is {(node_name, node_input): value}
+    @param input_sources: the Slice input given to the nodes, format is {(node_name, node_input): 'slice input name'}
+    @param partitioned_inputs: the Slice inputs split in partitions of rows
+    @param n_partitions: number of partitions
+    @param aliases: from merge_common_nodes(), format is {node_name: [node_name_1, ...]}
+    @param keep: the nodes whose output is needed after the execution
+    """
+    replaced = {j: i for i, aliased in aliases.items() for j in aliased}
+    partitioned: Set[str] = set()
+    # format: {'node name': ['node name using it', ...]}
+    users: Dict[str, List[str]] = {}
+    for task in task_seq:
+        node = task['node']
+        for dependency in task['deps']:
+            users.setdefault(replaced.get(dependency, dependency), []).append(node.name)
+        if not getattr(node.bakery_item, 'rowwise', False):
+            continue
+        for input_name, other_node_data in node.input.items():
+            if other_node_data is None and input_sources.get((node.name, input_name)) in partitioned_inputs:
+                partitioned.add(node.name)
+            elif other_node_data is not None and replaced.get(other_node_data[0].name, other_node_data[0].name) in partitioned:
+                partitioned.add(node.name)
+    # format: {'node name': 'name of the node executed'}
+    executed = {i: i for i in partitioned} | {j: i for i in partitioned for j in aliases.get(i, [])}
+    # the partitions of each Slice input, format: {'slice input name': [value of each partition]}
+    parts: Dict[str, List[Any]] = {}
+    new_inputs_required: Dict[Tuple[str, Any], Any] = {}
+    for (node_name, node_input), value in inputs_required.items():
+        source = input_sources.get((node_name, node_input))
+        if node_name not in partitioned:
+            new_inputs_required[(node_name, node_input)] = value
+            continue
+        if source in partitioned_inputs and source not in parts:
+            parts[source] = split_rows(value, n_partitions)
+        for partition in range(n_partitions):
+            new_inputs_required[(f'{node_name}#{partition}', node_input)] = parts[source][partition] if source in partitioned_inputs else value
+    new_seq: List[TaskDependencies] = []
+    for task in task_seq:
+        node = task['node']
+        if node.name not in partitioned:
+            new_seq.append(task)
+            continue
+        for partition in range(n_partitions):
+            deps = [f'{i}#{partition}' if i in partitioned else i for i in (replaced.get(j, j) for j in task['deps'])]
+            new_seq.append({'node': PartitionNode(node, partition, executed), 'deps': deps})  # type: ignore
+        if node.name in keep or any(i not in partitioned for i in users.get(node.name, [])):
+            new_seq.append({'node': MergeNode(node, n_partitions), 'deps': [f'{node.name}#{i}' for i in range(n_partitions)]})  # type: ignore
+    return new_seq, new_inputs_required, set(executed)
+
+
+class ElementNode:
+    """
+    A node of the Slice of a Map run for an element, named "map node name#element#node name"
+    Its input from the other nodes of the Slice comes from the same element
+    The nodes of the case selected by a Switch are also ElementNode, named "switch node name#node name"
+    """
+    def __init__(self, node: Node, prefix: str):
+        """
+        @param node: the node of the Slice of the Map
+        @param prefix: "map node name#element#"
+        """
+        self.node = node
+        self.name = f'{prefix}{node.name}'
+        self.bakery_item = node.bakery_item
+        self.save_exec = False  # the node of the Map keeps the output collected
+        # format is {'node input': (reference to the node for the element, 'other node output name')}
+        self.input: Dict[Any, Optional[Tuple[Any, Any]]] = {i: None if j is None else (NodeReference(f'{prefix}{j[0].name}'), j[1])
+                                                            for i, j in node.input.items()}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))}: ({self.name})'
+
+    def run(self, input: Dict[str, Any]) -> Dict[Any, Any]:
+        """
+        Return the output for the element
+        @param input: format is {'input name': value}
+        """
+        output = self.bakery_item.run(input)
+        return {None: output} if self.bakery_item.__class__.__name__ == 'Crumb' else output
+
+
+class CollectNode:
+    """
+    Collects the outputs of the Slice of a Map for each element in lists, in the order of the elements, it takes the name of the Map node
+    """
+    def __init__(self, node: Node, n_elements: int):
+        """
+        @param node: the node of the Map
+        @param n_elements: number of elements
+        """
+        self.node = node
+        self.name = node.name
+        self.bakery_item = node.bakery_item
+        self.save_exec = False  # the Slice keeps the output collected
+        output_mapping = node.bakery_item.slice._output_mapping  # pylint: disable=protected-access
+        # format is {(element, 'output name'): (reference to the node for the element, 'node output name')}
+        self.input: Dict[Tuple[int, str], Tuple[NodeReference, Any]] = {
+            (i, output_name): (NodeReference(f'{node.name}#{i}#{node_name}'), node_output)
+            for i in range(n_elements) for output_name, (node_name, node_output) in filter(lambda j: j[1] is not None, output_mapping.items())}
+        self.n_elements = n_elements
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} ({self.n_elements} elements): ({self.name})'
+
+    def run(self, input: Dict[Tuple[int, str], Any]) -> Dict[str, Any]:
+        """
+        Return the outputs in lists
+        @param input: format is {(element, 'output name'): value}
+        """
+        return {i: [input[(j, i)] for j in range(self.n_elements)] for i in self.bakery_item.output}
+
+
+def is_map(node: Any) -> bool:
+    """
+    Return whether the node is a node of a Map to be expanded (its copies for each record or partition run the Map themselves)
+    @param node: the node of a task
+    """
+    return node.__class__.__name__ in ('Node', 'ElementNode') and node.bakery_item.__class__.__name__ == 'Map'
+
+
+def is_switch(node: Any) -> bool:
+    """
+    Return whether the node is a node of a Switch to be expanded (as is_map)
+    @param node: the node of a task
+    """
+    return node.__class__.__name__ in ('Node', 'ElementNode') and node.bakery_item.__class__.__name__ == 'Switch'
+
+
+def expand_map(task: TaskDependencies, inputs_required: Dict[Tuple[str, Any], Any]) -> Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any]]:
+    """
+    Return the tasks running the Slice of a Map node for each element of its collection, and their input
+    The first nodes of an element wait for the last nodes (not used by other nodes) of the element "window" before it, so at most window
+    elements run at once, the outputs are collected when the last nodes of every element are done
+    @param task: the task of the Map node, with its dependencies done
+    @param inputs_required: format is {(node_name, node_input): value}, with the input of the Map node
+    """
+    node = task['node']
+    bakery_item = node.bakery_item
+    slice = bakery_item.slice
+    collection = inputs_required[(node.name, bakery_item.over)]
+    window = bakery_item.get_window()
+    sub_seq = slice._compute_execution_seq()  # pylint: disable=protected-access
+    # the element is done when they are (the nodes giving the output are them or before them), the next elements wait for them
+    last_nodes = sorted({i['node'].name for i in sub_seq} - {j for i in sub_seq for j in i['deps']})
+    new_seq: List[TaskDependencies] = []
+    new_inputs_required: Dict[Tuple[str, Any], Any] = {}
+    for element, value in enumerate(collection):
+        prefix = f'{node.name}#{element}#'
+        for input_name, data in slice._input_mapping.items():  # pylint: disable=protected-access
+            if input_name != bakery_item.over and (node.name, input_name) not in inputs_required:
+                continue  # the function default is used
+            for node_name, node_inputs in data.items():
+                for node_input in node_inputs:
+                    new_inputs_required[(f'{prefix}{node_name}', node_input)] = value if input_name == bakery_item.over \
+                        else inputs_required[(node.name, input_name)]
+        for sub_task in sub_seq:
+            deps = [f'{prefix}{i}' for i in sub_task['deps']]
+            if not deps and element >= window:
+                deps = [f'{node.name}#{element - window}#{i}' for i in last_nodes]
+            new_seq.append({'node': ElementNode(sub_task['node'], prefix), 'deps': deps})  # type: ignore
+    new_seq.append({'node': CollectNode(node, len(collection)),  # type: ignore
+                    'deps': [f'{node.name}#{i}#{j}' for i in range(len(collection)) for j in last_nodes]})
+    return new_seq, new_inputs_required
+
+
+class SelectNode:
+    """
+    Gives the outputs of the case selected by a Switch, it takes the name of the Switch node (the outputs are None without a case)
+    """
+    def __init__(self, node: Node, case: Any):
+        """
+        @param node: the node of the Switch
+        @param case: the Slice of the case selected, its nodes are named "switch node name#node name", None without a case
+        """
+        self.node = node
+        self.name = node.name
+        self.bakery_item = node.bakery_item
+        self.save_exec = False  # the node of the Switch keeps the output selected
+        output_mapping = case._output_mapping if case is not None else {}  # pylint: disable=protected-access
+        # format is {'output name': (reference to the node of the case, 'node output name')}
+        self.input: Dict[str, Tuple[NodeReference, Any]] = {}
+        for output_name, mapping in output_mapping.items():
+            if mapping is not None:
+                self.input[output_name] = (NodeReference(f'{node.name}#{mapping[0]}'), mapping[1])
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))}: ({self.name})'
+
+    def run(self, input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the outputs of the case
+        @param input: format is {'output name': value}
+        """
+        return {i: input.get(i) for i in self.bakery_item.output}
+
+
+def expand_switch(task: TaskDependencies, inputs_required: Dict[Tuple[str, Any], Any]) -> Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any]]:
+    """
+    Return the tasks running the Slice of the case selected by a Switch node, and their input
+    @param task: the task of the Switch node, with its dependencies done
+    @param inputs_required: format is {(node_name, node_input): value}, with the input of the Switch node
+    """
+    node = task['node']
+    case = node.bakery_item.get_case(inputs_required[(node.name, node.bakery_item.on)])
+    prefix = f'{node.name}#'
+    new_seq: List[TaskDependencies] = []
+    new_inputs_required: Dict[Tuple[str, Any], Any] = {}
+    if case is not None:
+        for input_name, data in case._input_mapping.items():  # pylint: disable=protected-access
+            if (node.name, input_name) not in inputs_required:
+                continue  # the function default is used
+            for node_name, node_inputs in data.items():
+                for node_input in node_inputs:
+                    new_inputs_required[(f'{prefix}{node_name}', node_input)] = inputs_required[(node.name, input_name)]
+        for sub_task in case._compute_execution_seq():  # pylint: disable=protected-access
+            new_seq.append({'node': ElementNode(sub_task['node'], prefix), 'deps': [f'{prefix}{i}' for i in sub_task['deps']]})  # type: ignore
+    select_node = SelectNode(node, case)
+    new_seq.append({'node': select_node, 'deps': sorted({i[0].name for i in select_node.input.values()})})  # type: ignore
+    return new_seq, new_inputs_required
+
+
+def expand_node(task: TaskToBeDone) -> Optional[Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any]]]:
+    """
+    Return the tasks replacing the node of a Map or Switch (expand_map, expand_switch) and their input, None for the other nodes
+    The slicers expand it as soon as its input is known, the tasks run with the other tasks of the execution
+    @param task: the task of the node, with its input
+    """
+    node = task['node']
+    if not is_map(node) and not is_switch(node):
+        return None
+    inputs_required = {(node.name, i): j for i, j in task['input'].items()}
+    return (expand_map if is_map(node) else expand_switch)({'node': node, 'deps': []}, inputs_required)  # type: ignore
+
+
+class FusedNode:
+    """
+    A chain of nodes executed as one task, it takes the name of the last node of the chain
+    Its input are the inputs of the chain given from outside, identified by (node name, node input)
+    """
+    def __init__(self, nodes: List[Node], reported: List[str]):
+        """
+        @param nodes: the chain, each node depends only on the nodes before it or on nodes outside of the chain
+        @param reported: the nodes in the chain (except the last one) whose output is returned
+        """
+        self.nodes = nodes
+        self.name = nodes[-1].name
+        self.reported = reported
+        self.save_exec = False  # the nodes inside keep their own setting
+        names = {i.name for i in nodes}
+        # format is {(node name, node input): ('other Node', 'other node output name')}
+        self.input: Dict[Tuple[str, str], Optional[Tuple[Node, Any]]] = {}
+        for node in nodes:
+            for input_name, other_node_data in node.input.items():
+                if other_node_data is not None and other_node_data[0].name not in names:
+                    self.input[(node.name, input_name)] = other_node_data
+
+    def __repr__(self):
+        return f'{self.__class__.__name__} at {hex(id(self))} ({len(self.nodes)} nodes): ({self.name})'
+
+    def run_all(self, input: Dict[Tuple[str, str], Any]) -> Dict[str, Any]:
+        """
+        Run the chain, return the output of the last node and of the nodes reported
+        @param input: format is {(node name, node input): value}
+        """
+        results: Dict[str, Any] = {}
+        for node in self.nodes:
+            node_input = {}
+            for input_name, other_node_data in node.input.items():
+                if (node.name, input_name) in input:
+                    node_input[input_name] = input[(node.name, input_name)]
+                elif other_node_data is not None:
+                    node_input[input_name] = results[other_node_data[0].name][other_node_data[1]]
+            results[node.name] = node.run(node_input)
+        return {i: results[i] for i in (*self.reported, self.name)}
+
+
+def fuse_chains(task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any],
+                keep: Container[str], ends: Container[str] = ()) -> Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any]]:
+    """
+    Return the sequence with chains of crumbs as FusedNode, and inputs_required for it
+    A chain grows from a node to its only user, or to a user of a cheap crumb, when the user depends only on the chain
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param inputs_required: format is {(node_name, node_input): value}
+    @param keep: the nodes whose output is needed after the execution (mapped to output, aliases), they are reported when inside a chain
+    @param ends: the nodes ending a chain, their output is needed as soon as they finish
+    """
+    # format: {'node name': ['node name using it', ...]}
+    users: Dict[str, List[str]] = {}
+    tasks: Dict[str, TaskDependencies] = {}
+    for task in task_seq:
+        tasks[task['node'].name] = task
+        for dependency in set(task['deps']):
+            users.setdefault(dependency, []).append(task['node'].name)
+
+    def can_fuse(task: TaskDependencies) -> bool:
+        # a crumb with a timeout is a task of its own, the timeout is not shared with the other crumbs
+        return (not isinstance(task['node'], FusedNode) and task['node'].bakery_item.__class__.__name__ == 'Crumb'
+                and task['node'].bakery_item.timeout is None)
+
+    fused: Set[str] = set()
+    chains: List[FusedNode] = []
+    new_seq: List[TaskDependencies] = []
+    for task in task_seq:
+        if task['node'].name in fused:
+            continue
+        chain = [task['node']]
+        names = {task['node'].name}
+        while can_fuse(task) and chain[-1].name not in ends:
+            candidates = [tasks[i] for i in users.get(chain[-1].name, []) if i in tasks and i not in fused and can_fuse(tasks[i])
+                          and all(j in names for j in tasks[i]['deps'])]
+            if len(users.get(chain[-1].name, [])) == 1 and candidates:
+                next_task = candidates[0]
+            else:
+                next_task = next((i for i in candidates if getattr(i['node'].bakery_item, 'cheap', False)), None)
+            if next_task is None:
+                break
+            chain.append(next_task['node'])
+            names.add(next_task['node'].name)
+        if len(chain) == 1:
+            new_seq.append(task)
+            continue
+        fused.update(names)
+        # the other outputs stay in the task, the nodes saving their output get it only if it comes back
+        reported = [i.name for i in chain[:-1] if i.name in keep or any(j not in names for j in users.get(i.name, []))]
+        new_seq.append({'node': FusedNode(chain, reported), 'deps': list(task['deps'])})  # type: ignore
+        chains.append(new_seq[-1]['node'])  # type: ignore
+    return new_seq, _inputs_of_groups(chains, inputs_required)
+
+
+def _inputs_of_groups(groups: List[FusedNode], inputs_required: Dict[Tuple[str, Any], Any]) -> Dict[Tuple[str, Any], Any]:
+    """
+    Return inputs_required with the input of the nodes inside a group given to the group, format is {(group name, (node name, node input)): value}
+    @param groups: the groups of nodes (FusedNode) replacing their nodes in the sequence
+    @param inputs_required: format is {(node_name, node_input): value}
+    """
+    group_of = {node.name: group.name for group in groups for node in group.nodes}
+    new_inputs_required: Dict[Tuple[str, Any], Any] = {}
+    for (node_name, node_input), value in inputs_required.items():
+        if node_name in group_of:
+            new_inputs_required[(group_of[node_name], (node_name, node_input))] = value
+        else:
+            new_inputs_required[(node_name, node_input)] = value
+    return new_inputs_required
+
+
+class StreamAborted(RuntimeError):
+    """A crumb of the stream failed, the others stop reading and writing their channels"""
+
+
+class Channel:
+    """
+    The chunks given by a streaming crumb to a crumb taking them as a stream, at most Settings.STREAM_CHANNEL_SIZE chunks wait in it:
+    the writer waits for the reader (backpressure), the chunks are dropped once the reader finished
+    """
+    END = object()
+
+    def __init__(self, aborted: threading.Event):
+        """
+        @param aborted: set when a crumb of the stream failed
+        """
+        self.chunks: queue.Queue = queue.Queue(Settings.STREAM_CHANNEL_SIZE)
+        self.aborted = aborted
+        self.reader_done = False
+
+    def put(self, chunk: Any) -> None:
+        """
+        Give a chunk to the reader, waiting while the channel is full
+        @param chunk: the chunk, Channel.END after the last one
+        """
+        while not self.reader_done:
+            if self.aborted.is_set():
+                raise StreamAborted('stream aborted')
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        while True:
+            try:
+                chunk = self.chunks.get(timeout=0.1)
+            except queue.Empty:
+                if self.aborted.is_set():
+                    raise StreamAborted('stream aborted')  # pylint: disable=raise-missing-from
+                continue
+            if chunk is Channel.END:
+                return
+            yield chunk
+
+
+class StreamNode(FusedNode):
+    """
+    Streaming crumbs and the crumbs taking their chunks as a stream, executed as one task with each crumb in a thread
+    The chunks go through a Channel for each input taken as a stream, the nodes inside only take streams from each other (see group_streams).
+    The whole output of a streaming crumb is recombined with its merge only if it is reported (or it is the last node), otherwise
+    the node does not keep it (save_exec).
+    """
+    def run_all(self, input: Dict[Tuple[str, str], Any]) -> Dict[str, Any]:
+        """
+        Run the crumbs at the same time, return the output of the last node and of the nodes reported
+        @param input: format is {(node name, node input): value}
+        """
+        aborted = threading.Event()
+        # format: {'node name': [Channel to each input taking its chunks]}
+        readers: Dict[str, List[Channel]] = {node.name: [] for node in self.nodes}
+        # format: {'node name': [Channel of each of its inputs taking chunks]}
+        inputs_read: Dict[str, List[Channel]] = {node.name: [] for node in self.nodes}
+        node_inputs: Dict[str, Dict[str, Any]] = {}
+        for node in self.nodes:
+            node_inputs[node.name] = {}
+            for input_name, other_node_data in node.input.items():
+                if (node.name, input_name) in input:
+                    value = input[(node.name, input_name)]
+                    node_inputs[node.name][input_name] = iter([value]) if input_name in node.bakery_item.stream_input else value
+                elif other_node_data is not None:
+                    channel = Channel(aborted)
+                    readers[other_node_data[0].name].append(channel)
+                    inputs_read[node.name].append(channel)
+                    node_inputs[node.name][input_name] = iter(channel)
+        results: Dict[str, Any] = {}
+        errors: List[BaseException] = []
+
+        def run_node(node: Node) -> None:
+            try:
+                output = node.bakery_item.run_stream(node_inputs[node.name])
+                collect = node.name in self.reported or node.name == self.name
+                if node.bakery_item.streaming:
+                    chunks = []
+                    for chunk in output:
+                        for channel in readers[node.name]:
+                            channel.put(chunk)
+                        if collect:
+                            chunks.append(chunk)
+                    output = merge_parts(node.bakery_item.merge, chunks) if chunks else []
+                for channel in readers[node.name]:
+                    channel.put(Channel.END)
+                results[node.name] = {None: output}
+                if node.save_exec and (not node.bakery_item.streaming or collect):
+                    node.last_exec = results[node.name]
+            except BaseException as error:  # pylint: disable=broad-except
+                errors.append(error)
+                aborted.set()
+            finally:
+                for channel in inputs_read[node.name]:
+                    channel.reader_done = True
+
+        threads = [threading.Thread(target=run_node, args=(node,), name=f'Stream-{node.name}', daemon=True) for node in self.nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise next((i for i in errors if not isinstance(i, StreamAborted)), errors[0])
+        return {i: results[i] for i in (*self.reported, self.name)}
+
+
+def group_streams(task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any], aliases: Dict[str, List[str]],
+                  keep: Container[str]) -> Tuple[List[TaskDependencies], Dict[Tuple[str, Any], Any]]:
+    """
+    Return the sequence with the nodes connected by streams (the output of a streaming crumb to an input in stream_input) as StreamNode,
+    and inputs_required for it
+    A node needing the whole output of a node of its group, or the output of a node running after its group, is left out of the group
+    (it gets the chunks recombined), so the groups can run one after the other.
+    A node taking two streams coming from the same node (a diamond) is also left out: reading one of them to its end would leave
+    the writer waiting on the full channel of the other.
+    @param task_seq: execution sequence with nodes after their dependencies
+    @param inputs_required: format is {(node_name, node_input): value}
+    @param aliases: from merge_common_nodes(), format is {node_name: [node_name_1, ...]}
+    @param keep: the nodes whose output is needed after the execution, they are reported when inside a group (as the nodes saving
+                 their output, except the streaming crumbs)
+    """
+    replaced = {j: i for i, aliased in aliases.items() for j in aliased}
+    tasks = {i['node'].name: i for i in task_seq}
+    # the dependencies by the name of the node executed, format: {'node name': {'node name', ...}}
+    deps = {name: {replaced.get(i, i) for i in task['deps']} for name, task in tasks.items()}
+    users: Dict[str, Set[str]] = {}
+    for name, node_deps in deps.items():
+        for dependency in node_deps:
+            users.setdefault(dependency, set()).add(name)
+
+    def can_stream(name: str) -> bool:
+        return name in tasks and tasks[name]['node'].__class__.__name__ == 'Node' and tasks[name]['node'].bakery_item.__class__.__name__ == 'Crumb'
+
+    def is_stream(node: Node, input_name: str, other_node_data: Optional[Tuple[Node, Any]]) -> bool:
+        return other_node_data is not None and can_stream(other_node_data[0].name) and input_name in node.bakery_item.stream_input \
+            and other_node_data[0].bakery_item.streaming
+
+    excluded: Set[str] = set()
+    while True:
+        # format: {'node name': 'node name of the same group'}, the group is the name reached at the end
+        parent: Dict[str, str] = {}
+
+        def find(name: str) -> str:
+            while parent.setdefault(name, name) != name:
+                name = parent[name]
+            return name
+        for name, task in tasks.items():
+            if not can_stream(name) or name in excluded:
+                continue
+            for input_name, other_node_data in task['node'].input.items():
+                if is_stream(task['node'], input_name, other_node_data) and other_node_data[0].name not in excluded:  # type: ignore
+                    parent[find(name)] = find(other_node_data[0].name)  # type: ignore
+        # format: {'node name': 'group'}, only the groups of many nodes
+        group_of = {i: find(i) for i in parent}
+        group_of = {i: j for i, j in group_of.items() if sum(k == j for k in group_of.values()) > 1}
+        # the groups and the nodes outside them run after each group
+        unit_users: Dict[str, Set[str]] = {}
+        for name, node_deps in deps.items():
+            for dependency in node_deps:
+                if group_of.get(dependency, dependency) != group_of.get(name, name):
+                    unit_users.setdefault(group_of.get(dependency, dependency), set()).add(group_of.get(name, name))
+        after: Dict[str, Set[str]] = {}
+        for group in set(group_of.values()):
+            after[group] = set()
+            pending = list(unit_users.get(group, ()))
+            while pending:
+                unit = pending.pop()
+                if unit not in after[group]:
+                    after[group].add(unit)
+                    pending.extend(unit_users.get(unit, ()))
+
+        def upstream(name: str, group: str) -> Set[str]:
+            # the node and the nodes of its group before it
+            reached: Set[str] = set()
+            pending = [name]
+            while pending:
+                current = pending.pop()
+                if current not in reached:
+                    reached.add(current)
+                    pending.extend(i for i in deps[current] if group_of.get(i) == group)
+            return reached
+        conflicts = set()
+        for name, group in group_of.items():
+            node = tasks[name]['node']
+            sources: Set[str] = set()
+            for input_name, other_node_data in node.input.items():
+                if is_stream(node, input_name, other_node_data) and group_of.get(other_node_data[0].name) == group:  # type: ignore
+                    reached = upstream(other_node_data[0].name, group)  # type: ignore
+                    if reached & sources:
+                        conflicts.add(name)
+                    sources |= reached
+            for dependency in deps[name]:
+                whole = any(not is_stream(node, i, j) or j[0].name != dependency  # type: ignore
+                            for i, j in node.input.items() if j is not None and replaced.get(j[0].name, j[0].name) == dependency)
+                if group_of.get(dependency, dependency) in after[group] or (group_of.get(dependency) == group and whole):
+                    conflicts.add(name)
+        if not conflicts:
+            break
+        excluded.update(conflicts)
+    if not group_of:
+        return task_seq, inputs_required
+    groups: List[StreamNode] = []
+    placed: Set[str] = set()
+    new_seq: List[TaskDependencies] = []
+    for task in task_seq:
+        name = task['node'].name
+        if name not in group_of:
+            new_seq.append(task)
+            continue
+        group = group_of[name]
+        if group in placed:
+            continue
+        placed.add(group)
+        # in the order of the sequence, the group is placed at its first node
+        members = [i for i in tasks if group_of.get(i) == group]
+        reported = [i for i in members[:-1] if i in keep or i in aliases or any(group_of.get(j) != group for j in users.get(i, ()))
+                    or (tasks[i]['node'].save_exec and not tasks[i]['node'].bakery_item.streaming)]
+        groups.append(StreamNode([tasks[i]['node'] for i in members], reported))
+        deps = (i for j in members for i in tasks[j]['deps'] if group_of.get(replaced.get(i, i)) != group)  # type: ignore
+        new_seq.append({'node': groups[-1], 'deps': list(dict.fromkeys(deps))})
+    return new_seq, _inputs_of_groups(groups, inputs_required)  # type: ignore
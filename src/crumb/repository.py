@@ -4,7 +4,7 @@ This module stores the definition of CrumbRepository
 
 Note, pylint comments are due to variables being defined inside reset() rather than __init__() due to singleton
 """
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, Sequence, Union
 import inspect
 import warnings
 
@@ -23,13 +23,28 @@ class CrumbRepository:
             CrumbRepository.CRUMB_REPOSITORY_INSTANCE.reset()
         return CrumbRepository.CRUMB_REPOSITORY_INSTANCE
 
-    def add_crumb(self, name: str, func: Callable, input: Optional[Dict[str, type]], output: Optional[type]):
+    def add_crumb(self, name: str, func: Callable, input: Optional[Dict[str, type]], output: Optional[type], pure: bool = False, cheap: bool = False,
+                  resources: Sequence[str] = (), target: Optional[str] = None, requires: Optional[Dict[str, float]] = None,
+                  batched: bool = False, rowwise: bool = False, merge: Union[str, Callable] = 'concat', streaming: bool = False,
+                  stream_input: Sequence[str] = (), timeout: Optional[float] = None, retries: int = 0):
         """
         Adds a crumb to the repository. Do not call this function directly, use the decorator.
         @param name: short name for this function, if None name will be given from the filepath
         @param func: the function
         @param input: the input of the function: {'param1': int, 'param2': class, ...}
         @param output: the output of the function, int, float, class, ..., obtained from type()
+        @param pure: the output depends only on the input
+        @param cheap: the function is fast
+        @param resources: the resources given to the function
+        @param target: where the HybridSlicer runs it
+        @param requires: amounts of named resources used while it runs
+        @param batched: the function runs many records at once
+        @param rowwise: the function can run on each partition of the rows
+        @param merge: how the output of the partitions (or the chunks) is recombined
+        @param streaming: the function yields its output in chunks
+        @param stream_input: the parameters given as an iterator over chunks
+        @param timeout: seconds a run can take in the MultiSlicer
+        @param retries: times the MultiSlicer runs it again after a failure
         """
         if self._mute:
             return
@@ -59,8 +74,10 @@ class CrumbRepository:
                 raise ValueError(f'At least one input parameter is not a type. check: "{_invalid_input_str}"')
         # starts the new crumb
         # it is expected that there is always at least 2 frames up: this one, the decorator call, and the module.
-        new_crumb = Crumb(name=name, input=input, output=output, func=func, file=inspect.getfile(inspect.currentframe().f_back.f_back))  # type: ignore
-        if self._redirect:
+        new_crumb = Crumb(name=name, input=input, output=output, func=func, file=inspect.getfile(inspect.currentframe().f_back.f_back),  # type: ignore
+                          pure=pure, cheap=cheap, resources=resources, target=target, requires=requires, batched=batched,
+                          rowwise=rowwise, merge=merge, streaming=streaming, stream_input=stream_input, timeout=timeout, retries=retries)
+        if self._redirect is not None:
             self._redirect[name] = new_crumb
         else:
             self.crumbs[name] = new_crumb
@@ -73,7 +90,7 @@ class CrumbRepository:
         Return the crumb object for a given name
         @param name
         """
-        if self._redirect:
+        if self._redirect is not None:
             return self._redirect[name]
         return self.crumbs[name]
 
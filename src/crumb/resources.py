@@ -0,0 +1,107 @@
+"""
+Module resources
+Resources used by the crumbs and kept between their executions, e.g. a loaded model or a connection.
+
+A resource is declared with @resource on a function returning it, or on a generator yielding it (the code after the
+yield tears it down). A crumb asks for resources with @crumb(resources=[...]), they are given as the parameters with the
+same name. Each process starts a resource the first time it is used: the resources are not created again
+when a MultiSlicer worker executes the crumb modules, and are torn down when the slicer is killed.
+The threads of a process share its resources (e.g. Slice.run_iter, the HybridSlicer threads), a resource that cannot be used
+by several threads at once is declared with @resource(per_thread=True) and each thread starts its own.
+"""
+from typing import Callable, Dict, Tuple, Any, Optional, Iterator, Set
+import atexit
+import inspect
+import os
+import threading
+
+from crumb.logger import LoggerQueue, log, logging
+
+
+class ResourcePool:
+    """
+    Stores the resource definitions and the resources started in this process
+    """
+    # format: {'resource name': function}
+    DEFINITIONS: Dict[str, Callable] = {}
+    # the resources started by each thread
+    PER_THREAD: Set[str] = set()
+    # in order of creation, the ones of other processes were copied by fork and are not used
+    # format: {(pid, thread id or None for the process, 'resource name'): (resource, generator to tear it down or None)}
+    INSTANCES: Dict[Tuple[int, int, str], Tuple[Any, Optional[Iterator]]] = {}
+    # a resource can use another one
+    LOCK = threading.RLock()
+
+    @classmethod
+    def define(cls, name: str, func: Callable, per_thread: bool = False) -> None:
+        """
+        Add the definition of a resource, it replaces the previous one (e.g. the module was executed again)
+        @param name: name of the resource, the parameter of the crumbs using it
+        @param func: function returning the resource, or generator yielding it
+        @param per_thread: each thread starts its own resource, otherwise the threads of the process share it
+        """
+        if inspect.signature(func).parameters:
+            raise ValueError(f'resource "{name}" must be defined by a function without parameters')
+        cls.DEFINITIONS[name] = func
+        if per_thread:
+            cls.PER_THREAD.add(name)
+        else:
+            cls.PER_THREAD.discard(name)
+
+    @classmethod
+    def get(cls, name: str) -> Any:
+        """
+        Return a resource for this process (or this thread if per_thread), it is started on first use
+        @param name: name of the resource
+        """
+        key = (os.getpid(), threading.get_ident() if name in cls.PER_THREAD else None, name)
+        with cls.LOCK:
+            if key not in cls.INSTANCES:
+                if name not in cls.DEFINITIONS:
+                    raise ValueError(f'resource "{name}" is not defined, use @resource')
+                log(LoggerQueue.get_logger(), f'resources> starting {name}', logging.INFO)
+                func = cls.DEFINITIONS[name]
+                if inspect.isgeneratorfunction(func):
+                    generator = func()
+                    cls.INSTANCES[key] = (next(generator), generator)
+                else:
+                    cls.INSTANCES[key] = (func(), None)
+                if len(cls.INSTANCES) == 1:
+                    atexit.register(cls.close)
+            return cls.INSTANCES[key][0]
+
+    @classmethod
+    def close(cls) -> None:
+        """Tear down the resources started in this process (by all its threads), the last started goes first"""
+        pid = os.getpid()
+        with cls.LOCK:
+            instances, cls.INSTANCES = cls.INSTANCES, {}
+            for (instance_pid, _, name), (_, generator) in reversed(list(instances.items())):
+                if instance_pid != pid or generator is None:
+                    continue
+                log(LoggerQueue.get_logger(), f'resources> tearing down {name}', logging.INFO)
+                try:
+                    next(generator)
+                except StopIteration:
+                    pass
+                except Exception as error:  # pylint: disable=broad-except
+                    # the other resources are still torn down
+                    log(LoggerQueue.get_logger(), f'resources> error tearing down {name}: {error}', logging.ERROR)
+                else:
+                    generator.close()
+
+
+def resource(_func=None, *, name=None, per_thread=False):
+    """
+    Decorator that defines a resource for the crumbs
+    @param _func: the function under the decorator, it returns the resource or yields it (and tears it down after the yield)
+    @param name: name of the resource, the function name if None
+    @param per_thread: each thread starts its own resource (e.g. a connection that cannot be shared), otherwise it is shared by
+                       the threads of the process
+    """
+    def decorator_add(func):
+        ResourcePool.define(name if name is not None else func.__name__, func, per_thread)
+        return func
+    if _func is None:  # decorator called with arguments
+        return decorator_add
+    return decorator_add(_func)
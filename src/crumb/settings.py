@@ -1,6 +1,6 @@
 """Global settings for the execution"""
 
-from typing import Any
+from typing import Any, Dict, List, Optional
 import logging
 
 
@@ -15,10 +15,59 @@ class Settings:
     # if started as single, then exec as multi, then changed to single it might break depending where the functions come from!
     # if the functions come from top level of a file it will work
     USE_MULTISLICER = False
-    MULTISLICER_WAITWORKER_DELAY = .1  # TODO: this setting might not work - it will be obtained by other processes but cannot be set from another one
+    # run each node where its crumb asks (@crumb(target=...)): inline, in a thread pool or in the MultiSlicer workers
+    USE_HYBRIDSLICER = False
+    HYBRIDSLICER_THREADS = 8
+    # where the HybridSlicer runs the crumbs without a target (the cheap crumbs run inline)
+    HYBRIDSLICER_DEFAULT_TARGET = 'inline'
+    # limits of the amounts declared by the crumbs (@crumb(requires=...)) for the tasks running at once in the MultiSlicer and the
+    # HybridSlicer, e.g. {'cpu': 8, 'memory': 16e9, 'license': 2}, the names not here are not limited
+    SLICER_BUDGETS: Dict[str, float] = {}
+    # the MultiSlicer starts MULTISLICER_MIN_THREADS workers and adds workers (up to MULTISLICER_THREADS and the CPUs the process can use)
+    # when tasks are waiting and the CPUs are not busy, the extra workers stop after MULTISLICER_IDLE_TIMEOUT seconds without tasks
     MULTISLICER_THREADS = 4
+    MULTISLICER_MIN_THREADS = 1
+    MULTISLICER_IDLE_TIMEOUT = 30.
+    # outputs bigger than this (bytes) that are not returned to the caller stay in the MultiSlicer worker computing them,
+    # the nodes using them are sent to that worker (0 disables it and the count of bytes moved), their nodes do not save them (last_exec is None)
+    MULTISLICER_LOCALITY_BYTES = 1 << 20
+    # start method of the MultiSlicer processes: None for the platform default, 'fork', 'forkserver' or 'spawn'
+    MULTISLICER_START_METHOD = None
+    # python files with crumbs loaded before starting the MultiSlicer workers, with fork (or forkserver) the workers share the pages
+    # of their modules (e.g. big read-only data) instead of each executing the modules again
+    MULTISLICER_PRELOAD: List[str] = []
+    # maximum number of tasks sent at once to a MultiSlicer worker, fewer are sent when there are not many ready
+    MULTISLICER_BATCH_SIZE = 64
+    # a node of a pure crumb running for more than MULTISLICER_SPECULATIVE times the median of its last runs is also started in another
+    # MultiSlicer worker, the first output is used (0 disables it)
+    MULTISLICER_SPECULATIVE = 0.
     # if atexit does not work properly it will be required to manually ask the threads to exit!
     MULTISLICER_START_THEN_KILL_THREADS = False
+    # run once the nodes of a pure crumb with the same input (in each Slice.run)
+    PLANNER_MERGE_PURE_NODES = True
+    # keep the output of pure crumbs that do not depend on the Slice input between runs (of the same Slice)
+    PLANNER_CACHE_CONSTANT_NODES = True
+    # send chains of crumbs as a single task to slicers where each task has a cost (MultiSlicer)
+    PLANNER_FUSE_CHAINS = True
+    # Slice.run_many runs the records in micro-batches when the Slice has batched crumbs (@crumb(batched=True)): a micro-batch is run
+    # with SLICE_BATCH_SIZE records, or when its first record waited SLICE_BATCH_LATENCY seconds for the next ones (e.g. from a generator)
+    SLICE_BATCH_SIZE = 256
+    SLICE_BATCH_LATENCY = 0.05
+    # number of partitions of Slice.run_partitioned, 0 for the number of CPUs the process can use
+    SLICE_PARTITIONS = 0
+    # the most elements of a Map (crumb.bakery_items.map) running at once, if the Map does not set it
+    MAP_WINDOW = 32
+    # the most chunks waiting between two streaming crumbs (@crumb(streaming=True)), a crumb yielding more waits for the next one to read
+    STREAM_CHANNEL_SIZE = 8
+    # Slice.run(..., resume=run id) keeps the output of each node in a folder of CHECKPOINT_DIR for the run (None for a folder in the
+    # temporary directory), written with the module CHECKPOINT_FORMAT (dumps and loads, e.g. 'pickle' or 'cloudpickle')
+    # the runs not used for CHECKPOINT_MAX_AGE seconds and the oldest ones past CHECKPOINT_MAX_RUNS are deleted when a run starts
+    CHECKPOINT_DIR: Optional[str] = None
+    CHECKPOINT_FORMAT = 'pickle'
+    CHECKPOINT_MAX_RUNS = 16
+    CHECKPOINT_MAX_AGE = 7 * 24 * 3600.
+    # keep the slices/crumb modules loaded from files between loads (otherwise they are shared only within a load)
+    SLICE_CACHE_PER_PROCESS = False
     # web goes into subfolders?
     WEB_EXPLORE_SUBFOLDERS = True
     # web skip _ and . starting folders
@@ -2,8 +2,10 @@
 Module Slicer
 Definition for the Slicer class with the generic definition of an executor for BakeryItems.
 """
-from typing import Union, TypedDict, List, Dict, Tuple, Any, Optional
+from collections import deque
+from typing import Union, TypedDict, List, Dict, Tuple, Any, Optional, Deque, Container, Callable
 from crumb.node import Node
+from crumb.logger import LoggerQueue, log, logging
 
 
 class TaskDependencies(TypedDict):
@@ -18,11 +20,187 @@ class TaskToBeDone(TypedDict):
     input: Dict[str, Any]
 
 
+class DependencyTracker:
+    """
+    Dependencies between the nodes of a single add_work call.
+    Each call has its own tracker so that slicers can be re-entered (e.g. a Slice inside a Slice).
+    Tasks can be added while it runs: the node of a Map or Switch is replaced by the nodes it expands to once its input is known
+    (crumb.planner.expand_node), the nodes using it wait for the last of them, which takes its name.
+    """
+    def __init__(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None, aliases: Dict[str, List[str]] = None,
+                 on_result: Callable[[str, Dict[Any, Any]], None] = None):
+        """
+        @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
+        @param inputs_required: format is {(node_name, node_input): value}
+        @param aliases: nodes (not in task_seq) getting the output of a node, format is {node_name: [node_name_1, ...]}
+        @param on_result: called with the name and the output of each node (and alias) when it is set
+        """
+        # ready for execution
+        # [{'node': node, 'input': {name': value}}]
+        self.ready: Deque[TaskToBeDone] = deque()
+        # {node_name: {var: value}}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        # {node_name: {var: value}}
+        self.input_for_nodes: Dict[str, Dict[str, Any]] = {}
+        # {node_name: node}
+        self.node_waiting: Dict[str, Node] = {}
+        # {deps: [node_name]}
+        self.deps_to_nodes: Dict[str, List[str]] = {}
+        # if node not in here it means dependencies were solved and sent for execution
+        # {node_name: [deps]}
+        self.nodes_to_deps: Dict[str, List[str]] = {}
+        # {node_name: [node_name_1, ...]}
+        self.aliases: Dict[str, List[str]] = aliases if aliases is not None else {}
+        self.on_result = on_result
+        self.add_tasks(task_seq, inputs_required)
+
+    def add_tasks(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None) -> None:
+        """
+        Add tasks, their dependencies are nodes already known (done or not) or nodes of task_seq
+        @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
+        @param inputs_required: format is {(node_name, node_input): value}
+        """
+        # if some nodes require some input add them to the relation first
+        if inputs_required is not None:
+            for (node_name, node_input), value in inputs_required.items():
+                if node_name not in self.input_for_nodes:
+                    self.input_for_nodes[node_name] = {}
+                self.input_for_nodes[node_name][node_input] = value
+        # compute nodes with node-node dependencies
+        for task_element in task_seq:
+            node = task_element['node']
+            deps = [i for i in task_element['deps'] if i not in self.results]
+            if len(deps) == 0:
+                self._set_ready(node)
+                continue
+            self.node_waiting[node.name] = node
+            self.nodes_to_deps[node.name] = deps
+            for dependency in deps:
+                if dependency not in self.deps_to_nodes:
+                    self.deps_to_nodes[dependency] = []
+                self.deps_to_nodes[dependency].append(node.name)
+
+    def _set_ready(self, node: Node) -> None:
+        """
+        Send a node with its dependencies done for execution, or add the nodes it expands to
+        @param node: the node
+        """
+        task = self._make_task(node)
+        if getattr(node, 'bakery_item', None).__class__.__name__ in ('Map', 'Switch'):
+            from crumb.planner import expand_node  # pylint: disable=import-outside-toplevel  # the planner imports this module
+            expanded = expand_node(task)
+            if expanded is not None:
+                self._expand(*expanded)
+                return
+        self.ready.append(task)
+
+    def _expand(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any]) -> None:
+        """
+        Add the tasks replacing a node
+        @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
+        @param inputs_required: format is {(node_name, node_input): value}
+        """
+        self.add_tasks(task_seq, inputs_required)
+
+    def set_result(self, node_name: str, output: Dict[str, Any]) -> None:
+        """
+        Store the output of a node and move the nodes depending only on it to ready
+        @param node_name: node executed
+        @param output: its output
+        """
+        self.results[node_name] = output
+        if self.on_result is not None:
+            self.on_result(node_name, output)
+        for alias in self.aliases.get(node_name, []):
+            self.set_result(alias, output)
+        if node_name not in self.deps_to_nodes:
+            return
+        # get these dependencies
+        for waiting_name in self.deps_to_nodes.pop(node_name):  # we are done with this one
+            # remove dependency for the task finished
+            self.nodes_to_deps[waiting_name].remove(node_name)
+            # if there are no more dependencies prepare it to run
+            if len(self.nodes_to_deps[waiting_name]) == 0:
+                self.nodes_to_deps.pop(waiting_name)
+                # remove from waiting list, send for execution
+                self._set_ready(self.node_waiting.pop(waiting_name))
+
+    def _make_task(self, node: Node) -> TaskToBeDone:
+        """
+        Return the task for a node with its dependencies done
+        @param node: the node
+        """
+        # collect input for node, we can clean this as it is sent
+        collected_inputs = self.input_for_nodes.pop(node.name, {})
+        # get all inputs - they are done (the output of nodes not executed is already in the input)
+        for input_name, from_other_nodes in node.input.items():
+            if from_other_nodes and input_name not in collected_inputs:
+                (previous_node, other_node_input) = from_other_nodes
+                collected_inputs[input_name] = self.results[previous_node.name][other_node_input]
+        log(LoggerQueue.get_logger(), 'adding to queue>', logging.DEBUG, payload={'node': node.name, 'input': collected_inputs})
+        return {'node': node, 'input': collected_inputs}
+
+    def is_done(self) -> bool:
+        """Return True if there is nothing else to be executed"""
+        return len(self.ready) == 0 and len(self.node_waiting) == 0
+
+
+class Budget:
+    """
+    Amounts of named resources (e.g. 'cpu', 'memory', a license) used by the tasks running, against their limits.
+    The crumbs declare what they need with @crumb(requires={'name': amount}), the names without a limit are not counted.
+    """
+    def __init__(self, limits: Dict[str, float]):
+        """
+        @param limits: format is {'name': amount}, e.g. Settings.SLICER_BUDGETS
+        """
+        self.limits = limits
+        # format: {'name': amount}
+        self.used: Dict[str, float] = {}
+        # tasks running with requirements
+        self.n_running = 0
+
+    def get_requirements(self, node: Node) -> Dict[str, float]:
+        """
+        Return the amounts a node needs of the resources with a limit, a chain of nodes (FusedNode) needs the most of each node
+        @param node: the node
+        """
+        requires: Dict[str, float] = {}
+        for sub_node in getattr(node, 'nodes', [node]):
+            for name, amount in getattr(sub_node.bakery_item, 'requires', {}).items():
+                if name in self.limits:
+                    requires[name] = max(requires.get(name, 0), amount)
+        return requires
+
+    def fits(self, requires: Dict[str, float]) -> bool:
+        """
+        Return True if the amounts fit in what is left, a task needing more than a limit runs when no other task is running
+        @param requires: format is {'name': amount}
+        """
+        if self.n_running == 0:
+            return True
+        return all(self.used.get(i, 0) + j <= self.limits[i] for i, j in requires.items())
+
+    def acquire(self, requires: Dict[str, float]) -> None:
+        """Count the amounts of a task starting"""
+        self.n_running += 1
+        for name, amount in requires.items():
+            self.used[name] = self.used.get(name, 0) + amount
+
+    def release(self, requires: Dict[str, float]) -> None:
+        """Count the amounts of a task finished"""
+        self.n_running -= 1
+        for name, amount in requires.items():
+            self.used[name] -= amount
+
+
 class Slicer:
     """
     Virtual definition for graph executors
     """
     TASK_EXECUTOR_INSTANCE = None
+    # whether chains of nodes should be given as a single task (crumb.planner.FusedNode)
+    FUSE_CHAINS = False
 
     def reset(self) -> None:
         """
@@ -30,11 +208,17 @@ class Slicer:
         """
         raise NotImplementedError()
 
-    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None) -> Union[Dict[str, Any], Any]:
+    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None,
+                 aliases: Dict[str, List[str]] = None, keep: Container[str] = None,
+                 on_result: Callable[[str, Dict[Any, Any]], None] = None) -> Union[Dict[str, Any], Any]:
         """
         Add tasks that need to be executed
         @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
         @param inputs_required: format is {(node_name, node_input): value}
+        @param aliases: nodes (not in task_seq) getting the output of a node, format is {node_name: [node_name_1, ...]}
+        @param keep: the nodes whose output is needed by the caller (None for all), the others might not be returned
+        @param on_result: called with the name and the output of each node returned (and alias) as soon as it is known,
+                          in the thread calling add_work, an exception raised by it stops the execution (the tasks running finish)
         """
         raise NotImplementedError()
 
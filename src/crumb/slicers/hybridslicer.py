@@ -0,0 +1,182 @@
+"""Executor running each node inline, in a thread or in a process, as its crumb asks"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from typing import Dict, Any, List, Union, Tuple, Container, Optional, Deque, Callable
+import os
+import threading
+
+from crumb.node import Node
+from crumb.planner import FusedNode
+from crumb.resources import ResourcePool
+from crumb.settings import Settings
+from .generic import Budget, Slicer, TaskDependencies, TaskToBeDone, DependencyTracker
+from .multislicer import MultiSlicer
+
+
+class HybridSlicer(Slicer):
+    """
+    Executes each node where its crumb asks (@crumb(target=...)), the dependencies are kept in the thread running the Slice:
+    'inline' nodes run in that thread (no cost for glue crumbs), 'thread' nodes in a thread pool (I/O) and 'process' nodes
+    in the MultiSlicer workers (CPU-heavy python), each sent as a job with its input.
+    The nodes of crumbs declaring requirements start when they fit in the budget (Settings.SLICER_BUDGETS), shared by the add_work calls
+    running at once (e.g. Slice.run_iter, a Slice inside the Slice).
+    The nodes of a Slice inside the Slice run inline, the Slice sends its own nodes.
+    Streaming crumbs running together (crumb.planner.StreamNode) wait for each other: they run in a thread, or in a MultiSlicer worker
+    if one of them asks for a process.
+    """
+    TASK_EXECUTOR_INSTANCE = None
+
+    def __new__(cls):
+        if cls.TASK_EXECUTOR_INSTANCE is None:
+            cls.TASK_EXECUTOR_INSTANCE = super().__new__(cls)
+            cls.TASK_EXECUTOR_INSTANCE.reset()
+        return cls.TASK_EXECUTOR_INSTANCE
+
+    def reset(self) -> None:
+        # the pools are started when first needed, and again in a process forked from this one (their threads are not copied)
+        self.owner: Optional[int] = None  # pylint: disable=attribute-defined-outside-init
+        self.threads: Optional[ThreadPoolExecutor] = None  # pylint: disable=attribute-defined-outside-init
+        # a thread for each process node running, waiting for its MultiSlicer job
+        self.process_jobs: Optional[ThreadPoolExecutor] = None  # pylint: disable=attribute-defined-outside-init
+        # the amounts used by the nodes running, for all the add_work calls, notified when a node finishes
+        self.budget: Optional[Budget] = None  # pylint: disable=attribute-defined-outside-init
+        self.budget_changed = threading.Condition()  # pylint: disable=attribute-defined-outside-init
+        # nodes run by target since the start, format: {'inline': int, 'thread': int, 'process': int}
+        self.stats: Dict[str, int] = {'inline': 0, 'thread': 0, 'process': 0}  # pylint: disable=attribute-defined-outside-init
+
+    def kill(self) -> None:
+        """Stop the threads and the MultiSlicer, tear down the resources started by the crumbs"""
+        if self.owner == os.getpid():
+            for pool in (self.threads, self.process_jobs):
+                if pool is not None:
+                    pool.shutdown(wait=True)
+            if MultiSlicer.TASK_EXECUTOR_INSTANCE is not None:
+                MultiSlicer.TASK_EXECUTOR_INSTANCE.kill()
+        self.reset()
+        ResourcePool.close()
+
+    def _start_if_needed(self) -> None:
+        if self.owner != os.getpid():
+            self.owner = os.getpid()  # pylint: disable=attribute-defined-outside-init
+            self.threads = ThreadPoolExecutor(Settings.HYBRIDSLICER_THREADS,  # pylint: disable=attribute-defined-outside-init
+                                              thread_name_prefix='HybridSlicer-Thread')
+            # enough jobs to keep every MultiSlicer worker busy
+            self.process_jobs = ThreadPoolExecutor(2 * Settings.MULTISLICER_THREADS,  # pylint: disable=attribute-defined-outside-init
+                                                   thread_name_prefix='HybridSlicer-Process')
+            self.budget = Budget(Settings.SLICER_BUDGETS)  # pylint: disable=attribute-defined-outside-init
+            self.budget_changed = threading.Condition()  # pylint: disable=attribute-defined-outside-init
+
+    @staticmethod
+    def get_target(node: Node) -> str:
+        """
+        Return where a node runs: 'inline', 'thread' or 'process'
+        @param node: the node
+        """
+        if isinstance(node, FusedNode):
+            return 'process' if any(HybridSlicer.get_target(i) == 'process' for i in node.nodes) else 'thread'
+        if node.bakery_item.__class__.__name__ != 'Crumb':
+            return 'inline'
+        if node.bakery_item.target is not None:
+            return node.bakery_item.target
+        return 'inline' if node.bakery_item.cheap else Settings.HYBRIDSLICER_DEFAULT_TARGET
+
+    @staticmethod
+    def _run_in_process(slicer: MultiSlicer, node: Node, input: Dict[str, Any]) -> Dict[Any, Any]:
+        results = slicer.add_work([{'node': node, 'deps': []}], {(node.name, i): j for i, j in input.items()})
+        if isinstance(node, FusedNode):
+            return {i: results[i] for i in (*node.reported, node.name)}
+        return results[node.name]
+
+    @staticmethod
+    def _set_result(tracker: DependencyTracker, node: Node, output: Dict[Any, Any]) -> None:
+        if isinstance(node, FusedNode):
+            for node_name, node_output in output.items():
+                tracker.set_result(node_name, node_output)
+        else:
+            tracker.set_result(node.name, output)
+
+    def _notify(self, _: Any = None) -> None:
+        """Wake up the add_work calls waiting for a node to finish or for the budget"""
+        with self.budget_changed:
+            self.budget_changed.notify_all()
+
+    def _release(self, requires: Dict[str, float]) -> None:
+        """Give back the amounts of a node finished"""
+        with self.budget_changed:
+            if requires:
+                self.budget.release(requires)  # type: ignore
+            self.budget_changed.notify_all()
+
+    def _try_start(self, task: TaskToBeDone, requires: Dict[str, float], tracker: DependencyTracker,
+                   running: Dict[Future, Tuple[Node, Dict[str, float]]]) -> bool:
+        """Run an inline task, or start it in its pool, if it fits in the budget, return False otherwise"""
+        with self.budget_changed:
+            if requires:
+                if not self.budget.fits(requires):  # type: ignore
+                    return False
+                self.budget.acquire(requires)  # type: ignore
+        node = task['node']
+        target = self.get_target(node)  # type: ignore
+        self.stats[target] += 1
+        if target == 'inline':
+            try:
+                tracker.set_result(node.name, node.run(task['input']))  # type: ignore
+            finally:
+                if requires:
+                    self._release(requires)
+            return True
+        if target == 'thread':
+            run = node.run_all if isinstance(node, FusedNode) else node.run  # type: ignore
+            future = self.threads.submit(run, task['input'])  # type: ignore
+        else:
+            # the MultiSlicer is started here, the threads waiting for the jobs would each start one
+            future = self.process_jobs.submit(self._run_in_process, MultiSlicer(), node, task['input'])  # type: ignore
+        running[future] = (node, requires)  # type: ignore
+        future.add_done_callback(self._notify)
+        return True
+
+    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None,
+                 aliases: Dict[str, List[str]] = None, keep: Container[str] = None,
+                 on_result: Callable[[str, Dict[Any, Any]], None] = None) -> Union[Dict[str, Any], Any]:
+        """
+        Add tasks that need to be executed
+        @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
+        @param inputs_required: format is {(node_name, node_input): value}
+        @param aliases: nodes (not in task_seq) getting the output of a node, format is {node_name: [node_name_1, ...]}
+        @param keep: the nodes whose output is needed by the caller (None for all), the others might not be returned
+        @param on_result: called with the name and the output of each node (and alias) as soon as it is known
+        """
+        self._start_if_needed()
+        tracker = DependencyTracker(task_seq, inputs_required, aliases, on_result)
+        # the tasks not fitting in the budget, they wait for the running ones (of this call or of the others)
+        # format: deque([(task, requirements)])
+        waiting: Deque[Tuple[TaskToBeDone, Dict[str, float]]] = deque()
+        # format: {Future: (node, requirements)}
+        running: Dict[Future, Tuple[Node, Dict[str, float]]] = {}
+        try:
+            while len(tracker.ready) > 0 or len(waiting) > 0 or len(running) > 0:
+                if len(tracker.ready) > 0:
+                    task = tracker.ready.popleft()
+                    requires = self.budget.get_requirements(task['node'])  # type: ignore
+                    if not self._try_start(task, requires, tracker, running):
+                        waiting.append((task, requires))
+                    continue
+                started = next((i for i, (task, requires) in enumerate(waiting) if self._try_start(task, requires, tracker, running)), None)
+                if started is not None:
+                    del waiting[started]
+                    continue
+                with self.budget_changed:
+                    # checked with the lock held, the nodes finishing and the amounts released notify after it
+                    if not any(i.done() for i in running) and not any(self.budget.fits(i) for _, i in waiting):  # type: ignore
+                        self.budget_changed.wait()
+                for future in [i for i in running if i.done()]:
+                    node, requires = running.pop(future)
+                    self._release(requires)
+                    self._set_result(tracker, node, future.result())
+        except BaseException:
+            # the nodes still running give back their amounts when they finish
+            for future, (_, requires) in running.items():
+                future.add_done_callback(lambda _, requires=requires: self._release(requires))
+            raise
+        # results of the nodes in task_seq and their aliases
+        return tracker.results
@@ -1,168 +1,204 @@
 """Executor with multiprocessing support"""
 import atexit
-from multiprocessing import Manager, Lock, Process, Queue
-from queue import Empty
-from typing import Dict, List, Tuple, Any, Union
+import os
+from multiprocessing import Pipe, Process, get_context
+from typing import Dict, List, Tuple, Any, Union, Container, Optional, Callable
 
 from crumb.settings import Settings
-from crumb.node import Node
 from crumb.logger import LoggerQueue, log, logging
-from .multislicer_functions import do_schedule, do_work, wait_work
-from .generic import Slicer, TaskDependencies, TaskToBeDone  # pylint: disable=unused-import
+from crumb.planner import FusedNode
+from .multislicer_functions import do_schedule, get_cpu_count, get_memory
+from .generic import Slicer, TaskDependencies, DependencyTracker
 
 
 class MultiSlicer(Slicer):
     """
     Multiprocessing executor
+    A scheduler process keeps the dependencies of each add_work call and sends batches of ready tasks to the worker processes.
+    The scheduler adds workers while tasks are waiting and stops the ones idle for Settings.MULTISLICER_IDLE_TIMEOUT seconds.
+    The nodes of crumbs with a timeout or retries (@crumb(timeout=..., retries=...)) run again when they fail, a worker lost is replaced,
+    add_work raises the error when a node cannot finish.
     """
     TASK_EXECUTOR_INSTANCE = None
+    # each task goes through the scheduler and back, a chain is better sent at once
+    FUSE_CHAINS = True
+    # seconds to wait for a process to stop before terminating it
+    KILL_TIMEOUT = 5
+    # runs of a pure crumb needed before starting copies of its slow nodes, the median of the last SPECULATIVE_HISTORY runs is used
+    SPECULATIVE_RUNS = 3
+    SPECULATIVE_HISTORY = 32
 
     def __new__(cls):
         if cls.TASK_EXECUTOR_INSTANCE is None:
             cls.TASK_EXECUTOR_INSTANCE = super().__new__(cls)
+        if not hasattr(cls.TASK_EXECUTOR_INSTANCE, 'processes'):
+            # first use or killed (delete_slicer), it starts with the current settings
             cls.TASK_EXECUTOR_INSTANCE.reset()
         return cls.TASK_EXECUTOR_INSTANCE
 
     def kill(self) -> None:
         """Kill all the multiprocessing processes"""
         log(LoggerQueue.get_logger(), 'multislicer> starting kill ritual', logging.INFO)
-        if hasattr(self, 'processes'):
+        # the processes (and the copies of this object in them) belong to the process that started them
+        if hasattr(self, 'processes') and self.owner == os.getpid():
             # if task executor was started before lets kill everything then restart
-            while not self.tasks_to_be_done.empty():
-                try:
-                    self.tasks_to_be_done.get()
-                except Empty:
-                    pass
-            self.tasks_done.put({'node': None, 'input': {'kill': True}})  # one for the scheduler
-            for _ in range(len(self.processes)):
-                self.tasks_to_be_done.put({'node': None, 'input': {'kill': True}})  # other for workers/wait
+            # the scheduler stops its workers
+            self.control.send({'kill': True})
             log(LoggerQueue.get_logger(), f'{self.__class__.__name__} waiting for all processes to join', logging.INFO)
             for i in self.processes:
                 log(LoggerQueue.get_logger(), f'slicer> joining {i}', logging.INFO)
-                i.join()
+                # the scheduler waits for each worker
+                i.join(self.KILL_TIMEOUT * (self.max_processes + 1))
+                if i.is_alive():
+                    i.terminate()
+                    i.join()
             del self.processes
 
-    def reset(self, number_processes: int = Settings.MULTISLICER_THREADS) -> None:
+    def reset(self, number_processes: Optional[int] = None) -> None:
         """
-        @param number_processes: restarts the MultiSlicer with a number of work processes
+        @param number_processes: restarts the MultiSlicer with up to a number of work processes (None for Settings.MULTISLICER_THREADS),
+                                 capped by the CPUs this process can use
         """
         self.kill()
         if not hasattr(self, 'processes'):
             atexit.register(self.kill)  # this is because __del__ is too late!
+        if number_processes is None:
+            number_processes = Settings.MULTISLICER_THREADS
         # these variables are defined on __new__ due to singleton
-        self.manager = Manager()  # pylint: disable=attribute-defined-outside-init
-        self.lock = Lock()  # pylint: disable=attribute-defined-outside-init
-        self.n_jobs = self.manager.Value(int, 0)  # pylint: disable=attribute-defined-outside-init
+        self.owner = os.getpid()  # pylint: disable=attribute-defined-outside-init
+        context = get_context(Settings.MULTISLICER_START_METHOD)
+        LoggerQueue.use_start_method(Settings.MULTISLICER_START_METHOD)
+        self.n_jobs = context.Value('i', 0)  # pylint: disable=attribute-defined-outside-init
         self.processes: List[Process] = []  # pylint: disable=attribute-defined-outside-init
         self.number_processes = number_processes  # pylint: disable=attribute-defined-outside-init
-        # ready for execution
-        # [{'node': node, 'input': {name': value}}]
-        self.tasks_to_be_done: "Queue[TaskToBeDone]" = Queue()  # pylint: disable=attribute-defined-outside-init
-        # ready to be transmitted to results
-        # {'node_name': node, 'output': {'name': value}}
-        self.tasks_done: Queue = Queue()  # pylint: disable=attribute-defined-outside-init
-        # {node_name: {var: value}}
-        self.results: Dict[str, Any] = self.manager.dict()  # pylint: disable=attribute-defined-outside-init
-        # {node_name: {var: value}}
-        self.input_for_nodes: Dict[str, Dict[str, Any]] = self.manager.dict()  # pylint: disable=attribute-defined-outside-init
-        # {node_name: node}
-        self.node_waiting: Dict[str, Node] = self.manager.dict()  # pylint: disable=attribute-defined-outside-init
-        # {deps: [node_name]}
-        self.deps_to_nodes: Dict[str, List[Node]] = self.manager.dict()  # pylint: disable=attribute-defined-outside-init
-        # if node not in here it means dependencies were solved and sent for execution
-        # {node_name: [deps]}
-        self.nodes_to_deps: Dict[str, List[str]] = self.manager.dict()  # pylint: disable=attribute-defined-outside-init
-        scheduler_process = Process(target=do_schedule,
-                                    name='MultiSlicer-Scheduler',
-                                    args=(self.lock,
-                                          self.tasks_to_be_done, self.tasks_done, LoggerQueue.get_logger(),
-                                          self.results, self.input_for_nodes,
-                                          self.deps_to_nodes, self.nodes_to_deps, self.node_waiting))
+        # the workers are started when there are tasks waiting and stopped when idle, between these numbers
+        self.max_processes = max(1, min(number_processes, get_cpu_count()))  # pylint: disable=attribute-defined-outside-init
+        self.min_processes = max(0, min(Settings.MULTISLICER_MIN_THREADS, self.max_processes))  # pylint: disable=attribute-defined-outside-init
+        # the outputs not returned to the caller can stay in the worker computing them
+        self.locality_bytes = Settings.MULTISLICER_LOCALITY_BYTES  # pylint: disable=attribute-defined-outside-init
+        # add_work sends the jobs to the scheduler
+        # format: {'task_seq': ..., 'inputs_required': ..., 'aliases': ..., 'keep': ..., 'reply': Connection}
+        jobs_reader, self.jobs = Pipe(duplex=False)  # pylint: disable=attribute-defined-outside-init
+        self.jobs_lock = context.Lock()  # pylint: disable=attribute-defined-outside-init
+        # kill call to the scheduler, format: {'kill': True}
+        control_reader, self.control = Pipe(duplex=False)  # pylint: disable=attribute-defined-outside-init
+        self._worker_pids = context.Array('i', self.max_processes)  # pylint: disable=attribute-defined-outside-init
+        self._n_kept = context.Value('q', 0)  # pylint: disable=attribute-defined-outside-init
+        self._bytes_moved = context.Value('q', 0)  # pylint: disable=attribute-defined-outside-init
+        pool = {'min': self.min_processes, 'max': self.max_processes, 'idle_timeout': Settings.MULTISLICER_IDLE_TIMEOUT,
+                'batch_size': Settings.MULTISLICER_BATCH_SIZE, 'locality_bytes': self.locality_bytes, 'kill_timeout': self.KILL_TIMEOUT,
+                'start_method': Settings.MULTISLICER_START_METHOD, 'preload': list(Settings.MULTISLICER_PRELOAD),
+                'budgets': dict(Settings.SLICER_BUDGETS), 'speculative': Settings.MULTISLICER_SPECULATIVE,
+                'speculative_runs': self.SPECULATIVE_RUNS, 'speculative_history': self.SPECULATIVE_HISTORY}
+        # the scheduler starts and stops the workers
+        scheduler_process = context.Process(target=do_schedule,
+                                            name='MultiSlicer-Scheduler',
+                                            args=(jobs_reader, control_reader, LoggerQueue.get_logger(), pool, self._worker_pids, self._n_kept,
+                                                  self._bytes_moved))
         self.processes.append(scheduler_process)
         scheduler_process.start()
-        for i in range(self.number_processes):
-            worker_process = Process(target=do_work,
-                                     name=f'MultiSlicer-Worker-{i}',
-                                     args=(self.tasks_to_be_done, self.tasks_done, LoggerQueue.get_logger()))
-            self.processes.append(worker_process)
-            worker_process.start()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Return {'bytes_moved': bytes of input and output sent between the workers and the scheduler, 'kept': outputs kept in the workers,
+                'workers': worker processes running}
+        """
+        return {'bytes_moved': self._bytes_moved.value, 'kept': self._n_kept.value, 'workers': sum(1 for i in self._worker_pids if i)}
+
+    def worker_memory(self) -> Dict[int, Dict[str, int]]:
+        """
+        Return the memory of each worker, format is {pid: {'rss': bytes, 'pss': bytes, 'private': bytes}}, see get_memory
+        """
+        return {i: get_memory(i) for i in self._worker_pids if i}
 
     def start_if_needed(self) -> None:
         """Start the threads if they are not running"""
         if not hasattr(self, 'processes'):
             self.reset()
 
-    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None) -> Union[Dict[str, Any], Any]:
+    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None,
+                 aliases: Dict[str, List[str]] = None, keep: Container[str] = None,
+                 on_result: Callable[[str, Dict[Any, Any]], None] = None) -> Union[Dict[str, Any], Any]:
+        if aliases is None:
+            aliases = {}
+        if hasattr(self, 'owner') and self.owner != os.getpid():
+            # a Slice inside a Slice, the worker would wait for workers that might not be started
+            return self._run_here(task_seq, inputs_required, aliases, on_result)
         self.start_if_needed()
-        self.lock.acquire()
-        self.n_jobs.value += 1
+        if keep is not None and not self.locality_bytes:
+            keep = None  # nothing stays in the workers
 
         # need to remove the functions to prepare for running
         # this is because multiprocessing might not be able to find the function (e.g. on Windows)
         def _prepare_node_for_exec(node):
-            if node.bakery_item.__class__.__name__ == 'Crumb':
+            if isinstance(node, FusedNode):
+                for sub_node in node.nodes:
+                    _prepare_node_for_exec(sub_node)
+            elif node.bakery_item.__class__.__name__ == 'Crumb':
                 node.bakery_item.func = None
             elif node.bakery_item.__class__.__name__ == 'Slice':
                 for sub_node in node.bakery_item.nodes.values():
-                    _prepare_node_for_exec(sub_node['node'])
+                    _prepare_node_for_exec(sub_node)
+            elif node.bakery_item.__class__.__name__ == 'Map':
+                for sub_node in node.bakery_item.slice.nodes.values():
+                    _prepare_node_for_exec(sub_node)
+            elif node.bakery_item.__class__.__name__ == 'Switch':
+                for case in (*node.bakery_item.cases.values(), *filter(None, [node.bakery_item.default])):
+                    for sub_node in case.nodes.values():
+                        _prepare_node_for_exec(sub_node)
             else:
                 raise NotImplementedError('bakery item inside node not known')
         for task_element in task_seq:
             _prepare_node_for_exec(task_element['node'])
 
+        with self.n_jobs.get_lock():
+            self.n_jobs.value += 1
+        # the results come back through a connection of this call
+        reply, reply_writer = Pipe(duplex=False)
+        with self.jobs_lock:
+            self.jobs.send({'task_seq': task_seq, 'inputs_required': inputs_required if inputs_required is not None else {},
+                            'aliases': aliases, 'keep': set(keep) if keep is not None else None, 'reply': reply_writer,
+                            'early': on_result is not None})
+        reply_writer.close()
+        log(LoggerQueue.get_logger(), 'add task> finished giving tasks', logging.INFO)
         try:
-            # if some nodes require some input add them to the relation first
-            if inputs_required is not None:
-                for (node_name, node_input), value in inputs_required.items():
-                    if node_name not in self.input_for_nodes:
-                        self.input_for_nodes[node_name] = {node_input: value}
-                    else:
-                        # need to reassign due to the way objects in multiprocessing work
-                        temp_dict = self.input_for_nodes[node_name]
-                        temp_dict[node_input] = value
-                        self.input_for_nodes[node_name] = temp_dict
-
-            # compute nodes with node-node dependencies
-            for task_element in task_seq:
-                node, deps = task_element['node'], task_element['deps']
-                if len(deps) == 0:
-                    if node.name not in self.input_for_nodes:
-                        self.tasks_to_be_done.put({'node': node, 'input': {}})
-                    else:
-                        self.tasks_to_be_done.put({'node': node, 'input': self.input_for_nodes[node.name]})
-                    continue
-                self.node_waiting[node.name] = node
-                self.nodes_to_deps[node.name] = deps
-                for dependency in deps:
-                    if dependency not in self.deps_to_nodes:
-                        self.deps_to_nodes[dependency] = [node.name]
-                    else:
-                        # it is silly, but this is the way to share objects using multiprocessing
-                        temp_list = self.deps_to_nodes[dependency]
-                        temp_list.append(node.name)
-                        self.deps_to_nodes[dependency] = temp_list
+            # with on_result, each output is sent when known as (node name, output), then the other outputs at once
+            to_ret = {}
+            message = reply.recv()
+            while isinstance(message, tuple):
+                to_ret[message[0]] = message[1]
+                on_result(message[0], message[1])  # type: ignore
+                message = reply.recv()
+            if isinstance(message, BaseException):
+                raise message  # a node failed after its retries, or a worker keeping outputs of this call was lost
+            to_ret.update(message)
+        except EOFError as error:
+            raise RuntimeError(f'{self.__class__.__name__} stopped before the end of the execution') from error
         finally:
-            log(LoggerQueue.get_logger(), 'add task> finished giving tasks', logging.INFO)
-            self.lock.release()
-        waitwork_process = Process(target=wait_work,
-                                   name='MultiSlicer-Wait',
-                                   args=(self.tasks_to_be_done, LoggerQueue.get_logger(), [i['node'].name for i in task_seq], self.results))
-        self.processes.append(waitwork_process)
-        waitwork_process.start()
-        waitwork_process.join()
-        self.processes.remove(waitwork_process)
-        self.lock.acquire()
-        self.n_jobs.value -= 1
-        self.lock.release()
+            reply.close()
+            with self.n_jobs.get_lock():
+                self.n_jobs.value -= 1
         if self.n_jobs.value == 0 and Settings.MULTISLICER_START_THEN_KILL_THREADS:
             log(LoggerQueue.get_logger(), 'add task > kill trigger', logging.INFO)
             self.kill()
-        # prepare data for return
-        to_ret = {}
         for i in task_seq:
-            # this is needed for MultiSlicer
-            if i['node'].save_exec:
-                i['node'].last_exec = self.results[i['node'].name]
-            to_ret[i['node'].name] = self.results[i['node'].name]
-            self.results.pop(i['node'].name)  # results are not needed here
+            # the nodes executed in other processes, None if their output did not come back (inside a chain or kept in a worker)
+            for node in i['node'].nodes if isinstance(i['node'], FusedNode) else [i['node']]:
+                if node.save_exec:
+                    node.last_exec = to_ret.get(node.name)
         return to_ret
+
+    @staticmethod
+    def _run_here(task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any], aliases: Dict[str, List[str]],
+                  on_result: Callable[[str, Dict[Any, Any]], None] = None) -> Dict[str, Any]:
+        """Run the tasks in this process, as the SingleSlicer"""
+        tracker = DependencyTracker(task_seq, inputs_required, aliases, on_result)
+        while len(tracker.ready) > 0:
+            task = tracker.ready.popleft()
+            if isinstance(task['node'], FusedNode):
+                for node_name, output in task['node'].run_all(task['input']).items():
+                    tracker.set_result(node_name, output)
+            else:
+                tracker.set_result(task['node'].name, task['node'].run(task['input']))
+        return tracker.results
@@ -1,113 +1,676 @@
 """Functions for multislicer processes"""
-from queue import Empty
-from multiprocessing import Queue
-from typing import Dict, List, Any
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from multiprocessing import Pipe, Queue, get_context
+from typing import Dict, List, Tuple, Set, Any, Deque, Optional
+import gc
+import itertools
+import os
+import pickle
+import statistics
 import time
 
-from crumb.settings import Settings
+from crumb.bakery_items.load_cache import LoadCache
 from crumb.logger import log, logging
-from .generic import TaskToBeDone  # pylint: disable=unused-import
+from crumb.node import Node
+from crumb.planner import FusedNode, is_map, is_switch
+from crumb.resources import ResourcePool
+from .generic import Budget, DependencyTracker, TaskDependencies, TaskToBeDone
 
 
-def do_work(tasks_to_be_done: "Queue[TaskToBeDone]", tasks_that_are_done: Queue, log_queue: Queue) -> bool:
+def get_size(output: Dict[Any, Any]) -> int:
+    """
+    Return the size in bytes of the output of a node, as it would be sent to another process
+    @param output: format is {output_name: value}
+    """
+    size = 0
+    for value in output.values():
+        n_bytes = getattr(value, 'nbytes', None)  # e.g. numpy arrays, without copying them
+        size += n_bytes if isinstance(n_bytes, int) else len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    return size
+
+
+def get_limits(node: Node) -> Tuple[Optional[float], int]:
+    """
+    Return the timeout (None without limit) and the retries of a task, as declared by its crumbs (@crumb(timeout=..., retries=...))
+    A chain or a stream (FusedNode) has the sum of the timeouts if each of its crumbs has one, and the most retries of its crumbs
+    @param node: the node of the task
+    """
+    nodes = getattr(node, 'nodes', [node])
+    timeouts = [getattr(i.bakery_item, 'timeout', None) for i in nodes]
+    return sum(timeouts) if None not in timeouts else None, max(getattr(i.bakery_item, 'retries', 0) for i in nodes)  # type: ignore
+
+
+def _sendable(error: Exception) -> Exception:
+    """Return the error, or a RuntimeError with its message if it cannot be pickled (sent to the scheduler)"""
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:  # pylint: disable=broad-except
+        return RuntimeError(f'{error.__class__.__name__}: {error}')
+
+
+def get_memory(pid: int) -> Dict[str, int]:
+    """
+    Return the memory of a process in bytes, format is {'rss': resident, 'pss': resident with shared pages divided by their users,
+    'private': resident not shared with other processes}, empty if not known (it needs /proc/<pid>/smaps_rollup, Linux)
+    @param pid: the process
+    """
+    fields = {'Rss:': 'rss', 'Pss:': 'pss', 'Private_Clean:': 'private', 'Private_Dirty:': 'private'}
+    memory: Dict[str, int] = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as smaps:
+            for line in smaps:
+                values = line.split()
+                if values[0] in fields:
+                    memory[fields[values[0]]] = memory.get(fields[values[0]], 0) + int(values[1]) * 1024
+    except OSError:
+        return {}
+    return memory
+
+
+def do_work(tasks: Connection, control: Connection, log_queue: Queue, worker_id: int = 0, locality_bytes: int = 0, preload: List[str] = None) -> bool:
     """
     Task for workers.
-    This function goes through the list of tasks, executes and returns the result.
+    This function receives batches of tasks from the scheduler, executes them and returns their results.
+    Big outputs not returned to the caller are kept here, the scheduler sends the nodes using them to this worker.
+    @param tasks: connection with the scheduler, format of the messages is {'tasks': [task], 'send': ['name kept'], 'release': ['name kept']},
+                  the tasks done are returned after the batch, and the tasks marked early or watched once done (with 'partial'),
+                  a task raising is returned with its 'error' instead of its outputs
+    @param control: connection with the MultiSlicer, for the kill call
+    @param preload: crumb files loaded before the tasks, already loaded if the worker was forked from a process preloading them
     """
+    # the outputs kept are named with a counter, the same node runs again in the next execution
+    # format: {'node_name#counter': {output_name: value}}
+    kept: Dict[str, Dict[Any, Any]] = {}
+    n_kept = 0
+    # the crumbs arrive without their function, the modules are executed again only if the file changes
+    load_cache = LoadCache.preload(preload if preload is not None else []).copy()
     while True:
-        task = tasks_to_be_done.get(True)  # block until there is data
-        if (task['node'] is None) and task['input']['kill']:
+        ready = wait([control, tasks])  # block until there is data
+        if control in ready and control.recv().get('kill'):
             log(log_queue, 'worker> kill call', logging.INFO)
+            ResourcePool.close()
             break
-        log(log_queue, 'worker> task is', logging.DEBUG)
-        if hasattr(task['node'].bakery_item, 'func'):
-            log(log_queue, f"worker> function is {task['node'].bakery_item.func}", logging.DEBUG)
-        task['output'] = task['node'].run(task['input'])
-        task['node'] = task['node'].name  # we dont need the node anymore
+        if tasks not in ready:
+            continue
+        message = tasks.recv()
+        for kept_name in message['release']:
+            kept.pop(kept_name, None)
+        # another worker needs them, the copy here is kept for the tasks already sent to this worker
+        sent = {i: kept[i] for i in message['send']}
+        n_bytes = sum(get_size(i) for i in sent.values()) if locality_bytes else 0
+        LoadCache.CURRENT = load_cache
+        done = []
+        for index, task in enumerate(message['tasks']):
+            log(log_queue, 'worker> task is', logging.DEBUG, payload=task['node'])
+            if locality_bytes:
+                n_bytes += get_size(task['input'])
+            # format: {input_name: ('name kept', output_name)}
+            for input_name, (kept_name, node_output) in task.pop('held_input', {}).items():
+                task['input'][input_name] = kept[kept_name][node_output]
+            started = time.perf_counter()
+            try:
+                if isinstance(task['node'], FusedNode):
+                    # the output of the nodes reported goes with the output of the chain
+                    outputs = task['node'].run_all(task['input'])
+                else:
+                    outputs = {task['node'].name: task['node'].run(task['input'])}
+            except Exception as error:  # pylint: disable=broad-except  # the scheduler runs it again or gives the error to add_work
+                task['error'] = _sendable(error)
+                outputs = {}
+            task['seconds'] = time.perf_counter() - started
+            # format: {node_name: (size, 'name kept')}
+            task['held'] = {}
+            if locality_bytes:
+                for node_name in list(outputs):
+                    size = get_size(outputs[node_name])
+                    if size > locality_bytes and node_name not in task.get('keep', outputs):
+                        n_kept += 1
+                        kept[f'{node_name}#{n_kept}'] = outputs.pop(node_name)
+                        task['held'][node_name] = (size, f'{node_name}#{n_kept}')
+                    else:
+                        n_bytes += size
+            task['outputs'] = outputs
+            task['input'] = {}  # the input does not need to go back
+            task['node'] = task['node'].name  # we dont need the node anymore
+            if (task.get('early') or task.get('watch')) and index < len(message['tasks']) - 1:
+                tasks.send({'done': [task], 'sent': {}, 'n_bytes': 0, 'partial': True})
+            else:
+                done.append(task)
+        LoadCache.CURRENT = None
         # run and return results
-        tasks_that_are_done.put(task)
+        tasks.send({'done': done, 'sent': sent, 'n_bytes': n_bytes})
     return True
 
 
-def do_schedule(lock, tasks_to_be_done: "Queue[TaskToBeDone]", tasks_that_are_done: Queue, log_queue: Queue,
-                results, input_for_nodes, deps_to_nodes, nodes_to_deps, node_waiting) -> bool:
+class JobTracker(DependencyTracker):
     """
-    Task for scheduler jobs.
-    This function checks tasks that are done and compile finished dependencies for other nodes.
+    Dependencies between the nodes of an add_work call to the MultiSlicer, the outputs might be kept in the workers
     """
-    while True:
-        log(log_queue, f'scheduler> there are still {len(node_waiting)} waiting', logging.INFO)
-        log(log_queue, "scheduler status: ", logging.DEBUG, payload={'deps_to_nodes': deps_to_nodes, 'nodes_to_deps': nodes_to_deps})
-        # get done task
-        task = tasks_that_are_done.get(True)
-        if (task['node'] is None) and task['input']['kill']:
-            log(log_queue, 'scheduler> kill call', logging.INFO)
-            break
-        log(log_queue, f'scheduler> processing complete task: {task}', logging.INFO)
-        # add output to the results
-        results[task['node']] = task['output']
-        # if they are in the dependencies of others
-        if task['node'] in deps_to_nodes:
-            # get these dependencies
-            lock.acquire()
-            for node_name in deps_to_nodes[task['node']]:
-                # remove dependency for the task finished
-                n2d = nodes_to_deps[node_name]
-                n2d.remove(task['node'])
-                nodes_to_deps[node_name] = n2d
-                # if there are no more dependencies prepare it to run
-                if len(nodes_to_deps[node_name]) == 0:
-                    nodes_to_deps.pop(node_name)
-                    # collect input for node
-                    node = node_waiting[node_name]
-                    # get all inputs - they are done
-                    if node_name in input_for_nodes:
-                        collected_inputs = input_for_nodes[node_name]
-                    else:
-                        collected_inputs = {}
-                    for input_name, from_other_nodes in node.input.items():
-                        if not from_other_nodes:
-                            continue
-                        (previous_node, other_node_input) = from_other_nodes
-                        log(log_queue, "Scheduler computing input", logging.DEBUG, payload={'input_name': input_name, 'previous_node': previous_node, 'other_node_input': other_node_input})
-                        collected_inputs[input_name] = results[previous_node.name][other_node_input]
-                    input_for_nodes[node_name] = collected_inputs
-                    # remove from waiting list
-                    node_waiting.pop(node_name)
-                    # send for execution
-                    log(log_queue, 'scheduler> adding', logging.DEBUG, payload={'node': node, f'input_for_nodes[{node_name}]': input_for_nodes[node_name]})
-                    tasks_to_be_done.put({'node': node, 'input': input_for_nodes[node_name]})
-                    input_for_nodes.pop(node_name)  # we can clean this as it was already sent
+    def __init__(self, job: Dict[str, Any]):
+        """
+        @param job: format is {'task_seq': ..., 'inputs_required': ..., 'aliases': ..., 'keep': ..., 'reply': Connection, 'early': bool},
+                    as in add_work, early to send each output when known
+        """
+        # outputs kept in the workers
+        # format: {node_name: (worker, size, 'name kept')}
+        self.held: Dict[str, Tuple[int, int, str]] = {}
+        # format: {(worker, 'name kept'), ...}
+        self.kept: Set[Tuple[int, str]] = set()
+        self.keep = job['keep']
+        self.reply: Connection = job['reply']
+        # tasks not done yet
+        self.n_pending = 0
+        # outputs already sent, as soon as they were known (add_work with on_result)
+        self.sent: Set[str] = set()
+        super().__init__(job['task_seq'], job['inputs_required'], job['aliases'], self._send_early if job.get('early') else None)
+
+    def add_tasks(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None) -> None:
+        # the input of the nodes of a Map or Switch comes back from the workers, they are expanded here
+        if self.keep is not None:
+            self.keep.update(j[0].name for i in task_seq if is_map(i['node']) or is_switch(i['node']) for j in i['node'].input.values() if j)
+        self.n_pending += len(task_seq)
+        super().add_tasks(task_seq, inputs_required)
+
+    def _expand(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any]) -> None:
+        # the node expanded is not run
+        self.n_pending -= 1
+        super()._expand(task_seq, inputs_required)
+
+    def _send_early(self, node_name: str, output: Dict[Any, Any]) -> None:
+        if node_name in self.held or (self.keep is not None and node_name not in self.keep and node_name not in self.aliases):
+            return
+        self.sent.add(node_name)
+        self.send((node_name, output))
+
+    def send(self, message: Any) -> None:
+        """
+        Send a message to add_work, nothing if it stopped waiting (on_result raised, the remaining tasks run without sending)
+        @param message: an output (node name, output) or the other outputs {node name: output}
+        """
+        try:
+            self.reply.send(message)
+        except OSError:
+            self.reply.close()
+
+    def _make_task(self, node: Node) -> TaskToBeDone:
+        # collect input for node, we can clean this as it is sent
+        collected_inputs = self.input_for_nodes.pop(node.name, {})
+        # format: {input_name: (node_name, output_name)}
+        held_input = {}
+        for input_name, from_other_nodes in node.input.items():
+            if from_other_nodes and input_name not in collected_inputs:
+                (previous_node, other_node_input) = from_other_nodes
+                if previous_node.name in self.held:
+                    held_input[input_name] = (previous_node.name, other_node_input)
                 else:
-                    log(log_queue, f'scheduler> there are still {len(nodes_to_deps[node_name])} dependencies for {node_name}', logging.DEBUG)
-            # since task already run we can remove from dependencies
-            deps_to_nodes.pop(task['node'])
-            lock.release()
-    log(log_queue, 'scheduler> is over', logging.INFO)
-    return True
+                    collected_inputs[input_name] = self.results[previous_node.name][other_node_input]
+        task: Dict[str, Any] = {'node': node, 'input': collected_inputs}
+        if held_input:
+            task['held_input'] = held_input
+        if self.on_result is not None:
+            # the worker returns it without waiting for the other tasks of its batch
+            task['early'] = True
+        if self.keep is not None:
+            # the outputs that cannot stay in the worker
+            task_names = [*node.reported, node.name] if isinstance(node, FusedNode) else [node.name]
+            task['keep'] = [i for i in task_names if i in self.keep or i in self.aliases]
+        return task  # type: ignore
+
+    def set_held(self, node_name: str, location: Tuple[int, int, str]) -> None:
+        """
+        Mark the output of a node as kept in a worker and move the nodes depending only on it to ready
+        @param node_name: node executed
+        @param location: (worker, size, 'name kept')
+        """
+        self.kept.add((location[0], location[2]))
+        self.held[node_name] = location
+        for alias in self.aliases.get(node_name, []):
+            self.held[alias] = location
+        self.set_result(node_name, None)  # type: ignore
+
+    def get_results(self) -> Dict[str, Any]:
+        """Return the results not kept in the workers nor already sent"""
+        return {i: j for i, j in self.results.items() if i not in self.held and i not in self.sent}
 
 
-def wait_work(tasks_to_be_done: "Queue[TaskToBeDone]", log_queue: Queue, waiting_for: List[str], results: Dict[str, Dict[str, Any]]) -> bool:
+def get_cpu_count() -> int:
+    """Return the number of CPUs this process can run on (its affinity mask, where available)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class Worker:
     """
-    Function for Process MultiSlicer-Wait to loop and wait while there are tasks to be executed
+    A worker process as seen by the scheduler, with the tasks waiting for it
     """
-    while True:
-        # check if we have all that we need
-        log(log_queue, f"wait> we have:, {sum(i in results for i in waiting_for)} out of {len(waiting_for)}", logging.DEBUG)
-        if all(i in results for i in waiting_for):
-            log(log_queue, 'wait> we are done!', logging.INFO)
-            break
-        # check if we should stop work in the middle
-        try:
-            task_check = tasks_to_be_done.get_nowait()
-        except Empty:
-            pass
-        else:
-            if (task_check['node'] is None) and task_check['input']['kill']:
-                log(log_queue, 'wait> kill call', logging.INFO)
+    def __init__(self, worker_id: int, log_queue: Queue, pool: Dict[str, Any]):
+        """
+        @param worker_id: identifier of the worker, not reused
+        @param pool: the settings of the pool, as in do_schedule
+        """
+        self.worker_id = worker_id
+        # tasks and results with the scheduler
+        self.connection, worker_connection = Pipe()
+        # kill call, format: {'kill': True}
+        worker_control, self.control = Pipe(duplex=False)
+        self.process = get_context(pool['start_method']).Process(target=do_work,
+                                                                 name=f'MultiSlicer-Worker-{worker_id}',
+                                                                 args=(worker_connection, worker_control, log_queue, worker_id,
+                                                                       pool['locality_bytes'], pool['preload']))
+        self.process.start()
+        worker_connection.close()
+        worker_control.close()
+        # tasks any worker can run, and tasks using outputs kept in the worker
+        # format: deque([task])
+        self.queue: Deque[Dict[str, Any]] = deque()
+        self.pinned: Deque[Dict[str, Any]] = deque()
+        # each message sent to a worker has an answer, a worker with no message waiting gets the next one
+        self.busy = False
+        self.idle_since = time.monotonic()
+        # format: ['name kept', ...]
+        self.to_send: List[str] = []
+        self.to_release: List[str] = []
+        # the tasks sent and not returned yet, format: [task id]
+        self.sent: List[int] = []
+        # the first task of the batch running, if watched (see do_schedule)
+        # format: (task id, time it times out or None, time a copy of it is started or None), in time.monotonic()
+        self.watch: Optional[Tuple[int, Optional[float], Optional[float]]] = None
+
+    def is_idle(self) -> bool:
+        """Return True if the worker has nothing to do"""
+        return not (self.busy or self.queue or self.pinned or self.to_send or self.to_release)
+
+    def stop(self, timeout: float) -> None:
+        """
+        Stop the worker process
+        @param timeout: seconds to wait before terminating it
+        """
+        self.control.send({'kill': True})
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+
+def do_schedule(jobs: Connection, control: Connection, log_queue: Queue, pool: Dict[str, Any], worker_pids, n_kept, bytes_moved) -> bool:
+    """
+    Task for scheduler jobs.
+    This function receives the jobs (add_work), sends batches of ready tasks to the workers and compile finished dependencies for other nodes.
+    Each worker has a deque of tasks, the new tasks go to the worker that completed their dependency and idle workers steal from the others.
+    A node using outputs kept in workers is sent to the worker with most of their bytes, the other outputs are asked to the workers keeping them.
+    The nodes of crumbs declaring requirements are sent one in each batch, when they fit in the budget.
+    A task raising runs again up to the retries of its crumb, then add_work raises the error. A worker stopping, or running a task past
+    the timeout of its crumb (it is terminated), is replaced: its tasks run again, the jobs with outputs kept there fail.
+    A pure crumb running for more than pool['speculative'] times the median of its last runs is also started on another worker,
+    the first output is used (the tasks with a timeout or a copy run first in their batch, so the time is theirs).
+    Workers are added while tasks are waiting (up to the maximum, if the CPUs are not busy) and stopped when idle (down to the minimum).
+    With fork, the crumb files to preload are loaded here before starting the workers, so they share the pages of the modules.
+    With forkserver, they are loaded by the server started here for the workers.
+    @param jobs: connection with the add_work calls
+    @param control: connection with the MultiSlicer, for the kill call
+    @param pool: format is {'min': workers, 'max': workers, 'idle_timeout': seconds, 'batch_size': maximum number of tasks sent at once,
+                 'locality_bytes': outputs kept in the workers, 'kill_timeout': seconds, 'start_method': multiprocessing start method,
+                 'preload': ['crumb file', ...], 'budgets': {'name': amount}, 'speculative': multiple of the median or 0,
+                 'speculative_runs': runs needed before starting copies, 'speculative_history': runs used for the median}
+    @param worker_pids: multiprocessing.Array with the pid of each worker, 0 for the unused places
+    @param n_kept: multiprocessing.Value with the number of outputs kept in the workers
+    @param bytes_moved: multiprocessing.Value with the bytes of input and output sent between the workers and the scheduler
+    """
+    job_ids = itertools.count()
+    worker_ids = itertools.count()
+    task_ids = itertools.count()
+    # format: {job id: JobTracker}
+    trackers: Dict[int, JobTracker] = {}
+    # format: {worker id: Worker}
+    workers: Dict[int, Worker] = {}
+    # the outputs asked to the workers keeping them, format: {(worker, 'name kept'): (job id, node_name, ['node name waiting for it', ...])}
+    fetching: Dict[Tuple[int, str], Tuple[int, str, List[str]]] = {}
+    # format: {(job id, node_name): (task, worker, {(worker, 'name kept'), ...})}
+    waiting_fetch: Dict[Tuple[int, str], Tuple[Dict[str, Any], int, Set[Tuple[int, str]]]] = {}
+    # the tasks of crumbs declaring requirements run when they fit in the budget
+    budget = Budget(pool['budgets'])
+    # format: deque([(task, worker or None for any)])
+    constrained: Deque[Tuple[Dict[str, Any], Optional[int]]] = deque()
+    # the tasks sent to the workers, returned by the first of them, format: {task id: (task, {worker, ...})}
+    running: Dict[int, Tuple[Dict[str, Any], Set[int]]] = {}
+    # seconds of the last runs of the crumbs with copies, format: {'crumb name': deque([seconds])}
+    runtimes: Dict[str, Deque[float]] = {}
+
+    def add_worker() -> Worker:
+        worker = Worker(next(worker_ids), log_queue, pool)
+        workers[worker.worker_id] = worker
+        worker_pids[list(worker_pids).index(0)] = worker.process.pid
+        log(log_queue, f'scheduler> started worker {worker.worker_id}, there are {len(workers)}', logging.INFO)
+        return worker
+
+    def can_grow() -> bool:
+        if len(workers) >= pool['max']:
+            return False
+        if not workers or not hasattr(os, 'getloadavg'):
+            return True
+        # do not add workers if the CPUs are already busy
+        return os.getloadavg()[0] < get_cpu_count()
+
+    def shrink() -> None:
+        now = time.monotonic()
+        # workers keeping outputs of running jobs stay
+        keeping = {i for tracker in trackers.values() for i, _ in tracker.kept}
+        for worker in list(workers.values()):
+            if len(workers) <= pool['min']:
                 break
-            # if it is not the kill call place it back
-            tasks_to_be_done.put(task_check)
-        time.sleep(Settings.MULTISLICER_WAITWORKER_DELAY)
-    log(log_queue, 'tasks are done', logging.INFO)
-    return True
+            if worker.is_idle() and worker.worker_id not in keeping and now - worker.idle_since > pool['idle_timeout']:
+                worker.stop(pool['kill_timeout'])
+                workers.pop(worker.worker_id)
+                worker_pids[list(worker_pids).index(worker.process.pid)] = 0
+                log(log_queue, f'scheduler> stopped idle worker {worker.worker_id}, there are {len(workers)}', logging.INFO)
+
+    def can_copy(task: Dict[str, Any]) -> bool:
+        # a pure crumb with its input in the task, the copy gives the same output
+        node = task['node']
+        return (bool(pool['speculative']) and not isinstance(node, FusedNode) and getattr(node.bakery_item, 'pure', False)
+                and 'requires' not in task and 'held_input' not in task)
+
+    def enqueue(task: Dict[str, Any], worker: Worker, pinned: bool) -> None:
+        task['pinned'] = worker.worker_id if pinned else None
+        if 'requires' in task or task.get('watch'):
+            # sent first in a batch, when it fits in the budget, to this worker if pinned
+            constrained.append((task, task['pinned']))
+        elif pinned:
+            worker.pinned.append(task)
+        else:
+            worker.queue.append(task)
+
+    def place(job_id: int, task: Dict[str, Any], worker: Worker) -> None:
+        task['job'] = job_id
+        task['id'] = next(task_ids)
+        requires = budget.get_requirements(task['node'])
+        if requires:
+            task['requires'] = requires
+        timeout, retries = get_limits(task['node'])
+        if timeout is not None:
+            task['timeout'] = timeout
+        if retries:
+            task['retries'] = retries
+        if timeout is not None or can_copy(task):
+            task['watch'] = True
+        if 'held_input' not in task:
+            enqueue(task, worker, False)
+            return
+        held = trackers[job_id].held
+        # format: {worker: bytes of the input kept there}
+        worker_bytes: Dict[int, int] = {}
+        for node_name, _ in task['held_input'].values():
+            worker_bytes[held[node_name][0]] = worker_bytes.get(held[node_name][0], 0) + held[node_name][1]
+        worker_id = max(worker_bytes, key=worker_bytes.__getitem__)
+        missing = set()
+        for input_name, (node_name, other_node_input) in list(task['held_input'].items()):
+            holder, _, kept_name = held[node_name]
+            if holder == worker_id:
+                task['held_input'][input_name] = (kept_name, other_node_input)
+                continue
+            if (holder, kept_name) not in fetching:
+                fetching[(holder, kept_name)] = (job_id, node_name, [])
+                workers[holder].to_send.append(kept_name)
+            fetching[(holder, kept_name)][2].append(task['node'].name)
+            missing.add((holder, kept_name))
+        if missing:
+            waiting_fetch[(job_id, task['node'].name)] = (task, worker_id, missing)
+        else:
+            enqueue(task, workers[worker_id], True)
+
+    def finish(job_id: int, error: Optional[BaseException] = None) -> None:
+        tracker = trackers.pop(job_id)
+        for worker_id, kept_name in tracker.kept:
+            if worker_id in workers:
+                workers[worker_id].to_release.append(kept_name)
+        n_kept.value -= len(tracker.kept)
+        if error is not None:
+            log(log_queue, f'scheduler> job failed: {error!r}', logging.WARNING)
+            # the tasks not sent yet are dropped, the outputs of the tasks running are dropped when they return
+            for worker in workers.values():
+                worker.queue = deque(i for i in worker.queue if i['job'] != job_id)
+                worker.pinned = deque(i for i in worker.pinned if i['job'] != job_id)
+            remaining = [i for i in constrained if i[0]['job'] != job_id]
+            constrained.clear()
+            constrained.extend(remaining)
+            for key in [i for i in waiting_fetch if i[0] == job_id]:
+                waiting_fetch.pop(key)
+            for task_id in [i for i, (task, _) in running.items() if task['job'] == job_id]:
+                running.pop(task_id)
+        tracker.send(tracker.get_results() if error is None else error)
+        tracker.reply.close()
+
+    def requeue(task: Dict[str, Any]) -> None:
+        # a pinned task uses outputs kept in its worker, its job failed if the worker was lost
+        if task['pinned'] is not None:
+            enqueue(task, workers[task['pinned']], True)
+            return
+        if not workers:
+            add_worker()
+        enqueue(task, min(workers.values(), key=lambda i: len(i.queue) + len(i.pinned)), False)
+
+    def retry(task: Dict[str, Any], error: BaseException) -> None:
+        task['attempt'] = task.get('attempt', 0) + 1
+        if task['attempt'] > task.get('retries', 0):
+            finish(task['job'], error)
+            return
+        log(log_queue, f'scheduler> running {task["node"].name} again ({task["attempt"]}/{task["retries"]}) after {error!r}', logging.WARNING)
+        requeue(task)
+
+    def lose(worker: Worker, reason: str, timed_out: Optional[int] = None) -> None:
+        # the worker stopped, or is stopped as it runs the task timed_out for too long
+        workers.pop(worker.worker_id)
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join()
+        worker_pids[list(worker_pids).index(worker.process.pid)] = 0
+        log(log_queue, f'scheduler> lost worker {worker.worker_id}: {reason}', logging.WARNING)
+        for job_id in [i for i, tracker in trackers.items() if any(j == worker.worker_id for j, _ in tracker.kept)]:
+            finish(job_id, RuntimeError(f'The MultiSlicer worker keeping outputs of this job was lost: {reason}'))
+        for key in [i for i in fetching if i[0] == worker.worker_id]:
+            fetching.pop(key)
+        if len(workers) < max(1, pool['min']):
+            add_worker()
+        for task_id in worker.sent:
+            if task_id not in running:
+                continue
+            task, copies = running[task_id]
+            if 'requires' in task:
+                budget.release(task['requires'])
+            copies.discard(worker.worker_id)
+            if copies:
+                continue  # a copy is still running
+            running.pop(task_id)
+            if timed_out is None:
+                # the task stopping the worker is not known, each task running counts an attempt
+                retry(task, RuntimeError(f'The MultiSlicer worker running {task["node"].name} was lost: {reason}'))
+            elif task_id == timed_out:
+                retry(task, TimeoutError(f'{task["node"].name} did not finish in {task["timeout"]} seconds'))
+            else:
+                requeue(task)
+        for task in worker.queue:
+            if task['job'] in trackers:
+                requeue(task)
+
+    def start(worker: Worker, batch: List[Dict[str, Any]]) -> None:
+        # send a batch and watch its first task
+        worker.connection.send({'tasks': batch, 'send': worker.to_send, 'release': worker.to_release})
+        worker.busy = True
+        worker.to_send = []
+        worker.to_release = []
+        worker.sent = [i['id'] for i in batch]
+        for task in batch:
+            running.setdefault(task['id'], (task, set()))[1].add(worker.worker_id)
+        worker.watch = None
+        if batch and batch[0].get('watch'):
+            task, now = batch[0], time.monotonic()
+            history = runtimes.get(task['node'].bakery_item.name, ()) if can_copy(task) else ()
+            copy_at = None
+            if len(history) >= pool['speculative_runs'] and len(running[task['id']][1]) == 1:
+                copy_at = now + pool['speculative'] * statistics.median(history)
+            worker.watch = (task['id'], now + task['timeout'] if 'timeout' in task else None, copy_at)
+
+    def start_copy(task_id: int) -> None:
+        task, copies = running[task_id]
+        idle = [i for i in workers.values() if not i.busy and i.worker_id not in copies]
+        if not idle and can_grow():
+            idle = [add_worker()]
+        if idle:
+            log(log_queue, f'scheduler> {task["node"].name} is slow, starting a copy', logging.INFO)
+            start(min(idle, key=lambda i: len(i.queue) + len(i.pinned)), [task])
+
+    def check_watched() -> None:
+        now = time.monotonic()
+        for worker in list(workers.values()):
+            if worker.watch is None:
+                continue
+            task_id, deadline, copy_at = worker.watch
+            if deadline is not None and now >= deadline:
+                lose(worker, 'a task ran past its timeout', task_id)
+            elif copy_at is not None and now >= copy_at:
+                worker.watch = (task_id, deadline, None)
+                if task_id in running:
+                    start_copy(task_id)
+
+    def get_wait() -> Optional[float]:
+        # without events, check for idle workers from time to time, and for the tasks watched
+        times = [pool['idle_timeout']] if len(workers) > pool['min'] else []
+        now = time.monotonic()
+        for worker in workers.values():
+            if worker.watch is not None:
+                times += [i - now for i in worker.watch[1:] if i is not None]
+        return max(0., min(times)) if times else None
+
+    def take(worker: Worker, size: int) -> List[Dict[str, Any]]:
+        batch = [worker.pinned.popleft() for _ in range(min(size, len(worker.pinned)))]
+        batch += [worker.queue.popleft() for _ in range(min(size - len(batch), len(worker.queue)))]
+        if len(batch) < size:
+            # steal the last tasks of the longest deque
+            other = max(workers.values(), key=lambda i: len(i.queue))
+            batch += [other.queue.pop() for _ in range(min(size - len(batch), len(other.queue)))]
+        return batch
+
+    def take_constrained(worker: Worker) -> List[Dict[str, Any]]:
+        # one for each batch, the tasks of a batch run one after the other
+        for index, (task, worker_id) in enumerate(constrained):
+            if worker_id in (None, worker.worker_id) and ('requires' not in task or budget.fits(task['requires'])):
+                del constrained[index]
+                if 'requires' in task:
+                    budget.acquire(task['requires'])
+                return [task]
+        return []
+
+    def dispatch() -> None:
+        n_ready = sum(len(i.queue) + len(i.pinned) for i in workers.values()) + len(constrained)
+        size = max(1, min(pool['batch_size'], n_ready // max(1, len(workers))))
+        for worker in workers.values():
+            if worker.busy:
+                continue
+            batch = take_constrained(worker)
+            batch += take(worker, size - len(batch))
+            if batch or worker.to_send or worker.to_release:
+                start(worker, batch)
+        # tasks are waiting and every worker is busy
+        if (constrained or any(i.queue for i in workers.values())) and all(i.busy for i in workers.values()) and can_grow():
+            add_worker()
+            dispatch()
+
+    def receive(worker: Worker, message: Dict[str, Any]) -> None:
+        # a partial message returns a task of a batch still running
+        worker.busy = message.get('partial', False)
+        worker.idle_since = time.monotonic()
+        bytes_moved.value += message['n_bytes']
+        for kept_name, output in message['sent'].items():
+            job_id, done_name, nodes_waiting = fetching.pop((worker.worker_id, kept_name))
+            if job_id not in trackers:
+                continue  # the job failed
+            # the next nodes using it get it from the results
+            trackers[job_id].results[done_name] = output
+            trackers[job_id].held.pop(done_name)
+            for node_name in nodes_waiting:
+                task, task_worker, missing = waiting_fetch[(job_id, node_name)]
+                for input_name, (other_name, other_node_input) in list(task['held_input'].items()):
+                    if other_name == done_name:
+                        task['input'][input_name] = output[other_node_input]
+                        task['held_input'].pop(input_name)
+                missing.discard((worker.worker_id, kept_name))
+                if not missing:
+                    waiting_fetch.pop((job_id, node_name))
+                    enqueue(task, workers[task_worker], True)
+        for task in message['done']:
+            log(log_queue, 'scheduler> processing complete task', logging.DEBUG, payload=task)
+            worker.sent.remove(task['id'])
+            if worker.watch is not None and worker.watch[0] == task['id']:
+                worker.watch = None
+            if 'requires' in task:
+                budget.release(task['requires'])
+            tracker = trackers.get(task['job'])
+            if task['id'] not in running or tracker is None:
+                # a copy returned first, or the job failed
+                worker.to_release += [kept_name for _, kept_name in task['held'].values()]
+                continue
+            original, _ = running.pop(task['id'])
+            if 'error' in task:
+                retry(original, task['error'])
+                continue
+            if can_copy(original):
+                history = runtimes.setdefault(original['node'].bakery_item.name, deque(maxlen=pool['speculative_history']))
+                history.append(task['seconds'])
+            # the node executed, the nodes reported with it (chains) and the nodes getting the same output (in the tracker)
+            for done_name, (size, kept_name) in task['held'].items():
+                tracker.set_held(done_name, (worker.worker_id, size, kept_name))
+                n_kept.value += 1
+            for done_name, output in task['outputs'].items():
+                tracker.set_result(done_name, output)
+            tracker.n_pending -= 1
+            while tracker.ready:
+                place(task['job'], tracker.ready.popleft(), worker)  # type: ignore
+            if tracker.n_pending == 0:
+                finish(task['job'])
+
+    # fork shares the pages of this process with the workers, forkserver the pages of a server started by this process
+    start_method = get_context(pool['start_method']).get_start_method()
+    if pool['preload'] and start_method == 'fork':
+        LoadCache.preload(pool['preload'])
+        # the objects loaded are not moved by the garbage collector, their pages stay shared with the workers
+        gc.freeze()
+    elif pool['preload'] and start_method == 'forkserver':
+        os.environ[LoadCache.PRELOAD_VARIABLE] = os.pathsep.join(pool['preload'])
+        get_context('forkserver').set_forkserver_preload(['crumb.slicers.preload'])
+    for _ in range(pool['min']):
+        add_worker()
+    while True:
+        connections = {i.connection: i for i in workers.values()}
+        for connection in wait([control, jobs, *connections], get_wait()):
+            if connection is control:
+                if control.recv().get('kill'):
+                    log(log_queue, 'scheduler> kill call', logging.INFO)
+                    for worker in workers.values():
+                        worker.stop(pool['kill_timeout'])
+                    worker_pids[:] = [0] * len(worker_pids)
+                    return True
+            elif connection is jobs:
+                job_id = next(job_ids)
+                trackers[job_id] = JobTracker(jobs.recv())
+                log(log_queue, f'scheduler> new job with {trackers[job_id].n_pending} tasks', logging.INFO)
+                if not workers:
+                    add_worker()
+                # the first tasks go to every worker
+                first_workers = itertools.cycle(list(workers.values()))
+                while trackers[job_id].ready:
+                    place(job_id, trackers[job_id].ready.popleft(), next(first_workers))  # type: ignore
+                if trackers[job_id].n_pending == 0:
+                    finish(job_id)
+            elif connections[connection].worker_id in workers:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    lose(connections[connection], 'the process stopped')
+                    continue
+                receive(connections[connection], message)
+        check_watched()
+        dispatch()
+        shrink()
@@ -0,0 +1,13 @@
+"""
+Module preload
+Imported by the forkserver starting the MultiSlicer workers (multiprocessing.set_forkserver_preload), before it starts any process.
+
+The crumb files in the environment variable CRUMB_PRELOAD (separated by os.pathsep) are loaded in the server,
+the workers forked from it share the pages of their modules.
+"""
+import os
+
+from crumb.bakery_items.load_cache import LoadCache
+
+if os.environ.get(LoadCache.PRELOAD_VARIABLE):
+    LoadCache.preload(os.environ[LoadCache.PRELOAD_VARIABLE].split(os.pathsep))
@@ -1,9 +1,9 @@
 """Single-threaded task executor"""
-from typing import Dict, Any, List, Union, Tuple
+from typing import Dict, Any, List, Union, Tuple, Container, Callable
 
-from crumb.node import Node
-from crumb.logger import LoggerQueue, log, logging
-from .generic import Slicer, TaskDependencies, TaskToBeDone
+from crumb.planner import FusedNode
+from crumb.resources import ResourcePool
+from .generic import Slicer, TaskDependencies, DependencyTracker
 
 
 class SingleSlicer(Slicer):
@@ -21,87 +21,34 @@ class SingleSlicer(Slicer):
         return cls.TASK_EXECUTOR_INSTANCE
 
     def reset(self):
-        # ready for execution
-        # these variables are defined on __new__ due to singleton
-        # [{'node': node, 'input': {name': value}}]
-        self.tasks_to_be_done: List[TaskToBeDone] = []  # pylint: disable=attribute-defined-outside-init
-        # {node_name: {var: value}}
-        self.results: Dict[str, Dict[str, Any]] = {}  # pylint: disable=attribute-defined-outside-init
-        # {node_name: {var: value}}
-        self.input_for_nodes: Dict[str, Dict[str, Any]] = {}  # pylint: disable=attribute-defined-outside-init
-        # {node_name: node}
-        self.node_waiting: Dict[str, Node] = {}  # pylint: disable=attribute-defined-outside-init
-        # {deps: [node_name]}
-        self.deps_to_nodes: Dict[str, List[str]] = {}  # pylint: disable=attribute-defined-outside-init
-        # if node not in here it means dependencies were solved and executed
-        # {node_name: [deps]}
-        self.nodes_to_deps: Dict[str, List[str]] = {}  # pylint: disable=attribute-defined-outside-init
+        # the state of each execution is kept by a DependencyTracker, so add_work can be called from a running node
+        return
 
-    def _exec(self) -> None:
-        while len(self.tasks_to_be_done) > 0:
-            # get first in the queue
-            task = self.tasks_to_be_done.pop(0)
-            # get its name
-            just_exec_node_name = task['node'].name
-            # collect its results
-            self.results[just_exec_node_name] = task['node'].run(task['input'])
-            if just_exec_node_name in self.deps_to_nodes:
-                # get these dependencies
-                for node_name in self.deps_to_nodes[just_exec_node_name]:
-                    # remove dependency for the task finished
-                    self.nodes_to_deps[node_name].remove(just_exec_node_name)
-                    # if there are no more dependencies prepare it to run
-                    if len(self.nodes_to_deps[node_name]) == 0:
-                        self.nodes_to_deps.pop(node_name)
-                        # collect input for node
-                        node = self.node_waiting[node_name]
-                        # get all inputs - they are done
-                        for input_name, from_other_nodes in node.input.items():
-                            if node_name not in self.input_for_nodes:
-                                self.input_for_nodes[node_name] = {}
-                            if from_other_nodes:
-                                (previous_node, other_node_input) = from_other_nodes
-                                self.input_for_nodes[node_name][input_name] = self.results[previous_node.name][other_node_input]
-                            log(LoggerQueue.get_logger(), 'adding to queue>', logging.DEBUG,
-                                payload={'input_name': input_name, 'previous_node': previous_node, 'other_node_input': other_node_input})
-                        # remove from waiting list
-                        self.node_waiting.pop(node_name)
-                        # send for execution
-                        self.tasks_to_be_done.append({'node': node, 'input': self.input_for_nodes[node_name]})
-                        self.input_for_nodes.pop(node_name)  # we can clean this as it was already sent
-                self.deps_to_nodes.pop(just_exec_node_name)  # we are done with this one
-
-    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None) -> Union[Dict[str, Any], Any]:
+    def add_work(self, task_seq: List[TaskDependencies], inputs_required: Dict[Tuple[str, str], Any] = None,
+                 aliases: Dict[str, List[str]] = None, keep: Container[str] = None,
+                 on_result: Callable[[str, Dict[Any, Any]], None] = None) -> Union[Dict[str, Any], Any]:
         """
         Add tasks that need to be executed
         @param task_seq: format is: {'node': node_id, 'deps': [node_id_1, node_id_2, ...]}
         @param inputs_required: format is {(node_name, node_input): value}
+        @param aliases: nodes (not in task_seq) getting the output of a node, format is {node_name: [node_name_1, ...]}
+        @param keep: the nodes whose output is needed by the caller (None for all), the others might not be returned
+        @param on_result: called with the name and the output of each node (and alias) as soon as it is known
         """
-        # if some nodes require some input add them to the relation first
-        if inputs_required is not None:
-            for (node_name, node_input), value in inputs_required.items():
-                if node_name not in self.input_for_nodes:
-                    self.input_for_nodes[node_name] = {}
-                self.input_for_nodes[node_name][node_input] = value
-        # compute nodes with node-node dependencies
-        for task_element in task_seq:
-            node, deps = task_element['node'], task_element['deps']
-            if len(deps) == 0:
-                if node.name not in self.input_for_nodes:
-                    self.tasks_to_be_done.append({'node': node, 'input': {}})
-                else:
-                    self.tasks_to_be_done.append({'node': node, 'input': self.input_for_nodes[node.name]})
-                continue
-            self.node_waiting[node.name] = node
-            self.nodes_to_deps[node.name] = deps
-            for dependency in deps:
-                if dependency not in self.deps_to_nodes:
-                    self.deps_to_nodes[dependency] = []
-                self.deps_to_nodes[dependency].append(node.name)
+        tracker = DependencyTracker(task_seq, inputs_required, aliases, on_result)
         # showtime!
-        self._exec()
-        to_ret = {}
-        for i in task_seq:
-            to_ret[i['node'].name] = self.results[i['node'].name]
-            self.results.pop(i['node'].name)  # results are not needed here
-        return to_ret
+        while len(tracker.ready) > 0:
+            # get first in the queue
+            task = tracker.ready.popleft()
+            # collect its results
+            if isinstance(task['node'], FusedNode):  # streaming crumbs running together (crumb.planner.StreamNode)
+                for node_name, output in task['node'].run_all(task['input']).items():
+                    tracker.set_result(node_name, output)
+            else:
+                tracker.set_result(task['node'].name, task['node'].run(task['input']))
+        # results of the nodes in task_seq and their aliases
+        return tracker.results
+
+    def kill(self) -> None:
+        """Tear down the resources started by the crumbs"""
+        ResourcePool.close()
@@ -5,6 +5,7 @@ Obtain and delete the current Slicer executor
 
 from crumb.settings import Settings
 from crumb.slicers.generic import Slicer
+from crumb.slicers.hybridslicer import HybridSlicer
 from crumb.slicers.multislicer import MultiSlicer
 from crumb.slicers.singleslicer import SingleSlicer
 
@@ -12,10 +13,13 @@ from crumb.slicers.singleslicer import SingleSlicer
 def get_slicer():
     """
     Returns the executor for the nodes.
-    Depending on the settings, this could either be multi or single process.
+    Depending on the settings, this could either be multi or single process, or hybrid (each crumb says where it runs).
     """
     if Slicer.TASK_EXECUTOR_INSTANCE is None:
-        if Settings.USE_MULTISLICER:
+        if Settings.USE_HYBRIDSLICER:
+            # inside there is another singleton
+            Slicer.TASK_EXECUTOR_INSTANCE = HybridSlicer()
+        elif Settings.USE_MULTISLICER:
             # inside there is another singleton
             Slicer.TASK_EXECUTOR_INSTANCE = MultiSlicer()
         else:
@@ -2,10 +2,10 @@
 
 from collections import deque
 import os
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Union
 
 from crumb.web.node_definitions import get_input_definition, get_output_definition, get_node_definition
-from crumb.bakery_items.slice import NodeRepresentation, Slice
+from crumb.bakery_items.slice import Slice
 from crumb.settings import Settings
 
 
@@ -96,7 +96,7 @@ class FileState:
 
     def addNode(self, name, pos_x, pos_y) -> dict:
         """Add a node if available in the bakery_items list"""
-        nnode: Any[NodeRepresentation, Tuple(str, str)] = None
+        nnode: Union[str, Tuple[str, str], None] = None
         if name == 'input_element':
             while True:
                 try:
@@ -123,8 +123,8 @@ class FileState:
             nnode = self.slice.add_node(name)
 
             icon_str = "fas fa-code-branch"  # TODO
-            inputs = self.slice.nodes[nnode]['node'].input
-            outputs = self.slice.nodes[nnode]['node'].output
+            inputs = self.slice.nodes[nnode].input
+            outputs = self.slice.nodes[nnode].output
             description = "\n\n\n\n"  # TODO
             name = self.slice.bakery_items[name]['bakery_item'].name
             ret = get_node_definition(self.node_counter, name, pos_x, pos_y, inputs, outputs, icon=icon_str, node_description=description)
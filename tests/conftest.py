@@ -0,0 +1,30 @@
+"""Fixtures shared by the tests"""
+import pytest
+
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer
+
+
+@pytest.fixture(name='slicer')
+def fixture_slicer(request):
+    """
+    Run the test with the slicer of the setting given as parameter (indirect): 'USE_MULTISLICER', 'USE_HYBRIDSLICER' or None for the
+    SingleSlicer, the crumbs get their functions back after (the MultiSlicer reloads the crumbs sent to the workers, the tests count the
+    calls of these functions)
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    functions = {i: i.func for i in CrumbRepository().crumbs.values()}
+    setting = getattr(request, 'param', None)
+    if setting is not None:
+        setattr(Settings, setting, True)
+    delete_slicer()
+    try:
+        yield setting
+    finally:
+        delete_slicer()
+        if setting is not None:
+            setattr(Settings, setting, False)
+        for bakery_item, func in functions.items():
+            bakery_item.func = func
@@ -1,5 +1,9 @@
 """Sample usage of @crumb decorator"""
-from crumb import crumb
+import os
+import threading
+import time
+
+from crumb import crumb, resource
 
 
 @crumb(output=int, name='a1')
@@ -38,3 +42,298 @@ def minus(a: int, b: int) -> int:  # pylint: disable=invalid-name
 def sum_two_numbers(input_a: int, input_b: int) -> int:
     """Return the sum of input_a and input_b"""
     return input_a + input_b
+
+
+# used in test_planner, counts its executions
+PURE_CALLS = []
+
+
+@crumb(input={'a': int}, output=int, name='pure_double', pure=True)
+def pure_double(a: int) -> int:  # pylint: disable=invalid-name
+    """Return 2 * a"""
+    PURE_CALLS.append(a)
+    return 2 * a
+
+
+@crumb(output=int, name='pure_load', pure=True)
+def pure_load() -> int:
+    """Return 10, as if loaded from a file"""
+    PURE_CALLS.append('load')
+    return 10
+
+
+@crumb(input={'a': int}, output=int, name='cheap_negative', cheap=True)
+def cheap_negative(a: int) -> int:  # pylint: disable=invalid-name
+    """Return -a"""
+    return -a
+
+
+# used in test_multislicer, big outputs
+@crumb(input={'a': int}, output=bytes, name='make_blob')
+def make_blob(a: int) -> bytes:  # pylint: disable=invalid-name
+    """Return a bytes of size a"""
+    return bytes(a)
+
+
+@crumb(input={'blob': bytes}, output=int, name='blob_size')
+def blob_size(blob: bytes) -> int:
+    """Return len(blob)"""
+    return len(blob)
+
+
+# used in test_resources, the setup and teardown are written to the file in RESOURCE_LOG (workers are other processes)
+@resource(name='lookup_table')
+def lookup_table():
+    """Yield a table, as if loaded from a file"""
+    with open(os.environ['RESOURCE_LOG'], 'a', encoding='utf-8') as log_file:
+        log_file.write(f'setup {os.getpid()}\n')
+    yield {'offset': 100}
+    with open(os.environ['RESOURCE_LOG'], 'a', encoding='utf-8') as log_file:
+        log_file.write(f'teardown {os.getpid()}\n')
+
+
+@crumb(input={'a': int}, output=int, name='add_offset', resources=['lookup_table'])
+def add_offset(a: int, lookup_table: dict) -> int:  # pylint: disable=invalid-name,redefined-outer-name
+    """Return a + the offset in the table"""
+    return a + lookup_table['offset']
+
+
+# used in test_hybridslicer, where each crumb runs
+@crumb(input={'a': int}, output=int, name='thread_add1', target='thread')
+def thread_add1(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a + 1"""
+    return a + 1
+
+
+@crumb(input={'a': int}, output=int, name='process_double', target='process')
+def process_double(a: int) -> int:  # pylint: disable=invalid-name
+    """Return 2 * a"""
+    return 2 * a
+
+
+@crumb(output=int, name='thread_ident', target='thread')
+def thread_ident() -> int:
+    """Return the identifier of the thread running it"""
+    return threading.get_ident()
+
+
+@crumb(output=int, name='process_pid', target='process')
+def process_pid() -> int:
+    """Return the pid of the process running it"""
+    return os.getpid()
+
+
+# used in test_budget, the most running at once in this process
+LIMITED_RUNNING = {'now': 0, 'most': 0}
+LIMITED_LOCK = threading.Lock()
+
+
+@crumb(input={'a': int}, output=int, name='limited_sleep', target='thread', requires={'license': 1, 'memory': 1e9})
+def limited_sleep(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a after a short sleep, counting the calls running at once"""
+    with LIMITED_LOCK:
+        LIMITED_RUNNING['now'] += 1
+        LIMITED_RUNNING['most'] = max(LIMITED_RUNNING['most'], LIMITED_RUNNING['now'])
+    time.sleep(0.05)
+    with LIMITED_LOCK:
+        LIMITED_RUNNING['now'] -= 1
+    return a
+
+
+@crumb(input={'a': int}, output=int, name='limited_inline', target='inline', requires={'license': 1})
+def limited_inline(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a after a short sleep in the thread running the Slice, counted with limited_sleep"""
+    return limited_sleep(a)
+
+
+# used in test_batched, the number of records of each call
+BATCH_CALLS = []
+
+
+@crumb(input={'a': int, 'b': int}, output=int, name='batch_multiply', batched=True, pure=True)
+def batch_multiply(a: list, b: list) -> list:  # pylint: disable=invalid-name
+    """Return a * b for each record"""
+    BATCH_CALLS.append(len(a))
+    return [i * j for i, j in zip(a, b)]
+
+
+# used in test_partitioned, the number of rows of each call
+ROWS_CALLS = []
+
+
+@crumb(input={'rows': list}, output=list, name='rows_square', rowwise=True)
+def rows_square(rows: list) -> list:
+    """Return the square of each row"""
+    ROWS_CALLS.append(len(rows))
+    return [i * i for i in rows]
+
+
+@crumb(input={'rows': list, 'limit': int}, output=int, name='rows_count_below', rowwise=True, merge='sum')
+def rows_count_below(rows: list, limit: int) -> int:
+    """Return the number of rows below limit"""
+    return sum(1 for i in rows if i < limit)
+
+
+@crumb(input={'rows': list}, output=int, name='rows_max', rowwise=True, merge=max)
+def rows_max(rows: list) -> int:
+    """Return the biggest row"""
+    return max(rows)
+
+
+@crumb(input={'values': list}, output=int, name='sum_all')
+def sum_all(values: list) -> int:
+    """Return the sum of all the values (needs the whole data)"""
+    return sum(values)
+
+
+# used in test_streams, ('read', chunk number) when a chunk is given, ('sum', chunk number) when it is added
+STREAM_EVENTS = []
+
+
+@crumb(input={'n': int, 'size': int}, output=list, name='stream_read', streaming=True)
+def stream_read(n: int, size: int):
+    """Yield the numbers below n in chunks of size"""
+    for i in range(0, n, size):
+        STREAM_EVENTS.append(('read', i // size))
+        yield list(range(i, min(i + size, n)))
+
+
+@crumb(input={'rows': list, 'most': int}, output=list, name='stream_square', streaming=True, stream_input=['rows'])
+def stream_square(rows, most: int = -1):
+    """Yield the square of each chunk, fails for a row above most (if not -1)"""
+    for chunk in rows:
+        if most != -1 and max(chunk) > most:
+            raise ValueError(f'row above {most}')
+        yield [i * i for i in chunk]
+
+
+@crumb(input={'rows': list}, output=int, name='stream_sum', stream_input=['rows'])
+def stream_sum(rows) -> int:
+    """Return the sum of the rows of all the chunks"""
+    total = 0
+    for i, chunk in enumerate(rows):
+        STREAM_EVENTS.append(('sum', i))
+        total += sum(chunk)
+    return total
+
+
+@crumb(input={'a': list, 'b': list}, output=int, name='stream_pair', stream_input=['a', 'b'])
+def stream_pair(a, b) -> int:  # pylint: disable=invalid-name
+    """Return the sum of the rows of a minus the sum of the rows of b, a is read to its end before b"""
+    total = sum(sum(chunk) for chunk in a)
+    return total - sum(sum(chunk) for chunk in b)
+
+
+# used in test_run_iter, set to let iter_wait return before its timeout
+ITER_RELEASE = threading.Event()
+
+
+@crumb(input={'a': int, 'seconds': float}, output=int, name='iter_wait', target='thread')
+def iter_wait(a: int, seconds: float) -> int:  # pylint: disable=invalid-name
+    """Return a once ITER_RELEASE is set, or after seconds"""
+    ITER_RELEASE.wait(seconds)
+    return a
+
+
+# used in test_switch, the branches run
+BRANCH_CALLS = []
+
+
+@crumb(input={'a': int}, output=bool, name='is_positive', cheap=True)
+def is_positive(a: int) -> bool:  # pylint: disable=invalid-name
+    """Return whether a is above 0"""
+    return a > 0
+
+
+@crumb(input={'a': int}, output=int, name='branch_double')
+def branch_double(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a * 2"""
+    BRANCH_CALLS.append('double')
+    return a * 2
+
+
+@crumb(input={'a': int}, output=int, name='branch_negate')
+def branch_negate(a: int) -> int:  # pylint: disable=invalid-name
+    """Return -a"""
+    BRANCH_CALLS.append('negate')
+    return -a
+
+
+# used in test_map and test_switch, the nodes of a Map or Switch run while an unrelated slow node runs
+OVERLAP_EVENTS = []
+
+
+@crumb(input={'a': int}, output=int, name='slow_branch', target='thread')
+def slow_branch(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a after 0.5 seconds"""
+    time.sleep(0.5)
+    OVERLAP_EVENTS.append('slow')
+    return a
+
+
+@crumb(input={'a': int}, output=int, name='mark_run', target='thread')
+def mark_run(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a"""
+    OVERLAP_EVENTS.append('mark')
+    return a
+
+
+# used in test_checkpoints, the steps run and whether checkpoint_fail fails
+CHECKPOINT_CALLS = []
+CHECKPOINT_FAIL = {'on': False}
+
+
+@crumb(input={'a': int}, output=int, name='checkpoint_step')
+def checkpoint_step(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a + 1"""
+    CHECKPOINT_CALLS.append(a)
+    return a + 1
+
+
+@crumb(input={'a': int}, output=int, name='checkpoint_fail')
+def checkpoint_fail(a: int) -> int:  # pylint: disable=invalid-name
+    """Return a * 10, raises RuntimeError if CHECKPOINT_FAIL['on']"""
+    if CHECKPOINT_FAIL['on']:
+        raise RuntimeError('checkpoint_fail failed')
+    return a * 10
+
+
+# used in test_faults, run in the MultiSlicer workers: each call adds a line to the file "path"
+def _count_call(path: str) -> int:
+    """Add a line to the file, return the number of calls before this one"""
+    with open(path, 'a+', encoding='ascii') as file:
+        file.seek(0)
+        calls = len(file.readlines())
+        file.write('call\n')
+    return calls
+
+
+@crumb(input={'path': str, 'fails': int, 'a': int}, output=int, name='fault_flaky', retries=2)
+def fault_flaky(path: str, fails: int, a: int) -> int:  # pylint: disable=invalid-name
+    """Return a + 1, raises ValueError in the first "fails" calls"""
+    if _count_call(path) < fails:
+        raise ValueError('fault_flaky failed')
+    return a + 1
+
+
+@crumb(input={'path': str, 'a': int}, output=int, name='fault_hang', timeout=1., retries=1)
+def fault_hang(path: str, a: int) -> int:  # pylint: disable=invalid-name
+    """Return a + 2, the first call does not finish"""
+    if _count_call(path) == 0:
+        time.sleep(60)
+    return a + 2
+
+
+@crumb(input={'path': str, 'a': int}, output=int, name='fault_die', retries=1)
+def fault_die(path: str, a: int) -> int:  # pylint: disable=invalid-name
+    """Return a + 3, the first call stops the process"""
+    if _count_call(path) == 0:
+        os._exit(1)  # pylint: disable=protected-access
+    return a + 3
+
+
+@crumb(input={'path': str, 'a': int, 'slow': bool}, output=int, name='fault_slow', pure=True)
+def fault_slow(path: str, a: int, slow: bool) -> int:  # pylint: disable=invalid-name
+    """Return a + 4 after 0.05 seconds, the first call with slow takes 10 seconds"""
+    time.sleep(10 if slow and _count_call(path) == 0 else 0.05)
+    return a + 4
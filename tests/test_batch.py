@@ -0,0 +1,77 @@
+"""Test edits done in a batch"""
+import pytest
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _sample_slice() -> Slice:
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('batch')
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node = slice.add_node('add15')
+    slice.add_input_mapping('in', node, 'a')
+    slice.add_output_mapping('out', node, None)
+    return slice
+
+
+def test_batch() -> None:
+    """Build a chain in a batch, the links go against the order of the nodes"""
+    slice = _sample_slice()
+    first = next(iter(slice.nodes))
+    with slice.batch():
+        slice.remove_output_mapping('out', first, None)
+        nodes = [slice.add_node('add15') for _ in range(20)]
+        for node_a, node_b in zip(nodes[1:], nodes[:-1]):
+            slice.add_link(node_a, None, node_b, 'a')
+        slice.add_link(first, None, nodes[-1], 'a')
+        slice.add_output_mapping('out', nodes[0], None)
+    assert slice.run({'in': 0})['out'] == 21 * 15
+
+
+def test_batch_rollback() -> None:
+    """Every edit of a failed batch is undone"""
+    slice = _sample_slice()
+    before = slice.to_dict()
+    first = next(iter(slice.nodes))
+    with pytest.raises(RuntimeError):
+        with slice.batch():
+            slice.remove_output_mapping('out', first, None)
+            slice.remove_input_mapping('in', first, 'a')
+            node_a = slice.add_node('add15')
+            node_b = slice.add_node('add15')
+            slice.add_link(node_a, None, node_b, 'a')
+            slice.add_link(node_b, None, node_a, 'a')  # circular, found at the end
+            slice.add_input('in2', int)
+            slice.remove_node(first)
+    assert slice.to_dict() == before
+    assert slice.run({'in': 1})['out'] == 16
+    before = slice.to_dict()
+    # failing edit
+    with pytest.raises(RuntimeError):
+        with slice.batch():
+            node_a = slice.add_node('add15')
+            slice.remove_node(first)  # still mapped
+    assert slice.to_dict() == before
+
+
+def test_apply_edits() -> None:
+    """Edits as a list, new nodes referenced by the position of their edit"""
+    slice = _sample_slice()
+    first = next(iter(slice.nodes))
+    results = slice.apply_edits([('remove_output_mapping', {'name': 'out', 'node_name': first, 'node_output': None}),
+                                 ('add_node', {'bi_name': 'add15'}),
+                                 ('add_link', {'node_a': first, 'node_a_output': None, 'node_b': 1, 'node_b_input': 'a'}),
+                                 ('add_output_mapping', {'name': 'out', 'node_name': 1, 'node_output': None})])
+    assert results[1] in slice.nodes
+    assert slice.run({'in': 0})['out'] == 30
+    before = slice.to_dict()
+    with pytest.raises(ValueError):
+        slice.apply_edits([('add_node', {'bi_name': 'add15'}), ('run', {})])
+    with pytest.raises(ValueError):
+        slice.apply_edits([('add_link', {'node_a': 0, 'node_a_output': None, 'node_b': first, 'node_b_input': 'a'})])
+    assert slice.to_dict() == before
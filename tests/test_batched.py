@@ -0,0 +1,81 @@
+"""Test the batched crumbs, called once for many records by Slice.run_many"""
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+
+cr = CrumbRepository()
+
+
+def _batched_slice() -> Slice:
+    """(in + 15) * 10 in a batched crumb, doubled, the 10 comes from a constant node"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('batched')
+    for name in ('add15', 'pure_load', 'batch_multiply', 'pure_double'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    slice.add_output('constant', int)
+    node_add = slice.add_node('add15')
+    node_load = slice.add_node('pure_load')
+    node_multiply = slice.add_node('batch_multiply')
+    node_double = slice.add_node('pure_double')
+    slice.add_input_mapping('in', node_add, 'a')
+    slice.add_link(node_add, None, node_multiply, 'a')
+    slice.add_link(node_load, None, node_multiply, 'b')
+    slice.add_link(node_multiply, None, node_double, 'a')
+    slice.add_output_mapping('out', node_double, None)
+    slice.add_output_mapping('constant', node_load, None)
+    return slice
+
+
+def test_micro_batches() -> None:
+    """The batched crumb is called once for each micro-batch, the other nodes get the value of each record"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _batched_slice()
+    batch_size = Settings.SLICE_BATCH_SIZE
+    Settings.SLICE_BATCH_SIZE = 4
+    tests.sample_crumbs.BATCH_CALLS.clear()
+    tests.sample_crumbs.PURE_CALLS.clear()
+    try:
+        assert slice.run_many({'in': i} for i in range(10)) == [{'out': 2 * (i + 15) * 10, 'constant': 10} for i in range(10)]
+    finally:
+        Settings.SLICE_BATCH_SIZE = batch_size
+    assert tests.sample_crumbs.BATCH_CALLS == [4, 4, 2]
+    # the constant node runs once, the pure node after the batched crumb for each record
+    assert tests.sample_crumbs.PURE_CALLS.count('load') == 1
+    assert len(tests.sample_crumbs.PURE_CALLS) == 11
+    node_multiply = next(i for i in slice.nodes.values() if i.instance_of == 'batch_multiply')
+    assert node_multiply.last_exec == {None: (9 + 15) * 10}
+    # a single record is a batch of one
+    assert slice.run({'in': 1}) == {'out': 320, 'constant': 10}
+    assert tests.sample_crumbs.BATCH_CALLS[-1] == 1
+
+
+def test_slice_inside_slice() -> None:
+    """The records of a Slice run for each record are given to it at once"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    inner = _batched_slice()
+    outer = Slice('outer')
+    outer.add_bakery_item('add15', cr.get_crumb('add15'))
+    outer.add_bakery_item('inner', inner)
+    outer.add_input('in', int)
+    outer.add_output('out', int)
+    node_add = outer.add_node('add15')
+    node_inner = outer.add_node('inner')
+    outer.add_input_mapping('in', node_add, 'a')
+    outer.add_link(node_add, None, node_inner, 'in')
+    outer.add_output_mapping('out', node_inner, 'out')
+    tests.sample_crumbs.BATCH_CALLS.clear()
+    assert outer.run_many([{'in': i} for i in range(5)]) == [{'out': 2 * (i + 30) * 10} for i in range(5)]
+    assert tests.sample_crumbs.BATCH_CALLS == [5]
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER', 'USE_HYBRIDSLICER'], indirect=True)
+def test_slicers() -> None:
+    """The columns of records go through the slicers"""
+    slice = _batched_slice()
+    assert slice.run_many([{'in': i} for i in range(20)]) == [{'out': 2 * (i + 15) * 10, 'constant': 10} for i in range(20)]
@@ -0,0 +1,93 @@
+"""Test the budgets of the slicers for the crumbs declaring requirements"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.node import Node
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.generic import Budget
+
+cr = CrumbRepository()
+
+
+def _limited_slice(n_nodes: int, crumb_name: str = 'limited_sleep') -> Slice:
+    """Nodes using the limited crumb at the same time"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('limited')
+    slice.add_bakery_item(crumb_name, cr.get_crumb(crumb_name))
+    slice.add_input('in', int)
+    for i in range(n_nodes):
+        node = slice.add_node(crumb_name)
+        slice.add_input_mapping('in', node, 'a')
+        slice.add_output(f'out{i}', int)
+        slice.add_output_mapping(f'out{i}', node, None)
+    return slice
+
+
+def test_budget() -> None:
+    """The amounts with a limit are counted, a task above the limit runs alone"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    budget = Budget({'license': 2})
+    node = Node(cr.get_crumb('limited_sleep'))
+    requires = budget.get_requirements(node)
+    assert requires == {'license': 1}
+    assert budget.fits(requires)
+    budget.acquire(requires)
+    budget.acquire(requires)
+    assert not budget.fits(requires)
+    budget.release(requires)
+    assert budget.fits(requires)
+    assert not budget.fits({'license': 5})
+    budget.release(requires)
+    assert budget.fits({'license': 5})
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_HYBRIDSLICER'], indirect=True)
+@pytest.mark.parametrize('budgets, most', [({}, 6), ({'license': 2}, 2), ({'memory': 3e9}, 3)])
+def test_hybrid_budget(budgets: dict, most: int) -> None:
+    """The threads run at once the nodes fitting in the budget"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _limited_slice(6)
+    Settings.SLICER_BUDGETS = budgets
+    tests.sample_crumbs.LIMITED_RUNNING['most'] = 0
+    try:
+        assert slice.run({'in': 3}) == {f'out{i}': 3 for i in range(6)}
+        assert tests.sample_crumbs.LIMITED_RUNNING['most'] == most
+    finally:
+        Settings.SLICER_BUDGETS = {}
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_HYBRIDSLICER'], indirect=True)
+@pytest.mark.parametrize('crumb_name', ['limited_sleep', 'limited_inline'])
+def test_hybrid_budget_shared(crumb_name: str) -> None:
+    """Slices running at once share the budget, with the nodes running inline"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slices = [_limited_slice(3), _limited_slice(3, crumb_name)]
+    Settings.SLICER_BUDGETS = {'license': 1}
+    tests.sample_crumbs.LIMITED_RUNNING['most'] = 0
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            for outputs in pool.map(lambda i: i.run({'in': 3}), slices):
+                assert outputs == {f'out{i}': 3 for i in range(3)}
+        assert tests.sample_crumbs.LIMITED_RUNNING['most'] == 1
+    finally:
+        Settings.SLICER_BUDGETS = {}
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+def test_multislicer_budget() -> None:
+    """The MultiSlicer sends the nodes fitting in the budget"""
+    slice = _limited_slice(6)
+    Settings.SLICER_BUDGETS = {'license': 1}
+    try:
+        for _ in range(2):
+            assert slice.run({'in': 3}) == {f'out{i}': 3 for i in range(6)}
+    finally:
+        Settings.SLICER_BUDGETS = {}
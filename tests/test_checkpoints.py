@@ -0,0 +1,131 @@
+"""Test the checkpoints, a run given again with its run id skips the nodes already done"""
+import os
+import time
+
+import pytest
+
+from crumb.bakery_items.map import Map
+from crumb.bakery_items.slice import Slice
+from crumb.checkpoints import CheckpointStore
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+
+cr = CrumbRepository()
+
+
+@pytest.fixture(name='checkpoint_dir')
+def fixture_checkpoint_dir(tmp_path):
+    """Keep the checkpoints in a folder of the test"""
+    previous = Settings.CHECKPOINT_DIR
+    Settings.CHECKPOINT_DIR = str(tmp_path)
+    yield str(tmp_path)
+    Settings.CHECKPOINT_DIR = previous
+
+
+def _steps_slice() -> Slice:
+    """Return a slice computing (x + 1) * 10"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('steps')
+    slice.add_bakery_item('checkpoint_step', cr.get_crumb('checkpoint_step'))
+    slice.add_bakery_item('checkpoint_fail', cr.get_crumb('checkpoint_fail'))
+    slice.add_input('x', int)
+    slice.add_output('out', int)
+    node_step = slice.add_node('checkpoint_step')
+    node_fail = slice.add_node('checkpoint_fail')
+    slice.add_input_mapping('x', node_step, 'a')
+    slice.add_link(node_step, None, node_fail, 'a')
+    slice.add_output_mapping('out', node_fail, None)
+    return slice
+
+
+def test_resume(checkpoint_dir: str) -> None:
+    """The nodes done before a failure are not run again, another input runs them again"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    tests.sample_crumbs.CHECKPOINT_CALLS.clear()
+    tests.sample_crumbs.CHECKPOINT_FAIL['on'] = True
+    try:
+        with pytest.raises(RuntimeError):
+            _steps_slice().run({'x': 1}, resume='run-1')
+    finally:
+        tests.sample_crumbs.CHECKPOINT_FAIL['on'] = False
+    assert tests.sample_crumbs.CHECKPOINT_CALLS == [1]
+    # as after starting again: a new Slice
+    slice = _steps_slice()
+    assert slice.run({'x': 1}, resume='run-1') == {'out': 20}
+    assert tests.sample_crumbs.CHECKPOINT_CALLS == [1]
+    assert slice.last_execution_stats['resumed'] == 1
+    node_step = next(i for i in slice.nodes.values() if i.instance_of == 'checkpoint_step')
+    assert node_step.last_exec == {None: 2}
+    # all done
+    assert slice.run({'x': 1}, resume='run-1') == {'out': 20}
+    assert slice.last_execution_stats['resumed'] == 2
+    assert slice.run({'x': 2}, resume='run-1') == {'out': 30}
+    assert tests.sample_crumbs.CHECKPOINT_CALLS == [1, 2]
+    # without a run id nothing is kept
+    assert slice.run({'x': 3}) == {'out': 40}
+    assert 'resumed' not in slice.last_execution_stats
+    assert os.listdir(checkpoint_dir) == ['run-1']
+    assert len(os.listdir(os.path.join(checkpoint_dir, 'run-1'))) == 4
+    with pytest.raises(ValueError):
+        slice.run({'x': 1}, resume='../run-1')
+
+
+def test_inner_crumb_changed(checkpoint_dir: str) -> None:  # pylint: disable=unused-argument
+    """A Slice or Map node is run again after a change of the file of a crumb inside it"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = Slice('outer')
+    slice.add_bakery_item('steps', _steps_slice())
+    slice.add_bakery_item('map', Map('map', _steps_slice(), 'x'))
+    slice.add_input('x', int)
+    slice.add_input('xs', list)
+    slice.add_output('out', int)
+    slice.add_output('outs', list)
+    node_steps = slice.add_node('steps')
+    node_map = slice.add_node('map')
+    slice.add_input_mapping('x', node_steps, 'x')
+    slice.add_input_mapping('xs', node_map, 'x')
+    slice.add_output_mapping('out', node_steps, 'out')
+    slice.add_output_mapping('outs', node_map, 'out')
+    tests.sample_crumbs.CHECKPOINT_CALLS.clear()
+    assert slice.run({'x': 1, 'xs': [2, 3]}, resume='inner') == {'out': 20, 'outs': [30, 40]}
+    assert slice.run({'x': 1, 'xs': [2, 3]}, resume='inner') == {'out': 20, 'outs': [30, 40]}
+    assert slice.last_execution_stats['resumed'] == 2
+    assert sorted(tests.sample_crumbs.CHECKPOINT_CALLS) == [1, 2, 3]
+    file = tests.sample_crumbs.__file__
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    try:
+        assert slice.run({'x': 1, 'xs': [2, 3]}, resume='inner') == {'out': 20, 'outs': [30, 40]}
+    finally:
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert slice.last_execution_stats['resumed'] == 0
+    assert sorted(tests.sample_crumbs.CHECKPOINT_CALLS) == [1, 1, 2, 2, 3, 3]
+
+
+def test_retention(checkpoint_dir: str) -> None:
+    """The oldest runs past CHECKPOINT_MAX_RUNS and the runs not used for CHECKPOINT_MAX_AGE seconds are deleted"""
+    max_runs, max_age = Settings.CHECKPOINT_MAX_RUNS, Settings.CHECKPOINT_MAX_AGE
+    Settings.CHECKPOINT_MAX_RUNS, Settings.CHECKPOINT_MAX_AGE = 3, 3600.
+    try:
+        for i, run_id in enumerate(['a', 'b', 'c']):
+            CheckpointStore(run_id)
+            os.utime(os.path.join(checkpoint_dir, run_id), (time.time() - 100 + i, time.time() - 100 + i))
+        CheckpointStore('d')
+        assert sorted(os.listdir(checkpoint_dir)) == ['b', 'c', 'd']
+        os.utime(os.path.join(checkpoint_dir, 'b'), (time.time() - 7200, time.time() - 7200))
+        CheckpointStore('d').delete()
+        assert os.listdir(checkpoint_dir) == ['c']
+    finally:
+        Settings.CHECKPOINT_MAX_RUNS, Settings.CHECKPOINT_MAX_AGE = max_runs, max_age
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+def test_multislicer(checkpoint_dir: str) -> None:  # pylint: disable=unused-argument
+    """The outputs computed in the workers are kept"""
+    slice = _steps_slice()
+    assert slice.run({'x': 4}, resume='multi') == {'out': 50}
+    assert slice.last_execution_stats['resumed'] == 0
+    assert slice.run({'x': 4}, resume='multi') == {'out': 50}
+    assert slice.last_execution_stats['resumed'] == 2
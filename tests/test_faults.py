@@ -0,0 +1,95 @@
+"""Test the timeouts, retries and copies of slow nodes in the MultiSlicer"""
+import os
+import tempfile
+import time
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.multislicer import MultiSlicer
+from crumb.slicers.slicers import delete_slicer
+
+cr = CrumbRepository()
+
+
+def _fault_slice(crumb_name: str) -> Slice:
+    """Return a slice running a crumb of sample_crumbs writing its calls to the input path"""
+    slice = Slice(crumb_name)
+    slice.add_bakery_item(crumb_name, cr.get_crumb(crumb_name))
+    slice.add_output('out', int)
+    node = slice.add_node(crumb_name)
+    for input_name, input_type in cr.get_crumb(crumb_name).input.items():
+        slice.add_input(input_name, input_type)
+        slice.add_input_mapping(input_name, node, input_name)
+    slice.add_output_mapping('out', node, None)
+    return slice
+
+
+# the slices run in the MultiSlicer (see the fixture "slicer")
+pytestmark = pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+
+
+@pytest.fixture(name='multislicer')
+def fixture_multislicer(slicer, monkeypatch):  # pylint: disable=unused-argument
+    """Run the slices in the MultiSlicer with 2 workers (even with a single CPU), give a folder for the calls of the crumbs"""
+    previous = Settings.MULTISLICER_MIN_THREADS, Settings.MULTISLICER_SPECULATIVE
+    monkeypatch.setattr('crumb.slicers.multislicer.get_cpu_count', lambda: 2)
+    Settings.MULTISLICER_MIN_THREADS = 2
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            yield directory
+        finally:
+            Settings.MULTISLICER_MIN_THREADS, Settings.MULTISLICER_SPECULATIVE = previous
+
+
+def _calls(path: str) -> int:
+    with open(path, encoding='ascii') as file:
+        return len(file.readlines())
+
+
+def test_retries(multislicer: str) -> None:
+    """A node raising runs again up to the retries of its crumb, then the error is raised and the MultiSlicer keeps working"""
+    slice = _fault_slice('fault_flaky')
+    path = os.path.join(multislicer, 'flaky')
+    assert slice.run({'path': path, 'fails': 2, 'a': 1}) == {'out': 2}
+    assert _calls(path) == 3
+    os.unlink(path)
+    with pytest.raises(ValueError, match='fault_flaky failed'):
+        slice.run({'path': path, 'fails': 5, 'a': 1})
+    assert _calls(path) == 3
+    os.unlink(path)
+    assert slice.run({'path': path, 'fails': 0, 'a': 5}) == {'out': 6}
+
+
+def test_lost_workers(multislicer: str) -> None:
+    """A worker past the timeout of its node, or stopping, is replaced and the node runs again"""
+    slice = _fault_slice('fault_hang')
+    path = os.path.join(multislicer, 'hang')
+    started = time.monotonic()
+    assert slice.run({'path': path, 'a': 1}) == {'out': 3}
+    assert time.monotonic() - started < 30
+    assert _calls(path) == 2
+    slice = _fault_slice('fault_die')
+    path = os.path.join(multislicer, 'die')
+    assert slice.run({'path': path, 'a': 1}) == {'out': 4}
+    assert _calls(path) == 2
+    # the workers were replaced
+    assert len([i for i in MultiSlicer()._worker_pids if i]) == 2  # pylint: disable=protected-access
+    with pytest.raises(ValueError):
+        cr.get_crumb('fault_hang').__class__('bad', __file__, lambda a: a, timeout=0)
+
+
+def test_speculative(multislicer: str) -> None:
+    """A pure node slower than the runs before it is also started in another worker, the first output is used"""
+    Settings.MULTISLICER_SPECULATIVE = 3.
+    delete_slicer()
+    slice = _fault_slice('fault_slow')
+    path = os.path.join(multislicer, 'slow')
+    for i in range(MultiSlicer.SPECULATIVE_RUNS):
+        assert slice.run({'path': path, 'a': i, 'slow': False}) == {'out': i + 4}
+    started = time.monotonic()
+    assert slice.run({'path': path, 'a': 10, 'slow': True}) == {'out': 14}
+    assert time.monotonic() - started < 5
+    assert _calls(path) == 2
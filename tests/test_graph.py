@@ -1,6 +1,10 @@
 """
 Tests the creation of a Slice from scratch
 """
+import random
+
+import pytest
+
 from crumb.settings import Settings
 from crumb.bakery_items.slice import Slice
 from crumb.repository import CrumbRepository
@@ -81,8 +85,8 @@ def test_graph_parallel() -> None:
     slice.add_link(node_6, None, node_3, 'b')
     # other debug
     # from pprint import pprint
-    # pprint(s.nodes[n1]['node'].output)
-    # pprint(s.nodes[n6]['node'].input)
+    # pprint(s.nodes[n1].output)
+    # pprint(s.nodes[n6].input)
     # pprint(s.crumbs)
     # pprint(s.nodes)
     # print(s._check_graph_circular())
@@ -104,5 +108,120 @@ def test_graph_parallel() -> None:
     Settings.USE_MULTISLICER = False
 
 
+def test_graph_diamond() -> None:
+    """
+    Tests a node reached twice from the same start (not circular) and the adjacency arrays
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('diamond')
+    slice.add_bakery_item('get5', cr.get_crumb('get5'))
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_bakery_item('minus', cr.get_crumb('minus'))
+    slice.add_output('out', int)
+    node_top = slice.add_node('get5')
+    node_left = slice.add_node('add15')
+    node_right = slice.add_node('add15')
+    node_bottom = slice.add_node('minus')
+    slice.add_link(node_top, None, node_left, 'a')
+    slice.add_link(node_top, None, node_right, 'a')
+    slice.add_link(node_left, None, node_bottom, 'a')
+    slice.add_link(node_right, None, node_bottom, 'b')
+    slice.add_output_mapping('out', node_bottom, None)
+    assert slice._check_graph_circular() == 1  # pylint: disable=protected-access
+    compact_graph = slice._get_compact_graph()  # pylint: disable=protected-access
+    position = {node.name: i for i, node in enumerate(compact_graph.nodes)}
+    assert sorted(compact_graph.successors(position[node_top])) == sorted([position[node_left], position[node_right]])
+    assert list(compact_graph.predecessors(position[node_bottom])) == [position[node_left], position[node_right]]
+    assert slice.run()['out'] == 0
+
+
+def test_graph_edits() -> None:
+    """
+    Tests the link counters and the reverse of the mappings follow the edits, and failed edits do not change the graph
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('edits')
+    slice.add_bakery_item('get5', cr.get_crumb('get5'))
+    slice.add_bakery_item('minus', cr.get_crumb('minus'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node_a = slice.add_node('get5')
+    node_b = slice.add_node('minus')
+    slice.add_link(node_a, None, node_b, 'a')
+    slice.add_link(node_a, None, node_b, 'b')
+    assert slice.nodes[node_a].n_links_out() == 2
+    assert slice.nodes[node_b].n_links_in() == 2
+    # the input is taken, nothing changes
+    node_c = slice.add_node('get5')
+    with pytest.raises(RuntimeError):
+        slice.add_link(node_c, None, node_b, 'a')
+    assert not slice.nodes[node_c].has_links()
+    assert slice.nodes[node_b].input['a'][0] is slice.nodes[node_a]
+    # not linked like this
+    with pytest.raises(RuntimeError):
+        slice.remove_link(node_c, None, node_b, 'a')
+    slice.remove_link(node_a, None, node_b, 'b')
+    assert slice.nodes[node_a].output[None] == {slice.nodes[node_b]: ['a']}
+    slice.remove_link(node_a, None, node_b, 'a')
+    assert slice.nodes[node_a].output[None] == {}
+    assert not slice.nodes[node_a].has_links() and not slice.nodes[node_b].has_links()
+    # mapped nodes cannot be removed until unmapped
+    slice.add_input_mapping('in', node_b, 'a')
+    slice.add_input_mapping('in', node_b, 'b')
+    slice.add_output_mapping('out', node_b, None)
+    for unmap in (lambda: slice.remove_input_mapping('in', node_b, 'a'),
+                  lambda: slice.remove_input_mapping('in', node_b, 'b'),
+                  lambda: slice.remove_output_mapping('out', node_b, None)):
+        with pytest.raises(RuntimeError):
+            slice.remove_node(node_b)
+        unmap()
+    slice.remove_node(node_b)
+    assert node_b not in slice.nodes
+
+
+def test_graph_circular_link() -> None:
+    """
+    Tests circular links are refused when added, and the order of the nodes follows random links
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('circular')
+    slice.add_bakery_item('minus', cr.get_crumb('minus'))
+    nodes = [slice.add_node('minus') for _ in range(30)]
+    rng = random.Random(0)
+    n_refused = 0
+    for _ in range(200):
+        node_a, node_b = rng.sample(nodes, 2)
+        free = [i for i, j in slice.nodes[node_b].input.items() if j is None]
+        if not free:
+            continue
+        # would node_b reach node_a?
+        reached, stack = set(), [slice.nodes[node_b]]
+        while stack:
+            current = stack.pop()
+            reached.add(current)
+            stack.extend(other for users in current.output.values() for other in users if other not in reached)
+        try:
+            slice.add_link(node_a, None, node_b, free[0])
+            assert slice.nodes[node_a] not in reached
+        except RuntimeError:
+            assert slice.nodes[node_a] in reached
+            n_refused += 1
+        position = {node: i for i, node in enumerate(slice._topological_order)}  # pylint: disable=protected-access
+        for node in slice.nodes.values():
+            for other_data in node.input.values():
+                if other_data is not None:
+                    assert position[other_data[0]] < position[node]
+    assert n_refused > 0
+    with pytest.raises(RuntimeError):
+        slice.add_link(nodes[0], None, nodes[0], 'a')
+    assert slice._check_graph_circular() > 0  # pylint: disable=protected-access
+
+
 if __name__ == '__main__':
     test_graph_parallel()
+    test_graph_diamond()
+    test_graph_edits()
+    test_graph_circular_link()
@@ -0,0 +1,63 @@
+"""Test the HybridSlicer, each crumb runs where it asks"""
+import os
+import threading
+
+import pytest
+
+from crumb import crumb
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+cr = CrumbRepository()
+
+
+@pytest.fixture(name='hybrid')
+def fixture_hybrid():
+    """Use the HybridSlicer"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    Settings.USE_HYBRIDSLICER = True
+    delete_slicer()
+    yield get_slicer()
+    delete_slicer()
+    Settings.USE_HYBRIDSLICER = False
+
+
+def test_targets(hybrid) -> None:
+    """The values go from the inline node to the thread node, to the process node and back"""
+    slice = Slice('targets')
+    for name in ('get5', 'thread_add1', 'process_double', 'thread_ident', 'process_pid'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_output('out', int)
+    slice.add_output('thread', int)
+    slice.add_output('pid', int)
+    node_five = slice.add_node('get5')
+    node_add = slice.add_node('thread_add1')
+    node_double = slice.add_node('process_double')
+    node_thread = slice.add_node('thread_ident')
+    node_pid = slice.add_node('process_pid')
+    slice.add_link(node_five, None, node_add, 'a')
+    slice.add_link(node_add, None, node_double, 'a')
+    slice.add_output_mapping('out', node_double, None)
+    slice.add_output_mapping('thread', node_thread, None)
+    slice.add_output_mapping('pid', node_pid, None)
+    output = slice.run()
+    assert output['out'] == 12
+    assert output['thread'] != threading.get_ident()
+    assert output['pid'] != os.getpid()
+    assert hybrid.stats == {'inline': 1, 'thread': 2, 'process': 2}
+
+
+def test_target_invalid() -> None:
+    """Only the known targets, the crumbs for processes must be reloadable"""
+    with pytest.raises(ValueError):
+        @crumb(output=int, name='target_invalid', target='gpu')
+        def target_invalid() -> int:  # pylint: disable=unused-variable
+            return 0
+    with pytest.raises(RuntimeError):
+        @crumb(output=int, name='target_inside', target='process')
+        def target_inside() -> int:  # pylint: disable=unused-variable
+            return 0
+    cr.crumbs.pop('target_invalid', None)
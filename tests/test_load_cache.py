@@ -0,0 +1,80 @@
+"""Test that slices referenced more than once are loaded once"""
+import os
+import tempfile
+import pytest
+from crumb.settings import Settings
+from crumb.bakery_items.slice import Slice
+from crumb.bakery_items.load_cache import LoadCache
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def test_shared_sub_slice() -> None:
+    """Two references to the same file share the definition, each node still runs on its own"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    # inner: out = in + 15
+    slice_inner = Slice('inner')
+    slice_inner.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice_inner.add_input('in', int)
+    slice_inner.add_output('out', int)
+    node = slice_inner.add_node('add15')
+    slice_inner.add_input_mapping('in', node, 'a')
+    slice_inner.add_output_mapping('out', node, None)
+    inner_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+    inner_file.close()
+    slice_inner.save_to_file(inner_file.name, overwrite=True)
+    # outer: two references to inner chained
+    slice_outer = Slice('outer')
+    for name in ['first', 'second']:
+        reference = Slice(name)
+        reference.load_from_file(inner_file.name)
+        slice_outer.add_bakery_item(name, reference)
+    slice_outer.add_input('in', int)
+    slice_outer.add_output('out', int)
+    node_first = slice_outer.add_node('first')
+    node_second = slice_outer.add_node('second')
+    node_third = slice_outer.add_node('second')
+    slice_outer.add_input_mapping('in', node_first, 'in')
+    slice_outer.add_input_mapping('in', node_third, 'in')
+    slice_outer.add_link(node_first, 'out', node_second, 'in')
+    slice_outer.add_output_mapping('out', node_second, 'out')
+    assert slice_outer.run(input={'in': 1})['out'] == 31
+    outer_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+    outer_file.close()
+    slice_outer.save_to_file(outer_file.name, overwrite=True)
+    # reload: a single definition for both references
+    slice_loaded = Slice('loaded')
+    slice_loaded.load_from_file(outer_file.name)
+    first = slice_loaded.bakery_items['first']['bakery_item']
+    assert first is slice_loaded.bakery_items['second']['bakery_item']
+    assert first.frozen
+    with pytest.raises(RuntimeError):
+        first.add_input('other', int)
+    assert len(set(slice_loaded.nodes.keys())) == 3
+    assert slice_loaded.run(input={'in': 1})['out'] == 31
+    # the cache can also be kept between loads
+    Settings.SLICE_CACHE_PER_PROCESS = True
+    try:
+        slice_a, slice_b = Slice('a'), Slice('b')
+        slice_a.load_from_file(outer_file.name)
+        slice_b.load_from_file(outer_file.name)
+        assert slice_a.bakery_items['first']['bakery_item'] is slice_b.bakery_items['first']['bakery_item']
+        assert len(LoadCache.PROCESS_INSTANCE.crumbs) == 1
+        # a file saved again replaces the version kept
+        n_slices = len(LoadCache.PROCESS_INSTANCE.slices)
+        mtime = os.path.getmtime(inner_file.name)
+        os.utime(inner_file.name, (mtime + 1, mtime + 1))
+        Slice('c').load_from_file(outer_file.name)
+        assert len(LoadCache.PROCESS_INSTANCE.slices) == n_slices
+        assert (os.path.abspath(inner_file.name), mtime + 1) in LoadCache.PROCESS_INSTANCE.slices
+    finally:
+        Settings.SLICE_CACHE_PER_PROCESS = False
+        LoadCache.clear()
+    os.unlink(inner_file.name)
+    os.unlink(outer_file.name)
+
+
+if __name__ == '__main__':
+    test_shared_sub_slice()
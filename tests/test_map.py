@@ -0,0 +1,127 @@
+"""Test the Map, a Slice run for each element of a collection"""
+import os
+import tempfile
+
+import pytest
+
+from crumb.bakery_items.map import Map
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _sum_slice() -> Slice:
+    """Return a slice computing (x + y) * 2"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('sum')
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_bakery_item('pure_double', cr.get_crumb('pure_double'))
+    slice.add_input('x', int)
+    slice.add_input('y', int)
+    slice.add_output('out', int)
+    node_sum = slice.add_node('sum2')
+    node_double = slice.add_node('pure_double')
+    slice.add_input_mapping('x', node_sum, 'input_a')
+    slice.add_input_mapping('y', node_sum, 'input_b')
+    slice.add_link(node_sum, None, node_double, 'a')
+    slice.add_output_mapping('out', node_double, None)
+    return slice
+
+
+def _map_slice(inner: Slice, over: str, window: int = None, collection: str = 'values') -> Slice:
+    """Return a slice running inner for each element of the input collection, the other inputs of inner are given as they are"""
+    slice = Slice('map')
+    slice.add_bakery_item('map', Map('map', inner, over, window))
+    for name in inner.input:
+        slice.add_input(name if name != over else collection, list if name == over else inner.input[name])
+    for name in inner.output:
+        slice.add_output(name, list)
+    node_map = slice.add_node('map')
+    for name in inner.input:
+        slice.add_input_mapping(name if name != over else collection, node_map, name)
+    for name in inner.output:
+        slice.add_output_mapping(name, node_map, name)
+    return slice
+
+
+def test_map() -> None:
+    """The outputs are collected in the order of the elements, the node of the Map keeps them"""
+    slice = _map_slice(_sum_slice(), 'x')
+    assert slice.run({'values': [1, 2, 3], 'y': 10}) == {'out': [22, 24, 26]}
+    assert next(iter(slice.nodes.values())).last_exec == {'out': [22, 24, 26]}
+    assert slice.run({'values': [], 'y': 10}) == {'out': []}
+    # the node can be used as a bakery item of another slice, and run directly
+    assert slice.bakery_items['map']['bakery_item'].run({'x': [1, 2], 'y': 0}) == {'out': [2, 4]}
+    with pytest.raises(ValueError):
+        Map('map', _sum_slice(), 'z')
+    # a Map is saved in the file of its Slice
+    with pytest.raises(RuntimeError):
+        slice.bakery_items['map']['bakery_item'].load_from_file(__file__, 'map')
+
+
+def test_nested_map() -> None:
+    """A Map inside the Slice of a Map is expanded for each element"""
+    inner = _map_slice(_sum_slice(), 'x')
+    slice = _map_slice(inner, 'y', collection='ys')
+    assert slice.run({'ys': [0, 100], 'values': [1, 2]}) == {'out': [[2, 4], [202, 204]]}
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_HYBRIDSLICER'], indirect=True)
+@pytest.mark.parametrize('window, most, output', [(2, 2, True), (8, 6, True), (2, 2, False)])
+def test_window(window: int, most: int, output: bool) -> None:
+    """At most window elements run at once, also when the Slice has no output"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    inner = Slice('limited')
+    inner.add_bakery_item('limited_sleep', cr.get_crumb('limited_sleep'))
+    inner.add_input('a', int)
+    node = inner.add_node('limited_sleep')
+    inner.add_input_mapping('a', node, 'a')
+    if output:
+        inner.add_output('out', int)
+        inner.add_output_mapping('out', node, None)
+    slice = _map_slice(inner, 'a', window)
+    tests.sample_crumbs.LIMITED_RUNNING['most'] = 0
+    assert slice.run({'values': list(range(6))}) == ({'out': list(range(6))} if output else {})
+    assert tests.sample_crumbs.LIMITED_RUNNING['most'] == most
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_HYBRIDSLICER'], indirect=True)
+def test_overlap() -> None:
+    """The elements run as soon as the collection is known, not after the nodes unrelated to the Map"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    inner = Slice('mark')
+    inner.add_bakery_item('mark_run', cr.get_crumb('mark_run'))
+    inner.add_input('a', int)
+    inner.add_output('out', int)
+    node = inner.add_node('mark_run')
+    inner.add_input_mapping('a', node, 'a')
+    inner.add_output_mapping('out', node, None)
+    slice = _map_slice(inner, 'a')
+    slice.add_bakery_item('slow_branch', cr.get_crumb('slow_branch'))
+    slice.add_input('x', int)
+    slice.add_output('slow', int)
+    node_slow = slice.add_node('slow_branch')
+    slice.add_input_mapping('x', node_slow, 'a')
+    slice.add_output_mapping('slow', node_slow, None)
+    tests.sample_crumbs.OVERLAP_EVENTS.clear()
+    assert slice.run({'values': [1, 2, 3], 'x': 4}) == {'out': [1, 2, 3], 'slow': 4}
+    assert tests.sample_crumbs.OVERLAP_EVENTS == ['mark', 'mark', 'mark', 'slow']
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+def test_save_and_multislicer() -> None:
+    """The Map is saved with its Slice, the elements are tasks of the MultiSlicer"""
+    slice = _map_slice(_sum_slice(), 'x', 3)
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    slice.save_to_file(temp_file.name, overwrite=True)
+    slice_copy = Slice('copy')
+    slice_copy.load_from_file(temp_file.name)
+    os.unlink(temp_file.name)
+    assert slice_copy.bakery_items['map']['bakery_item'].window == 3
+    assert slice_copy.run({'values': list(range(10)), 'y': 1}) == {'out': [2 * (i + 1) for i in range(10)]}
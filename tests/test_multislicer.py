@@ -0,0 +1,145 @@
+"""Test the MultiSlicer workers"""
+import os
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+cr = CrumbRepository()
+
+
+def _blob_slice() -> Slice:
+    """Two blobs are joined and measured, the first blob is also measured"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('blobs')
+    slice.add_bakery_item('make_blob', cr.get_crumb('make_blob'))
+    slice.add_bakery_item('blob_size', cr.get_crumb('blob_size'))
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    slice.add_output('first', int)
+    node_blob_a = slice.add_node('make_blob')
+    node_blob_b = slice.add_node('make_blob')
+    node_join = slice.add_node('sum2')
+    node_size = slice.add_node('blob_size')
+    node_size_a = slice.add_node('blob_size')
+    slice.add_input_mapping('in', node_blob_a, 'a')
+    slice.add_input_mapping('in', node_blob_b, 'a')
+    slice.add_link(node_blob_a, None, node_join, 'input_a')
+    slice.add_link(node_blob_b, None, node_join, 'input_b')
+    slice.add_link(node_join, None, node_size, 'blob')
+    slice.add_link(node_blob_a, None, node_size_a, 'blob')
+    slice.add_output_mapping('out', node_size, None)
+    slice.add_output_mapping('first', node_size_a, None)
+    return slice
+
+
+def test_locality() -> None:
+    """The blobs stay in the workers, only the one joined with a blob in another worker is moved"""
+    slice = _blob_slice()
+    size = 100000
+    bytes_moved = {}
+    locality_bytes = Settings.MULTISLICER_LOCALITY_BYTES
+    Settings.USE_MULTISLICER = True
+    try:
+        for threshold in (1000, 10 * size):
+            Settings.MULTISLICER_LOCALITY_BYTES = threshold
+            delete_slicer()
+            for _ in range(3):
+                assert slice.run({'in': size}) == {'out': 2 * size, 'first': size}
+            bytes_moved[threshold] = get_slicer().stats['bytes_moved']
+            assert get_slicer().stats['kept'] == 0
+            # the nodes save their output (the default) only if it came back
+            assert all(i.save_exec for i in slice.nodes.values())
+            node_blob = next(i for i in slice.nodes.values() if i.instance_of == 'make_blob')
+            assert (node_blob.last_exec is None) == (threshold < size)
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+        Settings.MULTISLICER_LOCALITY_BYTES = locality_bytes
+    # without locality each blob goes to the scheduler and to the nodes using it
+    assert bytes_moved[10 * size] >= 3 * 5 * size
+    # at most one blob goes from its worker to the worker joining them (through the scheduler)
+    assert bytes_moved[1000] < 3 * 3 * size
+
+
+def test_long_chain() -> None:
+    """Each node of a long chain is a task, the nodes are sent without the graph they are linked to"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('long chain')
+    slice.add_bakery_item('get5', cr.get_crumb('get5'))
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_output('out', int)
+    previous = slice.add_node('get5')
+    for _ in range(2000):
+        current = slice.add_node('add15')
+        slice.add_link(previous, None, current, 'a')
+        previous = current
+    slice.add_output_mapping('out', previous, None)
+    Settings.USE_MULTISLICER = True
+    Settings.PLANNER_FUSE_CHAINS = False
+    delete_slicer()
+    try:
+        assert slice.run() == {'out': 5 + 2000 * 15}
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+        Settings.PLANNER_FUSE_CHAINS = True
+
+
+def test_pool_size() -> None:
+    """The workers are started for the tasks and stopped when idle, the settings are read when the MultiSlicer starts"""
+    import time  # pylint: disable=import-outside-toplevel
+    from crumb.slicers.multislicer_functions import get_cpu_count  # pylint: disable=import-outside-toplevel
+    slice = _blob_slice()
+    threads, min_threads, idle_timeout = Settings.MULTISLICER_THREADS, Settings.MULTISLICER_MIN_THREADS, Settings.MULTISLICER_IDLE_TIMEOUT
+    Settings.USE_MULTISLICER = True
+    Settings.MULTISLICER_THREADS = 3
+    Settings.MULTISLICER_MIN_THREADS = 0
+    Settings.MULTISLICER_IDLE_TIMEOUT = 0.1
+    delete_slicer()
+    try:
+        slicer = get_slicer()
+        assert slicer.number_processes == 3
+        assert slicer.max_processes == min(3, get_cpu_count())
+        assert slicer.stats['workers'] == 0
+        assert slice.run({'in': 10}) == {'out': 20, 'first': 10}
+        assert 1 <= slicer.stats['workers'] <= slicer.max_processes
+        for _ in range(50):
+            if slicer.stats['workers'] == 0:
+                break
+            time.sleep(0.1)
+        assert slicer.stats['workers'] == 0
+        # and started again
+        assert slice.run({'in': 10}) == {'out': 20, 'first': 10}
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+        Settings.MULTISLICER_THREADS, Settings.MULTISLICER_MIN_THREADS, Settings.MULTISLICER_IDLE_TIMEOUT = threads, min_threads, idle_timeout
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'forkserver'])
+def test_preload(start_method: str) -> None:
+    """The workers use the crumbs loaded before they start, their memory is reported"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _blob_slice()
+    Settings.USE_MULTISLICER = True
+    Settings.MULTISLICER_START_METHOD = start_method
+    Settings.MULTISLICER_PRELOAD = [tests.sample_crumbs.__file__]
+    delete_slicer()
+    try:
+        assert slice.run({'in': 10}) == {'out': 20, 'first': 10}
+        memory = get_slicer().worker_memory()
+        assert len(memory) == get_slicer().stats['workers']
+        if os.path.exists('/proc/self/smaps_rollup'):
+            assert all(0 < i['private'] <= i['pss'] <= i['rss'] for i in memory.values())
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+        Settings.MULTISLICER_START_METHOD = None
+        Settings.MULTISLICER_PRELOAD = []
@@ -0,0 +1,64 @@
+"""Test Slice.run_partitioned, the row-wise crumbs run for each partition of the rows"""
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _rows_slice() -> Slice:
+    """The rows are squared, counted below a limit, and their maximum and sum (whole data) computed"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('rows')
+    for name in ('rows_square', 'rows_count_below', 'rows_max', 'sum_all'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('rows', list)
+    slice.add_input('limit', int)
+    for name in ('count', 'max', 'total', 'raw_total'):
+        slice.add_output(name, int)
+    node_square = slice.add_node('rows_square')
+    node_count = slice.add_node('rows_count_below')
+    node_max = slice.add_node('rows_max')
+    node_total = slice.add_node('sum_all')
+    node_raw_total = slice.add_node('sum_all')
+    slice.add_input_mapping('rows', node_square, 'rows')
+    slice.add_input_mapping('rows', node_raw_total, 'values')
+    slice.add_input_mapping('limit', node_count, 'limit')
+    slice.add_link(node_square, None, node_count, 'rows')
+    slice.add_link(node_square, None, node_max, 'rows')
+    slice.add_link(node_square, None, node_total, 'values')
+    slice.add_output_mapping('count', node_count, None)
+    slice.add_output_mapping('max', node_max, None)
+    slice.add_output_mapping('total', node_total, None)
+    slice.add_output_mapping('raw_total', node_raw_total, None)
+    return slice
+
+
+def test_partitions() -> None:
+    """Each partition is run on its own, the outputs are merged with the merge of each crumb"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _rows_slice()
+    expected = {'count': 5, 'max': 81, 'total': 285, 'raw_total': 45}
+    tests.sample_crumbs.ROWS_CALLS.clear()
+    assert slice.run_partitioned({'rows': list(range(10)), 'limit': 20}, ['rows'], 3) == expected
+    assert tests.sample_crumbs.ROWS_CALLS == [3, 3, 4]
+    assert slice.last_execution_stats['partitioned'] == 3
+    # the same as without partitions
+    assert slice.run({'rows': list(range(10)), 'limit': 20}) == expected
+    # not more partitions than rows
+    tests.sample_crumbs.ROWS_CALLS.clear()
+    assert slice.run_partitioned({'rows': [3, 5], 'limit': 20}, ['rows'], 8) == {'count': 1, 'max': 25, 'total': 34, 'raw_total': 8}
+    assert tests.sample_crumbs.ROWS_CALLS == [1, 1]
+    with pytest.raises(ValueError):
+        slice.run_partitioned({'rows': [3, 5], 'limit': 20}, ['columns'], 2)
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+def test_multislicer() -> None:
+    """The partitions are tasks of the MultiSlicer"""
+    slice = _rows_slice()
+    expected = {'count': 8, 'max': 9801, 'total': 328350, 'raw_total': 4950}
+    assert slice.run_partitioned({'rows': list(range(100)), 'limit': 50}, ['rows'], 4) == expected
@@ -0,0 +1,163 @@
+"""Test the passes over the execution sequence"""
+from crumb.settings import Settings
+from crumb.bakery_items.slice import Slice
+from crumb.planner import FusedNode, fuse_chains
+from crumb.repository import CrumbRepository
+from crumb.slicers.slicers import delete_slicer
+
+cr = CrumbRepository()
+
+
+def _sample_slice() -> Slice:
+    """
+    Two branches doing the same (pure) operations on the input, and an operation that is not pure repeated
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('planner')
+    slice.add_bakery_item('double', cr.get_crumb('pure_double'))
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    slice.add_output('left', int)
+    branches = []
+    for _ in range(2):
+        node_double = slice.add_node('double')
+        node_double_2 = slice.add_node('double')
+        node_add15 = slice.add_node('add15')
+        slice.add_input_mapping('in', node_double, 'a')
+        slice.add_link(node_double, None, node_double_2, 'a')
+        slice.add_link(node_double_2, None, node_add15, 'a')
+        branches.append((node_double_2, node_add15))
+    node_sum = slice.add_node('sum2')
+    slice.add_link(branches[0][1], None, node_sum, 'input_a')
+    slice.add_link(branches[1][1], None, node_sum, 'input_b')
+    slice.add_output_mapping('out', node_sum, None)
+    slice.add_output_mapping('left', branches[1][0], None)
+    return slice
+
+
+def test_merge_pure_nodes() -> None:
+    """The second branch does not run its pure nodes"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _sample_slice()
+    tests.sample_crumbs.PURE_CALLS.clear()
+    assert slice.run({'in': 1}) == {'out': 38, 'left': 4}
+    assert tests.sample_crumbs.PURE_CALLS == [1, 2]
+    assert slice.last_execution_stats == {'nodes': 7, 'executed': 5, 'merged': 2, 'cached': 0, 'fused': 0}
+    # the merged nodes have their output too
+    assert all(node.last_exec == {None: 2} for node in slice.nodes.values() if node.instance_of == 'double' and node.input['a'] is None)
+    Settings.PLANNER_MERGE_PURE_NODES = False
+    try:
+        tests.sample_crumbs.PURE_CALLS.clear()
+        assert slice.run({'in': 1}) == {'out': 38, 'left': 4}
+        assert len(tests.sample_crumbs.PURE_CALLS) == 4
+        assert slice.last_execution_stats['merged'] == 0
+    finally:
+        Settings.PLANNER_MERGE_PURE_NODES = True
+
+
+def test_constant_nodes() -> None:
+    """Nodes not depending on the input run once, until the graph or their crumb changes"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('constant')
+    slice.add_bakery_item('load', cr.get_crumb('pure_load'))
+    slice.add_bakery_item('double', cr.get_crumb('pure_double'))
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node_load = slice.add_node('load')
+    node_double = slice.add_node('double')
+    node_sum = slice.add_node('sum2')
+    slice.add_link(node_load, None, node_double, 'a')
+    slice.add_link(node_double, None, node_sum, 'input_a')
+    slice.add_input_mapping('in', node_sum, 'input_b')
+    slice.add_output_mapping('out', node_sum, None)
+    tests.sample_crumbs.PURE_CALLS.clear()
+    assert slice.run_many([{'in': 1}, {'in': 2}, {'in': 3}]) == [{'out': 21}, {'out': 22}, {'out': 23}]
+    assert tests.sample_crumbs.PURE_CALLS == ['load', 10]
+    assert slice.last_execution_stats == {'nodes': 3, 'executed': 1, 'merged': 0, 'cached': 2, 'fused': 0}
+    assert slice.nodes[node_double].last_exec == {None: 20}
+    assert slice.run({'in': 0}) == {'out': 20}
+    assert tests.sample_crumbs.PURE_CALLS == ['load', 10]
+    # the crumb changed, the nodes after it run again
+    stamp, output = slice._constant_results[node_load]  # pylint: disable=protected-access
+    slice._constant_results[node_load] = (-1, output)  # pylint: disable=protected-access
+    assert slice.run({'in': 0}) == {'out': 20}
+    assert tests.sample_crumbs.PURE_CALLS == ['load', 10, 'load', 10]
+    assert slice._constant_results[node_load][0] == stamp  # pylint: disable=protected-access
+    # the graph changed
+    slice.remove_node(slice.add_node('load'))
+    assert slice.run({'in': 0}) == {'out': 20}
+    assert tests.sample_crumbs.PURE_CALLS == ['load', 10, 'load', 10, 'load', 10]
+
+
+def test_merge_pure_nodes_multislicer() -> None:
+    """The aliases also work in the MultiSlicer"""
+    slice = _sample_slice()
+    delete_slicer()
+    Settings.USE_MULTISLICER = True
+    try:
+        assert slice.run({'in': 3}) == {'out': 54, 'left': 12}
+        assert slice.last_execution_stats['merged'] == 2
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+
+
+def test_fuse_chains() -> None:
+    """
+    Chains run as one MultiSlicer task: in -> add15 -> add15 -> add15 -> sum2, the first add15 also goes to a cheap crumb
+    """
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('chains')
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_bakery_item('negative', cr.get_crumb('cheap_negative'))
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    slice.add_output('middle', int)
+    nodes = [slice.add_node('add15') for _ in range(3)]
+    node_negative = slice.add_node('negative')
+    node_sum = slice.add_node('sum2')
+    slice.add_input_mapping('in', nodes[0], 'a')
+    for node_a, node_b in zip(nodes[:-1], nodes[1:]):
+        slice.add_link(node_a, None, node_b, 'a')
+    slice.add_link(nodes[0], None, node_negative, 'a')
+    slice.add_link(nodes[-1], None, node_sum, 'input_a')
+    slice.add_link(node_negative, None, node_sum, 'input_b')
+    slice.add_output_mapping('out', node_sum, None)
+    slice.add_output_mapping('middle', nodes[1], None)
+    delete_slicer()
+    Settings.USE_MULTISLICER = True
+    try:
+        assert slice.run({'in': 0}) == {'out': 30, 'middle': 30}
+        # the first node takes the cheap crumb, the second node starts another chain (the sum also uses the cheap crumb)
+        assert slice.last_execution_stats['fused'] == 2
+        assert slice.nodes[nodes[0]].last_exec == {None: 15}
+        assert slice.nodes[node_negative].last_exec == {None: -15}
+        assert slice.nodes[nodes[2]].last_exec == {None: 45}
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+    assert slice.run({'in': 0}) == {'out': 30, 'middle': 30}
+    assert slice.last_execution_stats['fused'] == 0
+
+
+def test_fuse_chains_reported() -> None:
+    """Only the nodes of a chain kept by the caller or used outside of it return their output"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('reported')
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    nodes = [slice.add_node('add15') for _ in range(4)]
+    for node_a, node_b in zip(nodes[:-1], nodes[1:]):
+        slice.add_link(node_a, None, node_b, 'a')
+    task_seq, _ = fuse_chains(slice._compute_execution_seq(), {}, {nodes[1]})  # pylint: disable=protected-access
+    assert len(task_seq) == 1 and isinstance(task_seq[0]['node'], FusedNode)
+    # the nodes save their output (save_exec) but only the one kept is reported
+    assert all(i.save_exec for i in slice.nodes.values())
+    assert task_seq[0]['node'].reported == [nodes[1]]
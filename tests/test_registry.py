@@ -0,0 +1,51 @@
+"""Test that nodes are released with their Slice"""
+import gc
+import weakref
+import pytest
+from crumb.node import Node
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def test_slices_are_collected() -> None:
+    """Load, run and discard slices in a loop, nothing should be kept by the Node class or the crumbs"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('sample')
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_bakery_item('add15', cr.get_crumb('add15'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node_a = slice.add_node('add15')
+    node_b = slice.add_node('sum2')
+    slice.add_input_mapping('in', node_a, 'a')
+    slice.add_input_mapping('in', node_b, 'input_a')
+    slice.add_link(node_a, None, node_b, 'input_b')
+    slice.add_output_mapping('out', node_b, None)
+    json_str = slice.to_json()
+    gc.collect()  # slices left by other tests
+    n_using = len(cr.get_crumb('sum2').get_nodes_using())
+    node_refs = []
+    node_names = []
+    for _ in range(50):
+        slice_copy = Slice('copy')
+        slice_copy.from_json(json_str)
+        assert slice_copy.run(input={'in': 1})['out'] == 17
+        node_refs.extend(weakref.ref(i) for i in slice_copy.nodes.values())
+        node_names.extend(slice_copy.nodes.keys())
+        # nodes used directly on the original crumbs are released too
+        temp_node = slice.add_node('sum2')
+        slice.remove_node(temp_node)
+        del slice_copy
+    gc.collect()
+    assert all(i() is None for i in node_refs)
+    for node_name in node_names:
+        with pytest.raises(KeyError):
+            Node.get_node(node_name)
+    assert len(cr.get_crumb('sum2').get_nodes_using()) == n_using
+
+
+if __name__ == '__main__':
+    test_slices_are_collected()
@@ -0,0 +1,133 @@
+"""Test the resources given to the crumbs"""
+import os
+import threading
+
+import pytest
+
+from crumb import crumb, resource
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.resources import ResourcePool
+from crumb.settings import Settings
+from crumb.slicers.slicers import delete_slicer, get_slicer
+
+cr = CrumbRepository()
+
+
+def _offset_slice() -> Slice:
+    """Two nodes using the resource, one after the other"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('offsets')
+    slice.add_bakery_item('add_offset', cr.get_crumb('add_offset'))
+    slice.add_input('in', int)
+    slice.add_output('out', int)
+    node_a = slice.add_node('add_offset')
+    node_b = slice.add_node('add_offset')
+    slice.add_input_mapping('in', node_a, 'a')
+    slice.add_link(node_a, None, node_b, 'a')
+    slice.add_output_mapping('out', node_b, None)
+    return slice
+
+
+def _read_log(path: str) -> list:
+    with open(path, encoding='utf-8') as log_file:
+        return [i.split() for i in log_file.read().splitlines()]
+
+
+@pytest.mark.parametrize('use_multislicer', [False, True])
+def test_resource_per_worker(tmp_path, monkeypatch, use_multislicer: bool) -> None:
+    """The resource starts once in the process running the crumbs, and is torn down when the slicer is killed"""
+    monkeypatch.setenv('RESOURCE_LOG', str(tmp_path / 'resource.log'))
+    (tmp_path / 'resource.log').touch()
+    slice = _offset_slice()
+    Settings.USE_MULTISLICER = use_multislicer
+    threads = Settings.MULTISLICER_THREADS
+    Settings.MULTISLICER_THREADS = 1
+    delete_slicer()
+    try:
+        for i in range(3):
+            assert slice.run({'in': i}) == {'out': i + 200}
+        assert [i[0] for i in _read_log(tmp_path / 'resource.log')] == ['setup']
+        pid = int(_read_log(tmp_path / 'resource.log')[0][1])
+        assert (pid != os.getpid()) == use_multislicer
+        get_slicer().kill()
+        assert _read_log(tmp_path / 'resource.log') == [['setup', str(pid)], ['teardown', str(pid)]]
+    finally:
+        delete_slicer()
+        Settings.USE_MULTISLICER = False
+        Settings.MULTISLICER_THREADS = threads
+
+
+def test_resource_threads(tmp_path, monkeypatch) -> None:
+    """The threads of a process share a resource (run_iter runs each call in a thread), unless it is per_thread"""
+    monkeypatch.setenv('RESOURCE_LOG', str(tmp_path / 'resource.log'))
+    (tmp_path / 'resource.log').touch()
+    slice = _offset_slice()
+    try:
+        for i in range(3):
+            assert dict(slice.run_iter({'in': i})) == {'out': i + 200}
+        assert [i[0] for i in _read_log(tmp_path / 'resource.log')] == ['setup']
+    finally:
+        ResourcePool.close()
+    started = []
+
+    @resource(name='connection', per_thread=True)
+    def connection():  # pylint: disable=unused-variable
+        ident = threading.get_ident()
+        started.append(ident)
+        yield ident
+        started.remove(ident)
+
+    @crumb(output=int, name='connection_owner', resources=['connection'])
+    def connection_owner(connection: int) -> int:  # pylint: disable=redefined-outer-name
+        return connection
+    try:
+        # the threads are alive at the same time, their ids are not reused
+        barrier = threading.Barrier(3)
+        threads = [threading.Thread(target=lambda: connection_owner() and barrier.wait()) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert connection_owner() == threading.get_ident()
+        assert len(set(started)) == 4
+        ResourcePool.close()
+        assert not started
+    finally:
+        ResourcePool.close()
+        ResourcePool.DEFINITIONS.pop('connection')
+        ResourcePool.PER_THREAD.discard('connection')
+        cr.crumbs.pop('connection_owner', None)
+
+
+def test_resource_definition() -> None:
+    """The resources are checked against the function, and given to direct calls"""
+    @resource(name='counter')
+    def counter():  # pylint: disable=unused-variable
+        return [0]
+
+    with pytest.raises(ValueError):
+        @crumb(output=int, name='counter_wrong', resources=['counter'])
+        def counter_wrong() -> int:  # pylint: disable=unused-variable
+            return 0
+    with pytest.raises(ValueError):
+        @crumb(input={'counter': list}, output=int, name='counter_input', resources=['counter'])
+        def counter_input(counter: list) -> int:  # pylint: disable=unused-variable
+            return 0
+    with pytest.raises(ValueError):
+        resource(name='with_parameter')(lambda a: a)
+
+    @crumb(output=int, name='counter_next', resources=['counter'])
+    def counter_next(counter: list) -> int:
+        counter[0] += 1
+        return counter[0]
+    try:
+        assert counter_next() == 1
+        assert counter_next() == 2
+        assert cr.get_crumb('counter_next').run({}) == 3
+    finally:
+        ResourcePool.close()
+        ResourcePool.DEFINITIONS.pop('counter')
+        for name in ('counter_next', 'counter_wrong', 'counter_input'):
+            cr.crumbs.pop(name, None)
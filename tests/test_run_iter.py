@@ -0,0 +1,98 @@
+"""Test Slice.run_iter and Slice.run_iter_async, the outputs given as soon as their node finished"""
+import asyncio
+import time
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _iter_slice() -> Slice:
+    """fast = in + 15, slow = fast after waiting, last = slow * 2"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('iter')
+    for name in ('add15', 'iter_wait', 'pure_double'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('in', int)
+    slice.add_input('seconds', float)
+    for name in ('fast', 'slow', 'last'):
+        slice.add_output(name, int)
+    node_add = slice.add_node('add15')
+    node_wait = slice.add_node('iter_wait')
+    node_double = slice.add_node('pure_double')
+    slice.add_input_mapping('in', node_add, 'a')
+    slice.add_input_mapping('seconds', node_wait, 'seconds')
+    slice.add_link(node_add, None, node_wait, 'a')
+    slice.add_link(node_wait, None, node_double, 'a')
+    slice.add_output_mapping('fast', node_add, None)
+    slice.add_output_mapping('slow', node_wait, None)
+    slice.add_output_mapping('last', node_double, None)
+    return slice
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', [None, 'USE_HYBRIDSLICER'], indirect=True)
+def test_run_iter() -> None:
+    """The fast output is given while the slow node waits"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _iter_slice()
+    tests.sample_crumbs.ITER_RELEASE.clear()
+    outputs = slice.run_iter({'in': 1, 'seconds': 10.})
+    assert next(outputs) == ('fast', 16)
+    tests.sample_crumbs.ITER_RELEASE.set()
+    assert list(outputs) == [('slow', 16), ('last', 32)]
+
+
+def test_close() -> None:
+    """The nodes not started when the outputs are not read anymore do not run"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _iter_slice()
+    tests.sample_crumbs.ITER_RELEASE.clear()
+    tests.sample_crumbs.PURE_CALLS.clear()
+    outputs = slice.run_iter({'in': 1, 'seconds': 10.})
+    assert next(outputs) == ('fast', 16)
+    outputs.close()
+    tests.sample_crumbs.ITER_RELEASE.set()
+    time.sleep(0.2)
+    assert not tests.sample_crumbs.PURE_CALLS
+    # the errors are raised while iterating
+    with pytest.raises(RuntimeError):
+        list(slice.run_iter({'in': 1}))
+
+
+def test_run_iter_async() -> None:
+    """The event loop runs other tasks while the slow node waits"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _iter_slice()
+    tests.sample_crumbs.ITER_RELEASE.clear()
+
+    async def release() -> None:
+        await asyncio.sleep(0.1)
+        tests.sample_crumbs.ITER_RELEASE.set()
+
+    async def read() -> list:
+        outputs = []
+        async for output in slice.run_iter_async({'in': 1, 'seconds': 10.}):
+            outputs.append(output)
+            if output[0] == 'fast':
+                asyncio.get_running_loop().create_task(release())
+        return outputs
+    assert asyncio.run(read()) == [('fast', 16), ('slow', 16), ('last', 32)]
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER'], indirect=True)
+def test_multislicer() -> None:
+    """The scheduler sends each output when known"""
+    slice = _iter_slice()
+    slice.run({'in': 1, 'seconds': 0.})  # the workers start
+    outputs = slice.run_iter({'in': 1, 'seconds': 1.})
+    assert next(outputs) == ('fast', 16)
+    started = time.monotonic()
+    assert next(outputs) == ('slow', 16)
+    assert time.monotonic() - started > 0.5
+    assert list(outputs) == [('last', 32)]
@@ -0,0 +1,92 @@
+"""Test the slice file format (version 3) and the compatibility with version 2"""
+import os
+import json
+import tempfile
+import pytest
+from crumb import __slice_serializer_version__
+from crumb.bakery_items.slice import Slice, read_slice_file
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _get_sample_slice() -> Slice:
+    """Return a slice computing (in1 + in2) + 5"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('sample')
+    slice.add_bakery_item('sum2', cr.get_crumb('sum2'))
+    slice.add_bakery_item('get5', cr.get_crumb('get5'))
+    slice.add_input('in1', int)
+    slice.add_input('in2', int)
+    slice.add_output('out', int)
+    node_sum_a = slice.add_node('sum2')
+    node_sum_b = slice.add_node('sum2')
+    node_get5 = slice.add_node('get5')
+    slice.add_input_mapping('in1', node_sum_a, 'input_a')
+    slice.add_input_mapping('in2', node_sum_a, 'input_b')
+    slice.add_link(node_sum_a, None, node_sum_b, 'input_a')
+    slice.add_link(node_get5, None, node_sum_b, 'input_b')
+    slice.add_output_mapping('out', node_sum_b, None)
+    return slice
+
+
+def test_v3_file() -> None:
+    """Test if the file is a single document with integer ids and can be reloaded"""
+    slice = _get_sample_slice()
+    assert slice.run(input={'in1': 1, 'in2': 2})['out'] == 8
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    slice.save_to_file(temp_file.name, overwrite=True)
+    json_obj = read_slice_file(temp_file.name)
+    assert json_obj['version'] == __slice_serializer_version__ == 3
+    assert isinstance(json_obj['slice'], dict)
+    assert isinstance(json_obj['slice']['bakery_items']['sum2']['bakery_item'], dict)
+    assert len(json_obj['slice']['nodes']) == 3
+    assert sorted(link[2] for link in json_obj['slice']['links']) == [1, 1]
+    slice_copy = Slice('copy')
+    slice_copy.load_from_file(temp_file.name)
+    assert slice_copy.run(input={'in1': 1, 'in2': 2})['out'] == 8
+    assert slice_copy.to_dict(tofile=True)['links'] == json_obj['slice']['links']
+    os.unlink(temp_file.name)
+
+
+def test_v2_file() -> None:
+    """Test if version 2 files, with nested json strings, can still be loaded"""
+    slice = _get_sample_slice()
+    names = list(slice.nodes.keys())
+    slice_v2 = {
+        'slice_name': 'sample_v2',
+        'input': {'objects': {'in1': 'int', 'in2': 'int'},
+                  'mapping': {'in1': {names[0]: ['input_a']}, 'in2': {names[0]: ['input_b']}}},
+        'output': {'objects': {'out': 'int'}, 'mapping': {'out': [names[1], None]}},
+        'bakery_items': {i: {'bakery_item': json.dumps(j['bakery_item'].to_dict()), 'type': j['type']} for i, j in slice.bakery_items.items()},
+        'nodes': {i: {'instance_of': j.instance_of, 'link_str': j.links_to_json(), 'save_exec': True, 'last_exec': {}}
+                  for i, j in slice.nodes.items()}
+    }
+    temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json')
+    temp_file.write(json.dumps({'version': 2, 'type': 'slice', 'slice': json.dumps(slice_v2)}))
+    temp_file.close()
+    slice_copy = Slice('copy')
+    slice_copy.load_from_file(temp_file.name)
+    assert slice_copy.run(input={'in1': 1, 'in2': 2})['out'] == 8
+    os.unlink(temp_file.name)
+
+
+def test_binary_file() -> None:
+    """Test saving and loading with msgpack"""
+    pytest.importorskip('msgpack')
+    slice = _get_sample_slice()
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    slice.save_to_file(temp_file.name, overwrite=True, binary=True)
+    slice_copy = Slice('copy')
+    slice_copy.load_from_file(temp_file.name)
+    assert slice_copy.run(input={'in1': 1, 'in2': 2})['out'] == 8
+    os.unlink(temp_file.name)
+
+
+if __name__ == '__main__':
+    test_v3_file()
+    test_v2_file()
+    test_binary_file()
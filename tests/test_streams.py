@@ -0,0 +1,164 @@
+"""Test the streaming crumbs, running at the same time as the crumbs taking their chunks as a stream"""
+import threading
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.repository import CrumbRepository
+from crumb.settings import Settings
+
+cr = CrumbRepository()
+
+
+def _stream_slice() -> Slice:
+    """The numbers below n are read in chunks, squared and summed, the squares are also given whole to sum_all"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('stream')
+    for name in ('stream_read', 'stream_square', 'stream_sum', 'sum_all'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('n', int)
+    slice.add_input('size', int)
+    slice.add_input('most', int)
+    slice.add_output('total', int)
+    slice.add_output('whole_total', int)
+    node_read = slice.add_node('stream_read')
+    node_square = slice.add_node('stream_square')
+    node_sum = slice.add_node('stream_sum')
+    node_sum_all = slice.add_node('sum_all')
+    slice.add_input_mapping('n', node_read, 'n')
+    slice.add_input_mapping('size', node_read, 'size')
+    slice.add_input_mapping('most', node_square, 'most')
+    slice.add_link(node_read, None, node_square, 'rows')
+    slice.add_link(node_square, None, node_sum, 'rows')
+    slice.add_link(node_square, None, node_sum_all, 'values')
+    slice.add_output_mapping('total', node_sum, None)
+    slice.add_output_mapping('whole_total', node_sum_all, None)
+    return slice
+
+
+def test_stream() -> None:
+    """The chunks go from crumb to crumb while they are read, at most STREAM_CHANNEL_SIZE chunks wait between two crumbs"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _stream_slice()
+    expected = sum(i * i for i in range(1000))
+    channel_size = Settings.STREAM_CHANNEL_SIZE
+    Settings.STREAM_CHANNEL_SIZE = 1
+    tests.sample_crumbs.STREAM_EVENTS.clear()
+    try:
+        assert slice.run({'n': 1000, 'size': 10, 'most': -1}) == {'total': expected, 'whole_total': expected}
+    finally:
+        Settings.STREAM_CHANNEL_SIZE = channel_size
+    assert slice.last_execution_stats['streamed'] == 3
+    # the reader waits for the sum: a chunk in each channel and in each crumb
+    read, added, ahead = 0, 0, 0
+    for event, _ in tests.sample_crumbs.STREAM_EVENTS:
+        read, added = read + (event == 'read'), added + (event == 'sum')
+        ahead = max(ahead, read - added)
+    assert (read, added) == (100, 100)
+    assert ahead <= 6
+    # the squares are recombined (concat) for sum_all, the node of the reader does not keep its chunks
+    node_square = next(i for i in slice.nodes.values() if i.instance_of == 'stream_square')
+    assert node_square.last_exec == {None: [i * i for i in range(1000)]}
+    node_read = next(i for i in slice.nodes.values() if i.instance_of == 'stream_read')
+    assert node_read.last_exec is None
+
+
+def test_whole_values() -> None:
+    """A crumb running alone gets a whole value as a single chunk and returns its chunks recombined"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    assert cr.get_crumb('stream_read').run({'n': 5, 'size': 2}) == [0, 1, 2, 3, 4]
+    assert cr.get_crumb('stream_square').run({'rows': [1, 2, 3]}) == [1, 4, 9]
+    assert cr.get_crumb('stream_sum').run({'rows': [1, 2, 3]}) == 6
+    assert cr.get_crumb('stream_read').run({'n': 0, 'size': 2}) == []
+    slice = Slice('whole')
+    slice.add_bakery_item('stream_square', cr.get_crumb('stream_square'))
+    slice.add_input('rows', list)
+    slice.add_input('most', int)
+    slice.add_output('squares', list)
+    node_square = slice.add_node('stream_square')
+    slice.add_input_mapping('rows', node_square, 'rows')
+    slice.add_input_mapping('most', node_square, 'most')
+    slice.add_output_mapping('squares', node_square, None)
+    assert slice.run({'rows': [1, 2], 'most': -1}) == {'squares': [1, 4]}
+    assert 'streamed' not in slice.last_execution_stats
+    with pytest.raises(ValueError):
+        cr.get_crumb('sum_all').__class__('bad', __file__, lambda values: values, stream_input=['rows'])
+
+
+def test_left_out() -> None:
+    """A crumb needing the whole output of the stream before taking its chunks is left out of the stream"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('left out')
+    for name in ('stream_read', 'stream_square', 'stream_sum', 'sum_all'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('n', int)
+    slice.add_input('size', int)
+    slice.add_output('total', int)
+    node_read = slice.add_node('stream_read')
+    node_sum_all = slice.add_node('sum_all')
+    node_square = slice.add_node('stream_square')
+    node_sum = slice.add_node('stream_sum')
+    slice.add_input_mapping('n', node_read, 'n')
+    slice.add_input_mapping('size', node_read, 'size')
+    slice.add_link(node_read, None, node_sum_all, 'values')
+    slice.add_link(node_read, None, node_square, 'rows')
+    slice.add_link(node_sum_all, None, node_square, 'most')
+    slice.add_link(node_square, None, node_sum, 'rows')
+    slice.add_output_mapping('total', node_sum, None)
+    assert slice.run({'n': 50, 'size': 8}) == {'total': sum(i * i for i in range(50))}
+    # the square waits for sum_all, which waits for the reader: the crumbs run one after the other with the chunks recombined
+    assert 'streamed' not in slice.last_execution_stats
+
+
+def test_diamond() -> None:
+    """A crumb taking two streams from the same reader (one through the square) is left out of the stream"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice('diamond')
+    for name in ('stream_read', 'stream_square', 'stream_pair'):
+        slice.add_bakery_item(name, cr.get_crumb(name))
+    slice.add_input('n', int)
+    slice.add_input('size', int)
+    slice.add_input('most', int)
+    slice.add_output('out', int)
+    node_read = slice.add_node('stream_read')
+    node_square = slice.add_node('stream_square')
+    node_pair = slice.add_node('stream_pair')
+    slice.add_input_mapping('n', node_read, 'n')
+    slice.add_input_mapping('size', node_read, 'size')
+    slice.add_input_mapping('most', node_square, 'most')
+    slice.add_link(node_read, None, node_square, 'rows')
+    slice.add_link(node_square, None, node_pair, 'a')
+    slice.add_link(node_read, None, node_pair, 'b')
+    slice.add_output_mapping('out', node_pair, None)
+    channel_size = Settings.STREAM_CHANNEL_SIZE
+    Settings.STREAM_CHANNEL_SIZE = 1
+    outputs = {}
+    # more chunks than the channels take, the slice would never return if the pair waited in the stream
+    thread = threading.Thread(target=lambda: outputs.update(slice.run({'n': 100, 'size': 1, 'most': -1})), daemon=True)
+    try:
+        thread.start()
+        thread.join(30)
+    finally:
+        Settings.STREAM_CHANNEL_SIZE = channel_size
+    assert outputs == {'out': sum(i * i - i for i in range(100))}
+    assert slice.last_execution_stats['streamed'] == 2
+
+
+def test_error() -> None:
+    """A crumb failing stops the others"""
+    slice = _stream_slice()
+    with pytest.raises(ValueError):
+        slice.run({'n': 1000, 'size': 10, 'most': 500})
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER', 'USE_HYBRIDSLICER'], indirect=True)
+def test_slicers() -> None:
+    """The crumbs of a stream run together in a worker or a thread"""
+    slice = _stream_slice()
+    expected = sum(i * i for i in range(100))
+    assert slice.run({'n': 100, 'size': 7, 'most': -1}) == {'total': expected, 'whole_total': expected}
@@ -0,0 +1,135 @@
+"""Test the Switch, only the Slice of the case selected runs"""
+import os
+import tempfile
+
+import pytest
+
+from crumb.bakery_items.slice import Slice
+from crumb.bakery_items.switch import Switch
+from crumb.repository import CrumbRepository
+
+cr = CrumbRepository()
+
+
+def _case(crumb_name: str) -> Slice:
+    """Return a slice running a crumb on the input a"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    assert tests.sample_crumbs.get5() == 5
+    slice = Slice(crumb_name)
+    slice.add_bakery_item(crumb_name, cr.get_crumb(crumb_name))
+    slice.add_input('a', int)
+    slice.add_output('out', int)
+    node = slice.add_node(crumb_name)
+    slice.add_input_mapping('a', node, 'a')
+    slice.add_output_mapping('out', node, None)
+    return slice
+
+
+def _switch_slice(default: bool = True, after: bool = True) -> Slice:
+    """Return a slice doubling x if it is positive, otherwise negating it (or giving None without default), then doubling the result if after"""
+    slice = Slice('switch')
+    slice.add_bakery_item('is_positive', cr.get_crumb('is_positive'))
+    slice.add_bakery_item('switch', Switch('switch', {True: _case('branch_double')}, 'positive', _case('branch_negate') if default else None))
+    slice.add_input('x', int)
+    slice.add_output('out', int)
+    node_check = slice.add_node('is_positive')
+    node_switch = slice.add_node('switch')
+    slice.add_input_mapping('x', node_check, 'a')
+    slice.add_input_mapping('x', node_switch, 'a')
+    slice.add_link(node_check, None, node_switch, 'positive')
+    if after:
+        slice.add_bakery_item('pure_double', cr.get_crumb('pure_double'))
+        node_double = slice.add_node('pure_double')
+        slice.add_link(node_switch, 'out', node_double, 'a')
+        slice.add_output_mapping('out', node_double, None)
+    else:
+        slice.add_output_mapping('out', node_switch, 'out')
+    return slice
+
+
+def test_switch() -> None:
+    """The case not selected does not run, the nodes after the Switch get the output of the case selected"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _switch_slice()
+    tests.sample_crumbs.BRANCH_CALLS.clear()
+    assert slice.run({'x': 3}) == {'out': 12}
+    assert tests.sample_crumbs.BRANCH_CALLS == ['double']
+    node_switch = next(i for i in slice.nodes.values() if i.instance_of == 'switch')
+    assert node_switch.last_exec == {'out': 6}
+    tests.sample_crumbs.BRANCH_CALLS.clear()
+    assert slice.run({'x': -2}) == {'out': 4}
+    assert tests.sample_crumbs.BRANCH_CALLS == ['negate']
+    # run directly
+    tests.sample_crumbs.BRANCH_CALLS.clear()
+    assert node_switch.bakery_item.run({'positive': False, 'a': 5}) == {'out': -5}
+    assert tests.sample_crumbs.BRANCH_CALLS == ['negate']
+
+
+def test_guard() -> None:
+    """Without a case for the value nothing runs and the outputs are None"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = _switch_slice(default=False, after=False)
+    tests.sample_crumbs.BRANCH_CALLS.clear()
+    assert slice.run({'x': -2}) == {'out': None}
+    assert not tests.sample_crumbs.BRANCH_CALLS
+    assert slice.run({'x': 2}) == {'out': 4}
+    assert tests.sample_crumbs.BRANCH_CALLS == ['double']
+    assert slice.bakery_items['switch']['bakery_item'].run({'positive': [], 'a': 1}) == {'out': None}
+
+
+def test_errors() -> None:
+    """The cases have the same outputs, the input selecting the case is not an input of the cases"""
+    other = _case('branch_double')
+    other.add_output('other', int)
+    with pytest.raises(ValueError):
+        Switch('switch', {True: _case('branch_double'), False: other}, 'positive')
+    with pytest.raises(ValueError):
+        Switch('switch', {True: _case('branch_double')}, 'a')
+    with pytest.raises(ValueError):
+        Switch('switch', {}, 'positive')
+    # a Switch is saved in the file of its Slice
+    with pytest.raises(RuntimeError):
+        Switch('switch', {True: _case('branch_double')}, 'positive').load_from_file(__file__, 'switch')
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_HYBRIDSLICER'], indirect=True)
+def test_overlap() -> None:
+    """The case selected runs as soon as the value selecting it is known, not after the nodes unrelated to the Switch"""
+    import tests.sample_crumbs  # pylint: disable=import-outside-toplevel
+    slice = Slice('switch')
+    slice.add_bakery_item('is_positive', cr.get_crumb('is_positive'))
+    slice.add_bakery_item('switch', Switch('switch', {True: _case('mark_run')}, 'positive'))
+    slice.add_bakery_item('slow_branch', cr.get_crumb('slow_branch'))
+    slice.add_input('x', int)
+    slice.add_output('out', int)
+    slice.add_output('slow', int)
+    node_check = slice.add_node('is_positive')
+    node_switch = slice.add_node('switch')
+    node_slow = slice.add_node('slow_branch')
+    slice.add_input_mapping('x', node_check, 'a')
+    slice.add_input_mapping('x', node_switch, 'a')
+    slice.add_input_mapping('x', node_slow, 'a')
+    slice.add_link(node_check, None, node_switch, 'positive')
+    slice.add_output_mapping('out', node_switch, 'out')
+    slice.add_output_mapping('slow', node_slow, None)
+    tests.sample_crumbs.OVERLAP_EVENTS.clear()
+    assert slice.run({'x': 3}) == {'out': 3, 'slow': 3}
+    assert tests.sample_crumbs.OVERLAP_EVENTS == ['mark', 'slow']
+
+
+@pytest.mark.usefixtures('slicer')
+@pytest.mark.parametrize('slicer', ['USE_MULTISLICER', 'USE_HYBRIDSLICER'], indirect=True)
+def test_save_and_slicers() -> None:
+    """The Switch is saved with its cases, the nodes of the case selected are tasks of the slicer"""
+    slice = _switch_slice()
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    slice.save_to_file(temp_file.name, overwrite=True)
+    slice_copy = Slice('copy')
+    slice_copy.load_from_file(temp_file.name)
+    os.unlink(temp_file.name)
+    switch = slice_copy.bakery_items['switch']['bakery_item']
+    assert set(switch.cases) == {True}
+    assert slice_copy.run({'x': 3}) == {'out': 12}
+    assert slice_copy.run({'x': -3}) == {'out': 6}